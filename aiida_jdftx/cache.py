@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""On-disk cache of the products of the `JdftxParser`, to skip the parsing of output files that were parsed before.
+
+The cache is enabled by setting the `AIIDA_JDFTX_PARSE_CACHE` environment variable to its directory, for example in
+the environment of the daemon. Its size is bounded by `AIIDA_JDFTX_PARSE_CACHE_SIZE` in megabytes, the least recently
+used entries being evicted first.
+
+The size of every entry is recorded in its manifest and added to a running total of the cache, such that saving an
+entry does not scan the cache. The entries are only scanned when the total exceeds the maximum size, and are then
+evicted down to a fraction of it, such that the scans are spread over many saves.
+"""
+import contextlib
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+
+ENV_DIRECTORY = 'AIIDA_JDFTX_PARSE_CACHE'
+ENV_SIZE = 'AIIDA_JDFTX_PARSE_CACHE_SIZE'
+
+DEFAULT_SIZE = 1024  # megabytes
+MANIFEST_FILENAME = 'outputs.json'
+TOTAL_FILENAME = '.size'
+
+# the fraction of the maximum size down to which the entries are evicted once the maximum size is exceeded
+EVICTION_RATIO = 0.9
+
+
+class ParseCache:
+    """Size-bounded least recently used cache of parse products on disk.
+
+    Every entry is a directory named after its key, with a manifest of the node type and attributes of every output
+    node and of the exit code, and a subdirectory per output node with the files of its repository, which are the
+    `.npy` files of the arrays.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_SIZE * 1024**2):
+        """Construct the cache.
+
+        :param directory: the directory of the cache, created if it does not exist
+        :param max_size: the maximum size of the cache in bytes
+        """
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def get_key(node, retrieved_hash, parser_version):
+        """Return the key of the parse products of a calculation.
+
+        The parse products also depend on the inputs of the calculation, e.g. its structure, which are all included in
+        the hash of the calculation node.
+        """
+        import hashlib
+        return hashlib.sha256(f'{node.get_hash()}:{retrieved_hash}:{parser_version}'.encode('utf-8')).hexdigest()
+
+    def load(self, key):
+        """Return the output nodes keyed by link label and the exit code stored for the key, or None if missing.
+
+        The output nodes are new unstored nodes.
+        """
+        from aiida.engine import ExitCode
+        from aiida.orm.utils.node import load_node_class
+
+        dirpath = os.path.join(self.directory, key)
+
+        try:
+            with open(os.path.join(dirpath, MANIFEST_FILENAME)) as handle:
+                manifest = json.load(handle)
+        except (OSError, ValueError):
+            return None
+
+        outputs = {}
+
+        for index, (link_label, output) in enumerate(manifest['outputs'].items()):
+            node = load_node_class(output['node_type'])()
+            node.set_attribute_many(output['attributes'])
+
+            for filename in output['filenames']:
+                with open(os.path.join(dirpath, str(index), filename), 'rb') as handle:
+                    node.put_object_from_filelike(handle, filename, mode='wb', encoding=None)
+
+            outputs[link_label] = node
+
+        exit_code = ExitCode(**manifest['exit_code']) if manifest['exit_code'] else None
+
+        # mark the entry as recently used
+        os.utime(dirpath)
+
+        return outputs, exit_code
+
+    def save(self, key, outputs, exit_code=None):
+        """Store the output nodes and exit code of a parse for the key, and evict entries beyond the maximum size.
+
+        :param outputs: the output nodes keyed by link label
+        :param exit_code: the `ExitCode` returned by the parser, if any
+        """
+        from aiida.orm.implementation.utils import clean_value
+
+        manifest = {'outputs': {}, 'exit_code': None}
+        size = 0
+
+        if exit_code is not None:
+            manifest['exit_code'] = {'status': exit_code.status, 'message': exit_code.message}
+
+        # write the entry in a temporary directory that is moved in place, such that a reader never sees a partial entry
+        tmpdir = tempfile.mkdtemp(dir=self.directory, prefix='.tmp')
+
+        try:
+            for index, (link_label, node) in enumerate(outputs.items()):
+                filenames = node.list_object_names()
+                os.makedirs(os.path.join(tmpdir, str(index)))
+
+                for filename in filenames:
+                    with open(os.path.join(tmpdir, str(index), filename), 'wb') as handle:
+                        size += handle.write(node.get_object_content(filename, mode='rb'))
+
+                manifest['outputs'][link_label] = {
+                    'node_type': node.node_type,
+                    'attributes': clean_value(node.attributes),
+                    'filenames': filenames,
+                }
+
+            # the size of the entry includes that of its manifest, which depends on the number of digits of the size
+            manifest['size'] = 0
+            while manifest['size'] != size + len(json.dumps(manifest)):
+                manifest['size'] = size + len(json.dumps(manifest))
+
+            with open(os.path.join(tmpdir, MANIFEST_FILENAME), 'w') as handle:
+                json.dump(manifest, handle)
+
+            os.rename(tmpdir, os.path.join(self.directory, key))
+        except OSError:
+            # the entry was written concurrently by another process
+            shutil.rmtree(tmpdir, ignore_errors=True)
+            return
+
+        if self.update_total(manifest['size']) > self.max_size:
+            self.evict()
+
+    @contextlib.contextmanager
+    def _open_total(self):
+        """Context manager returning the file of the running total size, locked against the other processes."""
+        with open(os.path.join(self.directory, TOTAL_FILENAME), 'a+') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                handle.seek(0)
+                yield handle
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _write_total(handle, total):
+        """Replace the content of the open file of the running total size."""
+        handle.seek(0)
+        handle.truncate()
+        handle.write(str(total))
+
+    def update_total(self, size):
+        """Add the size of a new entry to the running total size of the cache and return the new total.
+
+        The total of a cache without one, e.g. created by an earlier version, is initialized with a scan of the entries.
+        """
+        with self._open_total() as handle:
+            content = handle.read().strip()
+            total = int(content) + size if content else sum(size for _, size, _ in self.get_entries())
+            self._write_total(handle, total)
+
+        return total
+
+    def get_entries(self):
+        """Return the list of the modification time, the size and the path of every entry of the cache."""
+        entries = []
+
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir() or entry.name.startswith('.tmp'):
+                continue
+
+            try:
+                with open(os.path.join(entry.path, MANIFEST_FILENAME)) as handle:
+                    size = json.load(handle)['size']
+            except (OSError, ValueError, KeyError):
+                # an entry without a recorded size, written by an earlier version
+                size = sum(
+                    os.path.getsize(os.path.join(root, filename))
+                    for root, _, filenames in os.walk(entry.path)
+                    for filename in filenames
+                )
+
+            entries.append((entry.stat().st_mtime, size, entry.path))
+
+        return entries
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits in a fraction of its maximum size.
+
+        The running total is reset to the size of the remaining entries.
+        """
+        with self._open_total() as handle:
+            entries = self.get_entries()
+            total = sum(size for _, size, _ in entries)
+
+            for _, size, path in sorted(entries):
+                if total <= self.max_size * EVICTION_RATIO:
+                    break
+
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+            self._write_total(handle, total)
+
+
+def get_parse_cache():
+    """Return the `ParseCache` configured through the environment, or None if the cache is not enabled."""
+    directory = os.environ.get(ENV_DIRECTORY)
+
+    if not directory:
+        return None
+
+    return ParseCache(directory, int(os.environ.get(ENV_SIZE, DEFAULT_SIZE)) * 1024**2)
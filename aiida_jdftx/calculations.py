@@ -8,15 +8,22 @@ import os
 from typing import Tuple
 
 from aiida import orm
-from aiida.common.datastructures import CalcInfo, CodeInfo
+from aiida.common.datastructures import CalcInfo, CodeInfo, CodeRunMode
 from aiida.common.folders import Folder
 from aiida.common import exceptions
 from aiida.engine import CalcJob
 from aiida.plugins import DataFactory
 
 from ._constants import CONSTANTS
+from . import monitors
+from .profiling import phase, profiled
+from .stdout import SUMMARY_SUFFIX_ARRAYS, SUMMARY_SUFFIX_PARAMETERS, get_script
+from .tools.caching import canonicalize_parameters
 
-UpfData = DataFactory('pseudo.upf')
+# the optional outputs of a calculation, which are only produced on request if the `lightweight` setting is set
+OPTIONAL_OUTPUTS = (
+    'output_structure', 'output_kpoints', 'output_trajectory', 'output_band', 'output_dos', 'output_performance'
+)
 
 
 class JdftxCalculation(CalcJob):
@@ -27,6 +34,21 @@ class JdftxCalculation(CalcJob):
     _PSEUDO_SUBFOLDER = './pseudo/'
     _DEFAULT_INPUT_FILE = 'aiida.in'
     _DEFAULT_OUTPUT_FILE = 'aiida.out'
+    _DUMP_PREFIX = 'aiida'
+    _DEFAULT_DUMP_QUANTITIES = ['ElecDensity', 'Kpoints', 'Ecomponents', 'Lattice', 'IonicPositions']
+    _DUMP_RETRIEVE_SUFFIXES = ['kPts', 'Ecomponents', 'lattice', 'ionpos']
+    _DOS_COMMAND = 'density-of-states'
+    # the dumped files that are only parsed into an optional output, and not retrieved if none of them is produced
+    _OUTPUT_DUMP_SUFFIXES = {
+        'output_structure': ['lattice', 'ionpos'],
+        'output_kpoints': ['kPts'],
+        'output_band': ['kPts', 'eigenvals'],
+        'output_dos': ['dos*'],
+    }
+    _PARENT_FOLDER_FILES = ['aiida.n*']
+    _REMOTE_PARSE_SCRIPT = 'aiida_parse.py'
+    _REMOTE_PARSE_SUFFIXES = [SUMMARY_SUFFIX_PARAMETERS, SUMMARY_SUFFIX_ARRAYS]
+    _WATCHDOG_SCRIPT = 'aiida_monitor.py'
 
     @classmethod
     def define(cls, spec):
@@ -34,20 +56,28 @@ class JdftxCalculation(CalcJob):
         # yapf: disable
         super(JdftxCalculation, cls).define(spec)
 
+        # the data plugins are loaded with the specification rather than on import of the module
+        UpfData = DataFactory('pseudo.upf')  # pylint: disable=invalid-name
+        JdftxTrajectoryData = DataFactory('jdftx.trajectory')  # pylint: disable=invalid-name
+
         # set default values for AiiDA options
         spec.input('metadata.options.input_filename', valid_type=str, default=cls._DEFAULT_INPUT_FILE)
         spec.input('metadata.options.output_filename', valid_type=str, default=cls._DEFAULT_OUTPUT_FILE)
         spec.input('metadata.options.withmpi', valid_type=bool, default=True)  # Override default withmpi=False
         spec.input('structure', valid_type=orm.StructureData,
             help='The input structure.')
-        spec.input('parameters', valid_type=orm.Dict,
-            help='The input parameters that are to be used to construct the input file.')
+        spec.input('parameters', valid_type=orm.Dict, serializer=serialize_parameters,
+            help='The input parameters that are to be used to construct the input file. A plain dictionary is '
+                 'canonicalized, such that equivalent parameters have the same hash for caching.')
         spec.input_namespace('pseudos', valid_type=UpfData, dynamic=True,
             help='A mapping of `UpfData` nodes onto the kind name to which they should apply.')
         spec.input('kpoints', valid_type=orm.KpointsData,
             help='kpoint mesh or kpoint path')
-        spec.input('settings', valid_type=orm.Dict, required=False,
+        spec.input('settings', valid_type=orm.Dict, required=False, validator=validate_settings,
             help='Optional parameters to affect the way the calculation job and the parsing are performed.')
+        spec.input('parent_folder', valid_type=orm.RemoteData, required=False,
+            help='An optional working directory of a previously completed calculation whose dumped files '
+                 '(by default the electron density) are copied into the working directory of this calculation.')
 
         # set parser
         spec.input('metadata.options.parser_name', valid_type=str, default='jdftx')
@@ -57,8 +87,16 @@ class JdftxCalculation(CalcJob):
             help='The `output_parameters` output node of the successful calculation.')
         spec.output('output_structure', valid_type=orm.StructureData, required=False,
             help='The `output_structure` output node of the successful calculation if present.')
-        spec.output('output_kpoints', valid_type=orm.KpointsData, required=False)
-        spec.output('output_trajectory', valid_type=orm.TrajectoryData, required=False)
+        spec.output('output_kpoints', valid_type=orm.KpointsData, required=False,
+            help='The kpoints used by jdftx, a `JdftxKpointsData` of their indices in the mesh for an input mesh.')
+        spec.output('output_trajectory', valid_type=(orm.TrajectoryData, JdftxTrajectoryData), required=False,
+            help='The trajectory of the run, a `JdftxTrajectoryData` if the `compact_trajectory` setting is set.')
+        spec.output('output_band', valid_type=orm.BandsData, required=False,
+            help='The band eigenvalues, parsed when an explicit list of k-points was provided.')
+        spec.output('output_dos', valid_type=orm.XyData, required=False,
+            help='The total and projected density of states, parsed when the `density-of-states` command is set.')
+        spec.output('output_performance', valid_type=orm.Dict, required=False,
+            help='The wall time, iteration counts and timings, profile and parallelization of the run.')
 
         spec.exit_code(200, 'ERROR_OUTPUT_STDOUT_MISSING',
             message='The retrieved folder did not contain the required stdout output file.')
@@ -66,8 +104,13 @@ class JdftxCalculation(CalcJob):
             message='The stdout output file could not be read.')
         spec.exit_code(202, 'ERROR_UNEXPECTED_PARSER_EXCEPTION',
             message='The parser raised an unexpected exception.')
+        spec.exit_code(310, 'ERROR_OUTPUT_STDOUT_PARTIAL',
+            message='The run stopped before the end: the outputs are those of its last complete ionic step.')
+        spec.exit_code(410, 'ERROR_ELECTRONIC_CONVERGENCE_DIVERGED',
+            message='The electronic minimization diverged or stalled and the calculation was stopped: {reason}.')
 
 
+    @profiled('prepare_for_submission')
     def prepare_for_submission(self, folder: Folder) -> CalcInfo:
         """
         Create the input files from the input nodes passed to this instance of the `CalcJob`.
@@ -93,12 +136,14 @@ class JdftxCalculation(CalcJob):
             self.inputs.parameters,
             settings,
         ]
-        input_filecontent, local_copy_pseudo_list = self._generate_inputdata(*arguments)
+        with phase('input'):
+            input_filecontent, local_copy_pseudo_list = self._generate_inputdata(*arguments)
         local_copy_list += local_copy_pseudo_list
 
-        with folder.open(self.metadata.options.input_filename, 'w') as handle:
+        with phase('write input'), folder.open(self.metadata.options.input_filename, 'w') as handle:
             handle.write(input_filecontent)
 
+
         # Prepare a `CalcInfo` to be returned to the engine
         calcinfo = CalcInfo()
 
@@ -110,26 +155,85 @@ class JdftxCalculation(CalcJob):
 
         calcinfo.codes_info = [codeinfo]
         calcinfo.local_copy_list = local_copy_list
+        calcinfo.remote_copy_list = self._get_parent_folder_copy_list(settings)
         calcinfo.retrieve_list = [self.metadata.options.output_filename]
-        calcinfo.retrieve_list += [
-            'aiida.kPts',
-            'aiida.Ecomponents',
-            'aiida.lattice',
-            'aiida.ionpos',
-        ]
+        calcinfo.retrieve_list += self._get_dump_retrieve_list(
+            self._DUMP_PREFIX, self.inputs.kpoints, self.inputs.parameters.get_dict(), get_requested_outputs(settings)
+        )
+
+        watchdog = settings.pop('watchdog', False)
+        if watchdog:
+            # kill jdftx as soon as its electronic minimization diverges, with a script following its stdout
+            python = 'python3' if watchdog is True else watchdog
+            filename_stdout = self.metadata.options.output_filename
+            calcinfo.prepend_text = self._write_watchdog_script(folder, python, filename_stdout, settings)
+            calcinfo.append_text = 'kill $AIIDA_JDFTX_WATCHDOG 2> /dev/null\n'
+
+        remote_parse = settings.pop('remote_parse', False)
+        if remote_parse:
+            # only retrieve the summary of the stdout, written by a script run on the compute node after jdftx
+            python = 'python3' if remote_parse is True else remote_parse
+            filename_stdout = self.metadata.options.output_filename
+            calcinfo.append_text = (calcinfo.append_text or '') + self._write_remote_parse_script(
+                folder, python, filename_stdout
+            )
+            calcinfo.retrieve_list[0:1] = [filename_stdout + suffix for suffix in self._REMOTE_PARSE_SUFFIXES]
 
         return calcinfo
 
+    def _write_watchdog_script(self, folder: Folder, python: str, filename_stdout: str, settings: dict) -> str:
+        """Write the watchdog script that follows the stdout on the compute node and return the command to start it.
+
+        The watchdog is started in the background before jdftx, and its pid is kept in `AIIDA_JDFTX_WATCHDOG` to stop
+        it after jdftx.
+
+        :param folder: the folder in which the input files are written
+        :param python: the python executable on the compute node
+        :param filename_stdout: the name of the stdout file
+        :param settings: the settings, whose `monitor` key holds the thresholds of the watchdog
+        """
+        import json
+        import shlex
+
+        with folder.open(self._WATCHDOG_SCRIPT, 'w') as handle:
+            handle.write(monitors.get_script())
+
+        arguments = [self._WATCHDOG_SCRIPT, filename_stdout, json.dumps(settings.get('monitor', {}))]
+        return f'{python} {" ".join(shlex.quote(argument) for argument in arguments)} &\nAIIDA_JDFTX_WATCHDOG=$!\n'
+
+    def _write_remote_parse_script(self, folder: Folder, python: str, filename_stdout: str) -> str:
+        """Write the script that writes the summary of the stdout on the compute node and return the command to run it.
+
+        :param folder: the folder in which the input files are written
+        :param python: the python executable on the compute node, which requires numpy
+        :param filename_stdout: the name of the stdout file
+        """
+        import json
+        import shlex
+
+        with folder.open(self._REMOTE_PARSE_SCRIPT, 'w') as handle:
+            handle.write(get_script())
+
+        arguments = [self._REMOTE_PARSE_SCRIPT, filename_stdout, json.dumps(self.inputs.structure.cell)]
+        return f'{python} {" ".join(shlex.quote(argument) for argument in arguments)}\n'
+
     @classmethod
     def _generate_inputdata(cls,
                             structure: orm.StructureData,
-                            pseudos: UpfData,
+                            pseudos: dict,
                             kpoints: orm.KpointsData,
                             parameters: orm.Dict,
                             settings: dict,
+                            prefix: str = None,
+                            restart_prefix: str = None,
+                            additional_dump: list = None,
                             ) -> Tuple[str, list]:  # pylint: disable=invalid-name
         """Create the input file in string format for a jdftx calculation for the given inputs.
 
+        :param prefix: the `dump-name` prefix of the dumped files, by default `_DUMP_PREFIX`
+        :param restart_prefix: the `dump-name` prefix of a previous run in the same working directory. If given, the
+            lattice and ionic positions are included from its dumped files and its state is used as initial state.
+        :param additional_dump: quantities to dump at the end of the run on top of the default ones
         :return: a tuple of string to write to the input file and list for pseudopotential local copy
         """
         # pylint: disable=too-many-branches, too-many-statements
@@ -154,26 +258,27 @@ class JdftxCalculation(CalcJob):
         ion_species_inp = ''
         kind_names = []
 
-        for kind in structure.kinds:
-            pseudo = pseudos[kind.name]
+        with phase('pseudos'):
+            for kind in structure.kinds:
+                pseudo = pseudos[kind.name]
 
-            if kind.is_alloy or kind.has_vacancies:
-                raise exceptions.InputValidationError(
-                    "Kind '{}' is an alloy or has "
-                    'vacancies. This is not allowed for jdftx input structures.'
-                    ''.format(kind.name)
-                )
+                if kind.is_alloy or kind.has_vacancies:
+                    raise exceptions.InputValidationError(
+                        "Kind '{}' is an alloy or has "
+                        'vacancies. This is not allowed for jdftx input structures.'
+                        ''.format(kind.name)
+                    )
 
 
-            filename = pseudo.filename
-            pseudo_filenames[pseudo.pk] = filename
-            subfolder_filename = os.path.join(cls._PSEUDO_SUBFOLDER, filename)
-            local_copy_pseudo_list.append(
-                (pseudo.uuid, pseudo.filename, subfolder_filename)
-            )
+                filename = pseudo.filename
+                pseudo_filenames[pseudo.pk] = filename
+                subfolder_filename = os.path.join(cls._PSEUDO_SUBFOLDER, filename)
+                local_copy_pseudo_list.append(
+                    (pseudo.uuid, pseudo.filename, subfolder_filename)
+                )
 
-            kind_names.append(kind.name)
-            ion_species_inp += f'ion-species {subfolder_filename}\n'
+                kind_names.append(kind.name)
+                ion_species_inp += f'ion-species {subfolder_filename}\n'
 
         # ------------ ATOMIC_POSITIONS -----------
         # Check on validity of FIXED_COORDS(a list of bools)
@@ -210,32 +315,56 @@ class JdftxCalculation(CalcJob):
         # ============ I prepare the input calculation control parameters =============
         calc_control_inp = ''
 
-        calc_control_parameters = parameters.get_dict()
+        calc_control_parameters = canonicalize_parameters(parameters.get_dict())
         for k, v in calc_control_parameters.items():
             # The value of input control parameter can be a dict
             if not isinstance(v, dict):
                 # the value may contain two value
                 calc_control_inp += f'{k:<30} {str(v)}\n'
             else:
-                calc_control_inp += f'{k:<30} \\ \n'
-                for ik, iv in v.items():
-                    calc_control_inp += f'    {ik:<30} {str(iv)} \\ \n'
+                # every option but the last continues on the next line
+                options = [f'    {ik:<30} {str(iv)}' for ik, iv in v.items()]
+                calc_control_inp += f'{k:<30} \\ \n' + ' \\ \n'.join(options) + '\n'
 
         # ============ I prepare the k-points =============
+        dump_quantities = list(cls._DEFAULT_DUMP_QUANTITIES)
 
-        # TODO add support of kpoints list
-        try:
-            mesh = kpoints.get_kpoints_mesh()
-        except AttributeError as exception:
-            raise exceptions.InputValidationError('No valid kpoints have been found') from exception
+        if cls._has_kpoints_mesh(kpoints):
+            kmesh, koffset = list(kpoints.get_kpoints_mesh())    # mesh contains mesh and offset
+            kpoint_inp = 'kpoint-folding {:d} {:d} {:d}\n'.format(*kmesh)
+            kpoint_inp += 'kpoint {:4.1f} {:4.1f} {:4.1f}  1.0\n'.format(*koffset)
+        else:
+            try:
+                kpoints_list = kpoints.get_kpoints()
+            except AttributeError as exception:
+                raise exceptions.InputValidationError('No valid kpoints have been found') from exception
+
+            try:
+                weights = kpoints.get_array('weights')
+            except KeyError:
+                weights = np.full(len(kpoints_list), 1. / len(kpoints_list))
+
+            kpoint_inp = ''.join(
+                'kpoint {0:.10f} {1:.10f} {2:.10f} {3:.10f}\n'.format(*kpoint, weight)
+                for kpoint, weight in zip(kpoints_list, weights)
+            )
+            # the eigenvalues along an explicit list of k-points are the band structure
+            dump_quantities.append('BandEigs')
 
-        kmesh, koffset = list(mesh)    # mesh contains mesh and offset
-        kpoint_inp = 'kpoint-folding {:d} {:d} {:d}\n'.format(*kmesh)
-        kpoint_inp += 'kpoint {:4.1f} {:4.1f} {:4.1f}  1.0\n'.format(*koffset)
+        if cls._DOS_COMMAND in calc_control_parameters:
+            # the options of the command, such as the projections, are written with the other commands
+            dump_quantities.append('DOS')
 
         # ============ I specified what to be dumped =============
-        dump_control_inp = 'dump-name aiida.$VAR\n'
-        dump_control_inp += 'dump End ElecDensity Kpoints Ecomponents Lattice IonicPositions\n'
+        dump_quantities += additional_dump or []
+        dump_control_inp = f'dump-name {prefix or cls._DUMP_PREFIX}.$VAR\n'
+        dump_control_inp += f'dump End {" ".join(dump_quantities)}\n'
+
+        # ============ I continue from the dumped state of a previous run =============
+        if restart_prefix is not None:
+            lattice_parameters_inp = f'include {restart_prefix}.lattice\n'
+            ion_positions_inp = f'coords-type cartesian\ninclude {restart_prefix}.ionpos\n'
+            calc_control_inp += f'{"initial-state":<30} {restart_prefix}.$VAR\n'
 
         # seam every part of inps with an additional line break
         input_filecontent = ''
@@ -248,6 +377,56 @@ class JdftxCalculation(CalcJob):
 
         return input_filecontent, local_copy_pseudo_list
 
+    def _get_parent_folder_copy_list(self, settings: dict) -> list:
+        """Return the remote copy list of the files of the `parent_folder` input, if specified."""
+        if 'parent_folder' not in self.inputs:
+            return []
+
+        parent_folder = self.inputs.parent_folder
+        return [
+            (parent_folder.computer.uuid, os.path.join(parent_folder.get_remote_path(), filename), '.')
+            for filename in settings.pop('parent_folder_files', self._PARENT_FOLDER_FILES)
+        ]
+
+    @classmethod
+    def _get_dump_retrieve_list(cls, prefix: str, kpoints: orm.KpointsData, parameters: dict = None,
+                                outputs: set = None) -> list:
+        """Return the list of dumped files with the given prefix that should be retrieved.
+
+        :param prefix: the `dump-name` prefix of the dumped files
+        :param kpoints: the kpoints of the run
+        :param parameters: the parameters of the run, which dumps the density of states if they set the command
+        :param outputs: the optional outputs requested in the lightweight mode, or None if all are produced
+        """
+        retrieve_list = [f'{prefix}.{suffix}' for suffix in cls._DUMP_RETRIEVE_SUFFIXES]
+
+        if not cls._has_kpoints_mesh(kpoints):
+            # the band eigenvalues are only dumped for an explicit list of kpoints
+            retrieve_list.append(f'{prefix}.eigenvals')
+
+        if cls._DOS_COMMAND in (parameters or {}):
+            # a spin-polarized run dumps the density of states of each spin channel, `dosUp` and `dosDn`
+            retrieve_list.append(f'{prefix}.dos*')
+
+        if outputs is not None:
+            # the files of the optional outputs that are not produced are not parsed either
+            required = {suffix for output in outputs for suffix in cls._OUTPUT_DUMP_SUFFIXES.get(output, [])}
+            optional = {suffix for suffixes in cls._OUTPUT_DUMP_SUFFIXES.values() for suffix in suffixes}
+            skipped = {f'{prefix}.{suffix}' for suffix in optional - required}
+            retrieve_list = [filename for filename in retrieve_list if filename not in skipped]
+
+        return retrieve_list
+
+    @staticmethod
+    def _has_kpoints_mesh(kpoints: orm.KpointsData) -> bool:
+        """Return True if the kpoints are defined as a mesh, False if they are an explicit list."""
+        try:
+            kpoints.get_kpoints_mesh()
+        except AttributeError:
+            return False
+
+        return True
+
     @staticmethod
     def _if_pos(fixed):
         """Return 0 if fixed is True, 1 otherwise.
@@ -257,3 +436,164 @@ class JdftxCalculation(CalcJob):
             return 0
 
         return 1
+
+
+def serialize_parameters(value):
+    """Serialize a plain dictionary passed as the `parameters` input into a `Dict` of its canonical form."""
+    return orm.Dict(dict=canonicalize_parameters(value))
+
+
+def get_requested_outputs(settings: dict) -> set:
+    """Return the optional outputs requested by the `lightweight` setting, or None if all outputs are produced.
+
+    The setting is either True, to produce the `output_parameters` only, or the list of the optional outputs to produce
+    on top of them.
+    """
+    lightweight = settings.get('lightweight')
+
+    if lightweight is None or lightweight is False:
+        return None
+
+    if lightweight is True:
+        return set()
+
+    return set(lightweight)
+
+
+def validate_settings(value, _):
+    """Validate the `settings` input of a `JdftxCalculation`."""
+    lightweight = value.get_dict().get('lightweight', False)
+
+    if isinstance(lightweight, bool):
+        return None
+
+    if not isinstance(lightweight, list) or not set(lightweight).issubset(OPTIONAL_OUTPUTS):
+        return f'the `lightweight` setting should be a boolean or a list of the outputs: {", ".join(OPTIONAL_OUTPUTS)}.'
+
+    return None
+
+
+def validate_stages(value, _):
+    """Validate the `stages` input of a `JdftxChainCalculation`."""
+    names = []
+    for stage in value.get_list():
+        if not isinstance(stage, dict) or 'name' not in stage:
+            return 'every stage should be a dictionary with at least a `name`.'
+        if not stage['name'].isidentifier():
+            return f'the stage name `{stage["name"]}` is not a valid identifier.'
+        names.append(stage['name'])
+
+    if not names:
+        return 'at least one stage should be defined.'
+
+    if len(set(names)) != len(names):
+        return 'the stage names should be unique.'
+
+
+class JdftxChainCalculation(JdftxCalculation):
+    """
+    AiiDA calculation plugin running a sequence of jdftx runs within a single job, e.g. relax, scf and bands.
+
+    Every stage writes its own input file and dumps its files with its own name as prefix. Each stage after the first
+    one includes the final lattice and ionic positions of the previous stage and starts from its dumped state. These
+    intermediate files are never retrieved, and are kept on the local scratch of the node if `local_scratch` is set in
+    the `settings`.
+    """
+
+    _STATE_FILES = ['wfns', 'fluidState']
+
+    @classmethod
+    def define(cls, spec):
+        """Define inputs and outputs of the calculation."""
+        # yapf: disable
+        super().define(spec)
+
+        spec.input('stages', valid_type=orm.List, validator=validate_stages,
+            help='The stages to run in order, each a dictionary with a `name` and optional `parameters` that update '
+                 'the base `parameters`, where a value of `None` removes the command.')
+        spec.input_namespace('stage_kpoints', valid_type=orm.KpointsData, dynamic=True, required=False,
+            help='Optional kpoints of a stage, keyed by the stage name. By default the `kpoints` input is used.')
+
+        spec.output_namespace('stages', valid_type=orm.Data, dynamic=True,
+            help='The outputs of every stage, in a namespace named after the stage.')
+        spec.outputs['output_parameters'].required = False
+
+    @profiled('prepare_for_submission')
+    def prepare_for_submission(self, folder: Folder) -> CalcInfo:
+        """
+        Create the input files of all stages from the input nodes passed to this instance of the `CalcJob`.
+
+        :param folder: an `aiida.common.folders.Folder` where the plugin should temporarily place all files
+            needed by the calculation.
+        :return: `aiida.common.datastructures.CalcInfo` instance
+        """
+        if 'settings' in self.inputs:
+            settings = self.inputs.settings.get_dict()
+        else:
+            settings = {}
+
+        local_scratch = settings.pop('local_scratch', None)
+
+        if settings.pop('remote_parse', False):
+            raise exceptions.InputValidationError('the `remote_parse` setting is not supported for a chain of runs.')
+        if settings.pop('watchdog', False):
+            raise exceptions.InputValidationError('the `watchdog` setting is not supported for a chain of runs.')
+        stages = self.inputs.stages.get_list()
+        stage_kpoints = self.inputs.get('stage_kpoints', {})
+        outputs = get_requested_outputs(settings)
+
+        # Create the subfolder that will contain the pseudopotentials
+        folder.get_subfolder(self._PSEUDO_SUBFOLDER, create=True)
+
+        calcinfo = CalcInfo()
+        calcinfo.codes_info = []
+        calcinfo.codes_run_mode = CodeRunMode.SERIAL
+        calcinfo.retrieve_list = []
+
+        previous = None
+        for index, stage in enumerate(stages):
+            name = stage['name']
+            is_last = index == len(stages) - 1
+
+            parameters = self.inputs.parameters.get_dict()
+            parameters.update(stage.get('parameters', {}))
+            parameters = {key: value for key, value in parameters.items() if value is not None}
+            kpoints = stage_kpoints.get(name, self.inputs.kpoints)
+
+            with phase(f'input {name}'):
+                input_filecontent, local_copy_list = self._generate_inputdata(
+                    self.inputs.structure,
+                    self.inputs.pseudos,
+                    kpoints,
+                    orm.Dict(dict=parameters),
+                    dict(settings),
+                    prefix=name,
+                    restart_prefix=previous,
+                    additional_dump=None if is_last else ['State'],
+                )
+
+            with phase(f'write input {name}'), folder.open(f'{name}.in', 'w') as handle:
+                handle.write(input_filecontent)
+
+            codeinfo = CodeInfo()
+            codeinfo.cmdline_params = ['-i', f'{name}.in', '-o', f'{name}.out']
+            codeinfo.code_uuid = self.inputs.code.uuid
+            codeinfo.withmpi = self.inputs.metadata.options.withmpi
+            calcinfo.codes_info.append(codeinfo)
+
+            calcinfo.retrieve_list.append(f'{name}.out')
+            calcinfo.retrieve_list += self._get_dump_retrieve_list(name, kpoints, parameters, outputs)
+
+            previous = name
+
+        calcinfo.local_copy_list = local_copy_list
+        calcinfo.remote_copy_list = self._get_parent_folder_copy_list(settings)
+
+        if local_scratch is not None:
+            scratch = os.path.join(local_scratch, self.node.uuid)
+            links = [f'{stage["name"]}.{state}' for stage in stages[:-1] for state in self._STATE_FILES]
+            calcinfo.prepend_text = f'mkdir -p {scratch}\n'
+            calcinfo.prepend_text += ''.join(f'ln -sf {os.path.join(scratch, link)} {link}\n' for link in links)
+            calcinfo.append_text = f'rm -rf {scratch}\n'
+
+        return calcinfo
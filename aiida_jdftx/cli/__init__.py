@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+"""Command line interface of `aiida-jdftx`, registered as the `aiida-jdftx` console script."""
+import click
+
+from aiida.cmdline.params import options, types
+
+
+@click.group('aiida-jdftx', context_settings={'help_option_names': ['-h', '--help']})
+@options.PROFILE(type=types.ProfileParamType(load_profile=True), expose_value=False)
+def cmd_root():
+    """Command line interface for `aiida-jdftx`."""
+
+
+from .caching import cmd_cache_stats  # pylint: disable=wrong-import-position
+from .density import cmd_density  # pylint: disable=wrong-import-position
+from .export import cmd_export  # pylint: disable=wrong-import-position
+from .importer import cmd_import  # pylint: disable=wrong-import-position
+from .reparse import cmd_reparse  # pylint: disable=wrong-import-position
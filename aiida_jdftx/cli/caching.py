@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""Command to report the cache hit rate of a batch of `JdftxCalculation` nodes."""
+from aiida.cmdline.params import options
+from aiida.cmdline.utils import decorators, echo
+
+from . import cmd_root
+
+
+@cmd_root.command('cache-stats')
+@options.GROUP(help='Only consider the calculations in this group.')
+@decorators.with_dbenv()
+def cmd_cache_stats(group):
+    """Report how many of the finished jdftx calculations were taken from the cache and how many could have been.
+
+    Duplicates have the same hash as an earlier calculation but were run anyway, for example with caching disabled.
+    Equivalent calculations only have the same inputs as an earlier one once their parameters are canonicalized.
+    """
+    from aiida_jdftx.tools.caching import get_cache_statistics
+    from aiida_jdftx.tools.reparse import get_calculations
+
+    statistics = get_cache_statistics(get_calculations(group=group))
+
+    if not statistics.total:
+        echo.echo_info('no finished calculations found')
+        return
+
+    for name in ('cached', 'duplicates', 'equivalent'):
+        number = getattr(statistics, name)
+        echo.echo(f'{name:<12} {number:>8d} {100. * number / statistics.total:6.1f}%')
+
+    echo.echo_success(f'{statistics.cached} of {statistics.total} calculations were taken from the cache')
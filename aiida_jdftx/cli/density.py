@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Command to convert the electron density dumped by jdftx into a cube or XSF file."""
+import click
+
+from aiida.cmdline.params import types
+from aiida.cmdline.utils import decorators, echo
+
+from . import cmd_root
+
+
+@cmd_root.command('density')
+@click.argument('density', type=click.Path(exists=True, dir_okay=False))
+@click.argument('output', type=click.Path(dir_okay=False))
+@click.option('-S', '--structure', required=True, type=types.DataParamType(sub_classes=('aiida.data:structure',)),
+    help='The structure of the run.')
+@click.option('--shape', type=(int, int, int), default=None,
+    help='The shape of the fftbox grid, by default read from the `--stdout` file.')
+@click.option('--stdout', type=click.Path(exists=True, dir_okay=False), default=None,
+    help='The stdout file of the run, from which the shape of the fftbox grid is read.')
+@click.option('-s', '--step', type=click.IntRange(min=1), default=1, show_default=True,
+    help='Keep every STEP grid points along every direction.')
+@click.option('--crop', type=(int, int), multiple=True,
+    help='The range START STOP of the grid points kept along a direction, given once for every direction.')
+@click.option('-F', '--format', 'fileformat', type=click.Choice(['cube', 'xsf']), default=None,
+    help='The format of the OUTPUT file, by default its extension.')
+@decorators.with_dbenv()
+def cmd_density(density, output, structure, shape, stdout, step, crop, fileformat):
+    """Convert the binary DENSITY file dumped by jdftx into the cube or XSF file OUTPUT."""
+    from aiida_jdftx.tools.density import convert_density, get_fftbox_shape
+
+    if shape is None:
+        if stdout is None:
+            echo.echo_critical('specify either the `--shape` of the grid or the `--stdout` file of the run')
+
+        with open(stdout) as handle:
+            shape = get_fftbox_shape(handle.read())
+
+    if crop and len(crop) != 3:
+        echo.echo_critical('the `--crop` option has to be given once for every direction')
+
+    try:
+        convert_density(density, output, structure, shape, step, crop or None, fileformat)
+    except ValueError as exception:
+        echo.echo_critical(str(exception))
+
+    echo.echo_success(f'wrote the density to `{output}`')
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Command to export the results of `JdftxCalculation` nodes to a columnar dataset."""
+import click
+
+from aiida.cmdline.params import options
+from aiida.cmdline.utils import decorators, echo
+
+from . import cmd_root
+
+
+@cmd_root.command('export')
+@click.argument('dirpath', type=click.Path(file_okay=False))
+@options.GROUP(help='Only export the calculations in this group.')
+@click.option('--page-size', type=click.INT, default=1000, show_default=True,
+    help='The number of calculations per page and per Parquet file.')
+@click.option('-t', '--trajectories', is_flag=True, default=False,
+    help='Also export the arrays of the output trajectories.')
+@click.option('-w', '--workers', type=click.INT, default=None,
+    help='The number of processes decoding the trajectory arrays, by default the number of CPUs.')
+@decorators.with_dbenv()
+def cmd_export(dirpath, group, page_size, trajectories, workers):
+    """Export the results of the finished jdftx calculations to a partitioned Parquet dataset in DIRPATH.
+
+    An interrupted export is resumed when the command is run again with the same DIRPATH.
+    """
+    import time
+    from aiida_jdftx.tools.export import export_results
+
+    start = time.perf_counter()
+    number = export_results(dirpath, group=group, page_size=page_size, trajectories=trajectories, max_workers=workers)
+
+    echo.echo_success(f'exported {number} calculations to `{dirpath}` in {time.perf_counter() - start:.1f} s')
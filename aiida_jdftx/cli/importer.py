@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Command to import jdftx runs done outside of AiiDA."""
+import click
+
+from aiida.cmdline.params import options, types
+from aiida.cmdline.utils import decorators, echo
+
+from . import cmd_root
+
+
+@cmd_root.command('import')
+@click.argument('directories', nargs=-1, required=True, type=click.Path(exists=True, file_okay=False))
+@options.COMPUTER(required=True, help='The computer on which the runs were done.')
+@options.CODE(help='The code of the jdftx executable, linked as the `code` input of the calculations.')
+@click.option('-F', '--pseudo-family', type=types.GroupParamType(), default=None,
+    help='The pseudopotential family of the runs, whose pseudopotentials are linked as inputs of the calculations.')
+@options.GROUP(help='Add the imported calculations to this group.')
+@click.option('-w', '--workers', type=click.INT, default=None,
+    help='The number of worker processes, by default the number of CPUs.')
+@click.option('-c', '--chunk-size', type=click.INT, default=50, show_default=True,
+    help='The number of directories imported in a single database transaction.')
+@decorators.with_dbenv()
+def cmd_import(directories, computer, code, pseudo_family, group, workers, chunk_size):
+    """Import the jdftx runs in DIRECTORIES as finished jdftx calculations.
+
+    Every directory has to contain a single `*.in` input file and `*.out` output file of a run, as well as its dumped
+    files as named by the `dump-name` command of the input file.
+    """
+    from aiida_jdftx.tools.importer import import_directories
+
+    with click.progressbar(length=len(directories), label='Importing') as progress:
+
+        def update(number_of_processed):
+            progress.update(number_of_processed - progress.pos)
+
+        report = import_directories(list(directories), computer, code=code, pseudo_family=pseudo_family, group=group,
+                                    max_workers=workers, chunk_size=chunk_size, callback=update)
+
+    for dirpath in report.failed:
+        echo.echo_warning(f'failed to import `{dirpath}`')
+
+    echo.echo_success(f'imported {len(report.imported)} calculations')
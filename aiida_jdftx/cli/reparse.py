@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Command to re-parse finished `JdftxCalculation` nodes with the current parser."""
+import click
+
+from aiida.cmdline.params import options
+from aiida.cmdline.utils import decorators, echo
+
+from . import cmd_root
+
+
+@cmd_root.command('reparse')
+@click.argument('target', type=click.STRING)
+@options.GROUP(help='Only re-parse the calculations in this group.')
+@options.NODES(help='Only re-parse these calculations.')
+@options.PAST_DAYS()
+@options.EXIT_STATUS()
+@click.option('-w', '--workers', type=click.INT, default=None,
+    help='The number of worker processes, by default the number of CPUs.')
+@click.option('-c', '--chunk-size', type=click.INT, default=100, show_default=True,
+    help='The number of calculations sent at once to a worker process.')
+@options.DRY_RUN(help='Only print the number of calculations that would be re-parsed.')
+@decorators.with_dbenv()
+def cmd_reparse(target, group, nodes, past_days, exit_status, workers, chunk_size, dry_run):
+    """Re-parse the finished jdftx calculations into the group with label TARGET.
+
+    The calculations themselves are not modified: every re-parse is stored as a new process with the parsed outputs,
+    which is added to TARGET. Calculations that were already parsed into TARGET with the same retrieved files by the
+    same parser version are skipped. The calculations are selected by the combination of the group, nodes, past days
+    and exit status options.
+    """
+    from aiida import orm
+    from aiida_jdftx.tools.reparse import get_calculation_filters, get_calculations, reparse_calculations
+
+    filters = get_calculation_filters([node.pk for node in nodes or []], past_days, exit_status)
+    pks = get_calculations(group=group, filters=filters)
+
+    if dry_run:
+        echo.echo_info(f'{len(pks)} calculations would be re-parsed into the group `{target}`')
+        return
+
+    target_group, _ = orm.Group.objects.get_or_create(target)
+
+    with click.progressbar(length=len(pks), label='Re-parsing') as progress:
+
+        def update(number_of_processed):
+            progress.update(number_of_processed - progress.pos)
+
+        report = reparse_calculations(pks, target_group, max_workers=workers, chunk_size=chunk_size, callback=update)
+
+    counts = ', '.join(f'{number} {status}' for status, number in sorted(report.counts.items()))
+    rate = len(pks) / report.elapsed if report.elapsed else 0.
+
+    echo.echo_success(f'{counts} in {report.elapsed:.1f} s ({rate:.2f} calculations per second)')
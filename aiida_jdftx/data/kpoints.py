@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Irreducible kpoints of a mesh stored as their indices in the mesh, instead of an explicit list of coordinates."""
+import numpy as np
+
+from aiida import orm
+
+# the largest distance in units of the mesh spacing of a parsed kpoint from the point of the mesh it is matched to
+MESH_TOLERANCE = 1e-4
+
+# the largest difference of the weights computed from the multiplicities and the parsed weights
+WEIGHT_TOLERANCE = 1e-8
+
+
+def get_mesh_kpoints(mesh, offset, indices):
+    """Return the coordinates of the points of a mesh with the given indices, in the interval (-0.5, 0.5].
+
+    The points of the mesh are `(i + offset) / mesh` for the integers `i` between zero and the mesh, indexed in the
+    order of `KpointsData.get_kpoints_mesh(print_list=True)`. Their coordinates are reduced to the interval in which
+    jdftx writes them.
+
+    :param mesh: the number of points along each reciprocal lattice vector
+    :param offset: the offset of the points in units of the mesh spacing
+    :param indices: the indices of the points in the mesh
+    :return: array of the coordinates in reciprocal lattice units
+    """
+    kpoints = (np.stack(np.unravel_index(indices, mesh), axis=-1) + offset) / np.asarray(mesh)
+    return kpoints - np.ceil(kpoints - 0.5)
+
+
+def get_mesh_indices(kpoints, mesh, offset):
+    """Return the indices in a mesh of the given kpoints, or None if any of them is not a point of the mesh.
+
+    :param kpoints: the coordinates of the kpoints in reciprocal lattice units
+    :param mesh: the number of points along each reciprocal lattice vector
+    :param offset: the offset of the points in units of the mesh spacing
+    :return: array of the indices in the order of `get_mesh_kpoints`
+    """
+    grid = np.asarray(kpoints) * np.asarray(mesh) - np.asarray(offset)
+    rounded = np.rint(grid)
+
+    if len(grid) == 0 or np.abs(grid - rounded).max() > MESH_TOLERANCE:
+        return None
+
+    return np.ravel_multi_index(tuple(rounded.astype(int).T), mesh, mode='wrap')
+
+
+class JdftxKpointsData(orm.KpointsData):
+    """Irreducible kpoints of a mesh, stored as their indices in the mesh and their integer multiplicities.
+
+    The kpoints of a dense mesh reduced by symmetry are an explicit list of tens of thousands of coordinates and
+    weights in double precision, which all follow from the mesh, its offset and the indices of the irreducible kpoints.
+    The mesh and offset are returned by `get_kpoints_mesh` as for a mesh, while `get_kpoints` returns the irreducible
+    kpoints and their weights as for an explicit list, rebuilt on the first call and then cached.
+    """
+
+    _cached_kpoints = None
+
+    def initialize(self):
+        super().initialize()
+        self._cached_kpoints = None
+
+    def set_irreducible_kpoints(self, mesh, offset, indices, multiplicities, total_weight=1.):
+        """Set the irreducible kpoints of a mesh.
+
+        :param mesh: the number of points along each reciprocal lattice vector
+        :param offset: the offset of the points in units of the mesh spacing
+        :param indices: the indices of the irreducible kpoints in the mesh, as returned by `get_mesh_indices`
+        :param multiplicities: the number of points of the mesh equivalent to every irreducible kpoint
+        :param total_weight: the sum of the weights of the kpoints
+        """
+        self.set_kpoints_mesh(mesh, offset)
+        self.set_array('indices', np.asarray(indices, dtype=np.int32))
+        self.set_array('multiplicities', np.asarray(multiplicities, dtype=np.int32))
+        self.set_attribute('total_weight', float(total_weight))
+        self._cached_kpoints = None
+
+    @classmethod
+    def from_explicit_kpoints(cls, kpoints, weights, mesh, offset):
+        """Return the compact kpoints of an explicit list of irreducible kpoints of a mesh, or None if not possible.
+
+        The compact kpoints are only returned if every kpoint is a point of the mesh in the interval (-0.5, 0.5] and
+        every weight is an integer multiple of that of a single point, such that `get_kpoints` returns the same list.
+
+        :param kpoints: the coordinates of the kpoints in reciprocal lattice units
+        :param weights: the weights of the kpoints
+        :param mesh: the number of points along each reciprocal lattice vector
+        :param offset: the offset of the points in units of the mesh spacing
+        """
+        indices = get_mesh_indices(kpoints, mesh, offset)
+
+        # the coordinates are only rebuilt as written by jdftx if they are in the interval of `get_mesh_kpoints`
+        if indices is None or np.abs(get_mesh_kpoints(mesh, offset, indices) - kpoints).max() * max(mesh) > MESH_TOLERANCE:
+            return None
+
+        weights = np.asarray(weights, dtype=float)
+        total_weight = weights.sum()
+        multiplicities = np.rint(weights * np.prod(mesh) / total_weight)
+
+        if np.abs(multiplicities * total_weight / np.prod(mesh) - weights).max() > WEIGHT_TOLERANCE:
+            return None
+
+        node = cls()
+        node.set_irreducible_kpoints(mesh, offset, indices, multiplicities, total_weight)
+
+        return node
+
+    def get_kpoints(self, also_weights=False, cartesian=False):
+        """Return the irreducible kpoints, as the `get_kpoints` of an explicit list.
+
+        :param also_weights: if True, returns also the weights
+        :param cartesian: if True, returns the kpoints in Cartesian coordinates, otherwise in crystal coordinates
+        """
+        if self._cached_kpoints is None:
+            mesh, offset = self.get_kpoints_mesh()
+            multiplicities = self.get_array('multiplicities')
+            self._cached_kpoints = (
+                get_mesh_kpoints(mesh, offset, self.get_array('indices')),
+                multiplicities * self.get_attribute('total_weight') / np.prod(mesh),
+            )
+
+        kpoints, weights = (array.copy() for array in self._cached_kpoints)
+
+        if cartesian:
+            kpoints = self._change_reference(kpoints, to_cartesian=True)
+
+        if also_weights:
+            return kpoints, weights
+
+        return kpoints
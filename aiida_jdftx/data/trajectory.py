@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""Trajectory stored as chunks of frames in a single compressed `.npz` file, for runs with very many steps."""
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+
+from aiida import orm
+
+# the names of the arrays of the parsed trajectory that are stored under the names used by `TrajectoryData`
+ARRAY_NAMES = {'lattice_relax': 'cells', 'atomic_positios_relax': 'positions'}
+
+# the arrays stored in single precision if requested
+SINGLE_PRECISION_ARRAYS = ('positions', 'forces')
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def get_member_name(name, chunk):
+    """Return the key in the `.npz` archive of a chunk of frames of an array, i.e. its file name without `.npy`."""
+    return f'{name}.{chunk:06d}'
+
+
+class TrajectoryWriter:
+    """Writer of the frames of a trajectory into a `.npz` archive in a temporary directory.
+
+    The frames of every array are buffered and written to the archive as a single compressed member every `chunk_size`
+    frames, such that only a chunk of frames is ever kept in memory.
+    """
+
+    FILENAME = 'trajectory.npz'
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, single_precision=False):
+        """Construct the writer.
+
+        :param chunk_size: the number of frames of an array written in a single member of the archive
+        :param single_precision: whether to store the positions and forces as single instead of double precision
+        """
+        self.chunk_size = chunk_size
+        self.single_precision = single_precision
+        self.dirpath = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.dirpath, self.FILENAME)
+        self.archive = zipfile.ZipFile(self.filepath, mode='w', compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        self.counts = {}
+        self.last = {}
+        self._buffers = {}
+
+    def append(self, name, value):
+        """Append a frame to an array, which is written to the archive once its chunk is full."""
+        name = ARRAY_NAMES.get(name, name)
+        buffer = self._buffers.setdefault(name, [])
+        buffer.append(value)
+
+        self.counts[name] = self.counts.get(name, 0) + 1
+        self.last[name] = value
+
+        if len(buffer) == self.chunk_size:
+            self._write_chunk(name)
+
+    def _write_chunk(self, name):
+        """Write the buffered frames of an array as the next member of the archive."""
+        buffer = self._buffers.pop(name)
+        array = np.array(buffer)
+
+        if self.single_precision and name in SINGLE_PRECISION_ARRAYS:
+            array = array.astype(np.float32)
+
+        chunk = (self.counts[name] - 1) // self.chunk_size
+
+        with self.archive.open(get_member_name(name, chunk) + '.npy', mode='w', force_zip64=True) as handle:
+            np.lib.format.write_array(handle, array, allow_pickle=False)
+
+    def close(self):
+        """Write the remaining buffered frames and close the archive."""
+        for name in list(self._buffers):
+            self._write_chunk(name)
+
+        self.archive.close()
+
+    def cleanup(self):
+        """Remove the temporary directory of the archive."""
+        shutil.rmtree(self.dirpath, ignore_errors=True)
+
+
+class JdftxTrajectoryData(orm.Data):
+    """Trajectory whose arrays are stored in chunks of frames in a single compressed `.npz` file in the repository.
+
+    Contrary to the `TrajectoryData`, which stores every array as a separate `.npy` file loaded at once, a single frame
+    or chunk of frames can be read without loading the whole trajectory. The `positions` and `cells` arrays are those
+    of the `TrajectoryData`, and `to_trajectory_data` converts it into one.
+    """
+
+    FILENAME = TrajectoryWriter.FILENAME
+
+    def __init__(self, filepath=None, symbols=None, **kwargs):
+        """Construct the node.
+
+        :param filepath: optional path of a `.npz` archive written by a `TrajectoryWriter`
+        :param symbols: the chemical symbols of the sites, required if a `filepath` is given
+        """
+        super().__init__(**kwargs)
+
+        if filepath is not None:
+            self.set_file(filepath, symbols)
+
+    def set_file(self, filepath, symbols):
+        """Store the `.npz` archive written by a `TrajectoryWriter` and the length, shape and type of its arrays.
+
+        :param filepath: the path of the archive
+        :param symbols: the chemical symbols of the sites
+        """
+        arrays = {}
+        pattern = re.compile(r'(?P<name>.+)\.(?P<chunk>\d{6})\.npy$')
+
+        with zipfile.ZipFile(filepath) as archive:
+            for member in archive.namelist():
+                match = pattern.match(member)
+                with archive.open(member) as handle:
+                    # only the header of the member is read, not its frames
+                    if np.lib.format.read_magic(handle) == (1, 0):
+                        shape, _, dtype = np.lib.format.read_array_header_1_0(handle)
+                    else:
+                        shape, _, dtype = np.lib.format.read_array_header_2_0(handle)
+
+                array = arrays.setdefault(match.group('name'), {'length': 0, 'chunk_size': 0})
+                array['length'] += shape[0]
+                array['chunk_size'] = max(array['chunk_size'], shape[0])
+                array['shape'] = list(shape[1:])
+                array['dtype'] = dtype.str
+
+        self.put_object_from_file(filepath, self.FILENAME)
+        self.set_attribute('symbols', list(symbols))
+        self.set_attribute('arrays', arrays)
+
+    @property
+    def symbols(self):
+        """Return the chemical symbols of the sites."""
+        return self.get_attribute('symbols')
+
+    @property
+    def numsteps(self):
+        """Return the number of steps, i.e. of frames of the positions."""
+        return self.get_array_length('positions')
+
+    def get_arraynames(self):
+        """Return the names of the stored arrays."""
+        return list(self.get_attribute('arrays'))
+
+    def get_array_length(self, name):
+        """Return the number of frames of an array."""
+        return self.get_attribute('arrays')[name]['length']
+
+    def iter_chunks(self, name):
+        """Yield the chunks of frames of an array in order, each loaded only when it is reached."""
+        array = self.get_attribute('arrays')[name]
+        number_of_chunks = -(-array['length'] // array['chunk_size'])
+
+        with self.open(self.FILENAME, mode='rb') as handle, np.load(handle, allow_pickle=False) as archive:
+            for chunk in range(number_of_chunks):
+                yield archive[get_member_name(name, chunk)]
+
+    def get_frame(self, name, index):
+        """Return a single frame of an array, loading only the chunk that contains it.
+
+        :param name: the name of the array
+        :param index: the index of the frame, which can be negative to count from the end
+        """
+        array = self.get_attribute('arrays')[name]
+        length = array['length']
+
+        if not -length <= index < length:
+            raise IndexError(f'frame {index} is out of range for the {length} frames of `{name}`')
+
+        chunk, offset = divmod(index % length, array['chunk_size'])
+
+        with self.open(self.FILENAME, mode='rb') as handle, np.load(handle, allow_pickle=False) as archive:
+            return archive[get_member_name(name, chunk)][offset]
+
+    def get_array(self, name):
+        """Return all frames of an array, as the `get_array` of a `TrajectoryData`."""
+        return np.concatenate(list(self.iter_chunks(name)))
+
+    def to_trajectory_data(self):
+        """Return an unstored `TrajectoryData` with all arrays of this trajectory.
+
+        The positions stored in single precision are converted to double precision, as required by `TrajectoryData`.
+        """
+        positions = self.get_array('positions').astype(float)
+
+        trajectory = orm.TrajectoryData()
+        trajectory.set_trajectory(
+            stepids=np.arange(len(positions)),
+            cells=self.get_array('cells'),
+            positions=positions,
+            symbols=self.symbols,
+        )
+
+        for name in self.get_arraynames():
+            if name not in ('positions', 'cells'):
+                trajectory.set_array(name, self.get_array(name))
+
+        return trajectory
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Reading of jdftx input files into their commands.
+
+This module only depends on the standard library, such that the input file can be read without loading AiiDA, e.g. by
+the mock jdftx executable of `aiida_jdftx.tools.mock`.
+"""
+import os
+import re
+
+
+def read_input_commands(filepath):
+    """Return the list of the commands and their arguments in a jdftx input file.
+
+    Comments are removed, the lines continued with a trailing backslash are joined and included files are read in
+    place, relative to the directory of the including file.
+
+    :param filepath: the path of the input file
+    :return: list of tuples of the command name and the string of its arguments
+    """
+    with open(filepath) as handle:
+        content = handle.read()
+
+    commands = []
+
+    for line in re.sub(r'\\[ \t]*\n', ' ', content).split('\n'):
+        line = line.split('#')[0].strip()
+
+        if not line:
+            continue
+
+        command, _, arguments = line.partition(' ')
+        arguments = ' '.join(arguments.split())
+
+        if command == 'include':
+            commands.extend(read_input_commands(os.path.join(os.path.dirname(filepath), arguments)))
+        else:
+            commands.append((command, arguments))
+
+    return commands
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""Monitoring of running jdftx calculations to stop electronic minimizations that diverge or stall.
+
+This module only depends on the standard library, such that it can also run as a standalone watchdog script on the
+compute node, see `get_script`. The watchdog is started in the background before jdftx, follows its stdout and kills it
+as soon as its electronic minimization diverges or stalls, instead of letting it use the rest of the allocation. The
+parser then finds the same divergence in the last minimization of the stdout.
+"""
+import inspect
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+# the default thresholds, which can be overridden through the `monitor` key of the `settings` input
+DEFAULT_THRESHOLDS = {
+    # number of consecutive iterations in which the gradient (or SCF residual) increases
+    'gradient_increase_steps': 10,
+    # number of `Line minimization failed` messages in a single electronic minimization
+    'linmin_failures': 3,
+    # number of consecutive iterations in which the energy change alternates sign
+    'oscillation_steps': 12,
+    # number of iterations over which the energy should decrease by more than `stall_energy` Hartree
+    'stall_steps': 50,
+    'stall_energy': 1e-7,
+}
+
+# the interval in seconds at which the watchdog reads the new part of the stdout
+WATCHDOG_INTERVAL = 10.
+
+
+class ElecMinimizeMonitor:
+    """Incremental parser of jdftx stdout that detects diverging or stalled electronic minimizations.
+
+    The stdout is fed in arbitrary chunks with `feed`, incomplete lines being kept until the rest arrives. Both the
+    `ElecMinimize` and the `SCF` iterations are followed, the latter using the residual instead of the gradient.
+    """
+
+    def __init__(self, thresholds=None):
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.offset = 0
+        self.done = False
+        self._buffer = ''
+        self._reset()
+
+    def _reset(self):
+        """Reset the history at the start of a new electronic minimization."""
+        self.energies = []
+        self.gradients = []
+        self.linmin_failures = 0
+
+    def feed(self, text):
+        """Parse a new chunk of the stdout."""
+        self.offset += len(text)
+        lines = (self._buffer + text).split('\n')
+        self._buffer = lines.pop()
+
+        for line in lines:
+            self.parse_line(line)
+
+    def parse_line(self, line):
+        """Parse a single complete line of the stdout."""
+        if line.startswith('-------- Electronic minimization'):
+            self._reset()
+        elif line.startswith(('ElecMinimize: Iter:', 'SCF: Cycle:')):
+            values = line.split()
+            self.energies.append(float(values[values.index('Etot:') + 1]))
+            key = '|grad|_K:' if '|grad|_K:' in values else '|Residual|:'
+            if key in values:
+                self.gradients.append(float(values[values.index(key) + 1]))
+        elif 'Line minimization failed' in line:
+            self.linmin_failures += 1
+        elif line.startswith('Done!'):
+            self.done = True
+
+    def check(self):
+        """Return the reason why the current electronic minimization should be stopped, or None."""
+        thresholds = self.thresholds
+
+        steps = thresholds['gradient_increase_steps']
+        if len(self.gradients) > steps and all(
+                later > earlier for earlier, later in zip(self.gradients[-steps - 1:-1], self.gradients[-steps:])):
+            return f'the gradient increased for {steps} consecutive iterations'
+
+        if self.linmin_failures >= thresholds['linmin_failures']:
+            return f'the line minimization failed {self.linmin_failures} times'
+
+        steps = thresholds['oscillation_steps']
+        if len(self.energies) > steps + 1:
+            energies = self.energies[-steps - 2:]
+            differences = [later - earlier for earlier, later in zip(energies[:-1], energies[1:])]
+            if all(first * second < 0 for first, second in zip(differences[:-1], differences[1:])):
+                return f'the energy oscillated for {steps} consecutive iterations'
+
+        steps = thresholds['stall_steps']
+        if len(self.energies) > steps and self.energies[-steps - 1] - self.energies[-1] < thresholds['stall_energy']:
+            return f'the energy decreased by less than {thresholds["stall_energy"]} Hartree in {steps} iterations'
+
+        return None
+
+
+def get_thresholds(node, **kwargs):
+    """Return the monitor thresholds of a calculation from its `settings`, updated with the explicit `kwargs`."""
+    thresholds = {}
+
+    if 'settings' in node.inputs:
+        thresholds.update(node.inputs.settings.get_dict().get('monitor', {}))
+
+    thresholds.update(kwargs)
+
+    return thresholds
+
+
+def get_child_pids(pid):
+    """Return the pids of the child processes of a process, from `/proc` if it exists and with `pgrep` otherwise."""
+    if os.path.isdir('/proc'):
+        pids = []
+        for name in os.listdir('/proc'):
+            try:
+                with open(f'/proc/{name}/stat') as handle:
+                    # the parent pid is the second field after the command name in parentheses
+                    if int(handle.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        pids.append(int(name))
+            except (OSError, ValueError, IndexError):
+                continue
+        return pids
+
+    process = subprocess.run(['pgrep', '-P', str(pid)], stdout=subprocess.PIPE, universal_newlines=True, check=False)
+    return [int(value) for value in process.stdout.split()]
+
+
+def is_running(pid):
+    """Return whether the process with the given pid is running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+
+def watch(filepath, thresholds=None, pid=None, interval=WATCHDOG_INTERVAL):
+    """Follow the stdout of a running jdftx and kill it if its electronic minimization diverges or stalls.
+
+    The jdftx process is found as a child of the shell of the job, which also started the watchdog. Every other child
+    of the shell is killed, which is the jdftx or `mpirun` command running in the foreground.
+
+    :param filepath: the path of the stdout file
+    :param thresholds: the thresholds of the `ElecMinimizeMonitor`
+    :param pid: the pid of the shell of the job, by default the parent process
+    :param interval: the interval in seconds between two reads of the stdout
+    :return: the reason why jdftx was killed, or None if the run ended or the shell exited
+    """
+    pid = os.getppid() if pid is None else pid
+    monitor = ElecMinimizeMonitor(thresholds)
+    offset = 0
+
+    while is_running(pid):
+        try:
+            with open(filepath, 'rb') as handle:
+                handle.seek(offset)
+                content = handle.read()
+        except FileNotFoundError:
+            content = b''
+
+        offset += len(content)
+        monitor.feed(content.decode('utf-8', errors='replace'))
+
+        if monitor.done:
+            return None
+
+        reason = monitor.check()
+
+        if reason is not None:
+            for child in get_child_pids(pid):
+                if child != os.getpid():
+                    try:
+                        os.kill(child, signal.SIGTERM)
+                    except ProcessLookupError:
+                        pass
+            return reason
+
+        time.sleep(interval)
+
+    return None
+
+
+def get_script():
+    """Return the source of the standalone watchdog script, which is run in the background of the job as::
+
+        python aiida_monitor.py STDOUT THRESHOLDS &
+
+    where `THRESHOLDS` is the JSON of the thresholds of the `monitor` setting. The reason why jdftx was killed, if any,
+    is written to the stderr of the job.
+    """
+    return inspect.getsource(sys.modules[__name__])
+
+
+def main(argv):
+    """Run the watchdog on the stdout file given on the command line, see `get_script`."""
+    filepath, thresholds = argv[:2]
+    reason = watch(filepath, json.loads(thresholds))
+
+    if reason is not None:
+        sys.stderr.write(f'jdftx was stopped by the aiida-jdftx watchdog: {reason}\n')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
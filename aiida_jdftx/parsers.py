@@ -5,6 +5,12 @@ Parsers provided by aiida_jdftx.
 Register parsers via the "aiida.parsers" entry point in setup.json.
 """
 #pylint: disable=too-many-nested-blocks, too-many-branches
+import contextlib
+import functools
+import io
+import os
+import re
+
 import numpy as np
 
 from aiida import orm
@@ -13,12 +19,34 @@ from aiida.plugins import CalculationFactory
 from aiida.common import OutputParsingError, exceptions
 
 from ._constants import CONSTANTS
-
-JdftxCalculation = CalculationFactory('jdftx')
+from .cache import get_parse_cache
+from .monitors import ElecMinimizeMonitor, get_thresholds
+from .profiling import phase, phased, profiled
+from .stdout import (
+    SUMMARY_SUFFIX_ARRAYS,
+    SUMMARY_SUFFIX_PARAMETERS,
+    get_energy_key_from_line,
+    grep_energy_from_line,
+    parse_stdout_content,
+    read_summary,
+)
 
 units_suffix = '_units'
 default_energy_units = 'eV'
 
+# the number of processes in which a large stdout is parsed, by default it is parsed in the parser process
+ENV_PROCESSES = 'AIIDA_JDFTX_PARSE_PROCESSES'
+
+# the size in bytes above which the stdout is parsed in several processes, if enabled
+PARALLEL_STDOUT_SIZE = 64 * 1024**2
+
+# the number of threads reading the retrieved files of a stage
+PREFETCH_THREADS = 4
+
+# the suffixes of the density of states dumped by a run and the labels of their channels, without and with spin
+DOS_SUFFIXES = ({'dos': ''}, {'dosUp': ' (up)', 'dosDn': ' (down)'})
+DOS_UNITS = 'states/eV'
+
 
 class JdftxOutputParsingError(OutputParsingError):
     """Exception raised when there is a parsing error in the Jdftx parser."""
@@ -38,46 +66,390 @@ class JdftxParser(Parser):
         :param type node: :class:`aiida.orm.ProcessNode`
         """
         super().__init__(node)
-        if not issubclass(node.process_class, JdftxCalculation):
+        # resolved here rather than at import, such that loading the parser entry point does not load the calculation
+        if not issubclass(node.process_class, CalculationFactory('jdftx')):
             raise exceptions.ParsingError('Can only parse JdftxCalculation')
 
+    @profiled('parse')
     def parse(self, **kwargs):
         """
         Parse outputs, store results in database.
 
+        If the parse cache is enabled, the products of a previous parse of the same retrieved files by the same parser
+        version are reused instead.
+
         :returns: an exit code, if parsing fails (or nothing if parsing succeeds)
         """
-        self.exit_code_stdout = None
+        cache = get_parse_cache()
 
-        parsed_stdout = self.parse_stdout()
+        if cache is not None:
+            with phase('cache lookup'):
+                key = cache.get_key(self.node, get_retrieved_hash(self.retrieved), get_parser_version())
+                cached = cache.load(key)
 
-        parameters = parsed_stdout.pop('parameters', {})
-        ecomponents = self.parsed_ecomponents()
-        parameters.update(ecomponents)
+            if cached is not None:
+                outputs, exit_code = cached
+                for link_label, output in outputs.items():
+                    self.out(link_label, output)
+                return exit_code
 
-        output_parameters = orm.Dict(dict=parameters)
-        parsed_trajectory = parsed_stdout.pop('trajectory', {})
-        output_structure = self.parsed_structure()
-        output_trajectory = self.build_output_trajectory(
-            parsed_trajectory, output_structure)
-        output_kpoints = self.parsed_kpoints(output_structure)
+        exit_code = self.parse_outputs()
 
-        self.out('output_parameters', output_parameters)
+        if cache is not None:
+            cache.save(key, self.outputs, exit_code)
 
-        if output_kpoints:
-            self.out('output_kpoints', output_kpoints)
+        return exit_code
 
-        if output_trajectory:
-            self.out('output_trajectory', output_trajectory)
+    def parse_outputs(self):
+        """Parse the retrieved files of a single run or of all stages of a chain and register the output nodes.
 
-        if not output_structure.is_stored:
-            self.out('output_structure', output_structure)
+        :returns: an exit code, if parsing fails (or nothing if parsing succeeds)
+        """
+        self.exit_code_stdout = None
+
+        if 'stages' in self.node.inputs:
+            self.parse_stages()
+            return self.exit_code_stdout
+
+        outputs = self.parse_stage(
+            self.node.get_option('output_filename'),
+            self.node.process_class._DUMP_PREFIX,  # pylint: disable=protected-access
+            self.node.inputs.structure,
+            self.node.inputs.kpoints,
+        )
+
+        for link_label, output in outputs.items():
+            self.out(link_label, output)
 
         if self.exit_code_stdout:
             return self.exit_code_stdout
         return None
 
+    def parse_stages(self):
+        """Parse every stage of a `JdftxChainCalculation` into the output namespace named after it.
+
+        The input structure of every stage is the output structure of the previous one.
+        """
+        structure = self.node.inputs.structure
+
+        for stage in self.node.inputs.stages.get_list():
+            name = stage['name']
+            kpoints = self.node.inputs.kpoints
+
+            # inputs in a namespace are linked with the namespace and port names joined by a double underscore
+            if f'stage_kpoints__{name}' in self.node.inputs:
+                kpoints = self.node.inputs[f'stage_kpoints__{name}']
+
+            outputs = self.parse_stage(f'{name}.out', name, structure, kpoints)
+
+            for link_label, output in outputs.items():
+                self.out(f'stages.{name}.{link_label}', output)
+
+            structure = outputs.get('output_structure', structure)
+
+    def parse_stage(self, filename_stdout: str, prefix: str, structure: orm.StructureData,
+                    kpoints: orm.KpointsData) -> dict:
+        """Parse the output files of a single jdftx run into a dictionary of output nodes.
+
+        :param filename_stdout: the name of the stdout file of the run
+        :param prefix: the `dump-name` prefix of the files dumped by the run
+        :param structure: the input structure of the run
+        :param kpoints: the input kpoints of the run
+        :return: dictionary of output nodes keyed by their link label
+        """
+        outputs = self.get_produced_outputs()
+
+        dumped = ['Ecomponents']
+        dumped += ['lattice', 'ionpos'] if 'output_structure' in outputs else []
+        dumped += ['kPts'] if outputs & {'output_kpoints', 'output_band'} else []
+        dumped += ['eigenvals'] if 'output_band' in outputs else []
+        dumped += [suffix for suffixes in DOS_SUFFIXES for suffix in suffixes] if 'output_dos' in outputs else []
+
+        filenames = [
+            filename_stdout,
+            filename_stdout + SUMMARY_SUFFIX_PARAMETERS,
+            filename_stdout + SUMMARY_SUFFIX_ARRAYS,
+        ] + [f'{prefix}.{suffix}' for suffix in dumped]
+
+        with phase(f'stage {prefix}'), self.prefetch(filenames):
+            writer = self.get_trajectory_writer() if 'output_trajectory' in outputs else None
+
+            try:
+                parsed_stdout = self.parse_stdout(filename_stdout, structure, writer)
+
+                parameters = parsed_stdout.pop('parameters', {})
+                performance = parsed_stdout.pop('performance', {})
+                geometry = parsed_stdout.pop('geometry', None)
+
+                parsed_trajectory = parsed_stdout.pop('trajectory', {})
+                if writer is not None:
+                    # the frames were written to the archive, of which only the last ones are needed here
+                    parsed_trajectory = {name: [frame] for name, frame in writer.last.items()}
+
+                if geometry is not None:
+                    # the files dumped at the end of the run are missing: the outputs are those of its last complete
+                    # step and the exit code set by `parse_stdout` is kept
+                    exit_code_stdout = self.exit_code_stdout
+                    parameters.update(self.get_last_energies(parsed_trajectory))
+                    output_structure = self.build_partial_structure(geometry, structure)
+                elif 'output_structure' in outputs:
+                    parameters.update(self.parsed_ecomponents(prefix))
+                    output_structure = self.parsed_structure(prefix, structure)
+                else:
+                    # the final structure is only needed for the summary, from the last step of the trajectory
+                    parameters.update(self.parsed_ecomponents(prefix))
+                    output_structure = self.build_last_structure(parsed_trajectory, structure)
+
+                parameters.update(self.build_summary(parameters, performance, parsed_trajectory, output_structure))
+
+                if writer is not None:
+                    output_trajectory = self.build_compact_trajectory(writer, output_structure)
+                elif 'output_trajectory' in outputs:
+                    output_trajectory = self.build_output_trajectory(parsed_trajectory, output_structure)
+                else:
+                    output_trajectory = None
+                    parameters.update(self.build_summary_arrays(parsed_trajectory))
+            finally:
+                if writer is not None:
+                    writer.cleanup()
+
+            output_parameters = orm.Dict(dict=parameters)
+            output_kpoints = None
+            output_band = None
+            output_dos = None
+
+            if outputs & {'output_kpoints', 'output_band'}:
+                output_kpoints = self.parsed_kpoints(output_structure, prefix, kpoints)
+
+            if 'output_band' in outputs:
+                output_band = self.parsed_bands(parameters, output_kpoints, prefix, kpoints)
+
+            if 'output_dos' in outputs:
+                output_dos = self.parsed_dos(prefix)
+
+            if geometry is not None:
+                self.exit_code_stdout = exit_code_stdout
+
+            results = {'output_parameters': output_parameters}
+
+            if performance and 'output_performance' in outputs:
+                results['output_performance'] = orm.Dict(dict=performance)
+
+            if output_kpoints and 'output_kpoints' in outputs:
+                results['output_kpoints'] = output_kpoints
+
+            if output_band:
+                results['output_band'] = output_band
+
+            if output_dos:
+                results['output_dos'] = output_dos
+
+            if output_trajectory:
+                results['output_trajectory'] = output_trajectory
+
+            # the structure of a run that was stopped is always produced, since the run is restarted from it
+            if not output_structure.is_stored and ('output_structure' in outputs or geometry is not None):
+                results['output_structure'] = output_structure
+
+            return results
+
+    def get_produced_outputs(self):
+        """Return the set of the optional outputs to produce, all of them unless the `lightweight` setting is set.
+
+        In the lightweight mode only the `output_parameters` are produced, with the compact arrays of
+        `build_summary_arrays`, and the other outputs on request. The files behind the outputs that are not produced
+        are neither read nor parsed.
+        """
+        from .calculations import OPTIONAL_OUTPUTS, get_requested_outputs
+
+        settings = self.node.inputs.settings.get_dict() if 'settings' in self.node.inputs else {}
+        outputs = get_requested_outputs(settings)
+
+        return set(OPTIONAL_OUTPUTS) if outputs is None else outputs
+
+    @contextlib.contextmanager
+    def prefetch(self, filenames):
+        """Context manager in which the retrieved files are read concurrently in a pool of threads.
+
+        The reads of the files from the repository overlap with each other and with the parsing of the files read
+        first, while the files are still parsed one after the other in the order of `parse_stage`. The exit codes are
+        thus set in the same order as without prefetching and the last one set wins, as before.
+
+        :param filenames: the names of the files to read, of which those that were not retrieved are ignored
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        retrieved = set(self.retrieved.list_object_names())
+
+        with ThreadPoolExecutor(max_workers=PREFETCH_THREADS) as executor:
+            self._prefetched = {
+                filename: executor.submit(self.retrieved.get_object_content, filename, mode='rb')
+                for filename in filenames if filename in retrieved
+            }
+            try:
+                yield
+            finally:
+                for future in self._prefetched.values():
+                    future.cancel()
+                self._prefetched = {}
+
+    def get_object_content(self, filename, mode='r'):
+        """Return the content of a retrieved file, prefetched if it was passed to `prefetch`.
+
+        :raises IOError: if the file cannot be read, when its content is requested
+        """
+        future = getattr(self, '_prefetched', {}).get(filename)
+
+        with phase(f'read {filename}'):
+            if future is None:
+                return self.retrieved.get_object_content(filename, mode=mode)
+
+            content = future.result()
+
+        return content.decode('utf-8') if mode == 'r' else content
+
+    @staticmethod
+    def get_last_energies(parsed_trajectory):
+        """Return the energy components of the last step of the parsed trajectory, with their units."""
+        energies = {}
+
+        for key, frames in parsed_trajectory.items():
+            if key.startswith('energy_') and len(frames):
+                energies[key] = float(frames[-1])
+                energies[key + units_suffix] = default_energy_units
+
+        return energies
+
+    @staticmethod
+    def build_partial_structure(geometry, structure):
+        """Return the structure of the last complete ionic step of a run that was stopped, with the kinds of the input.
+
+        :param geometry: the `geometry` parsed from the stdout, with the cell and the positions in angstrom
+        :param structure: the input structure of the run
+        """
+        partial_structure = structure.clone()
+        partial_structure.reset_cell(geometry['cell'])
+        partial_structure.reset_sites_positions(geometry['positions'])
+
+        return partial_structure
+
+    @staticmethod
+    def build_last_structure(parsed_trajectory, structure):
+        """Return the structure of the last step of the parsed trajectory, or the input structure if it did not change.
+
+        :param parsed_trajectory: the parsed trajectory arrays, with the cells and positions in angstrom of a run with
+            ionic or lattice iterations
+        :param structure: the input structure of the run
+        """
+        if 'lattice_relax' not in parsed_trajectory and 'atomic_positios_relax' not in parsed_trajectory:
+            return structure
+
+        cells = parsed_trajectory.get('lattice_relax', [structure.cell])
+        positions = parsed_trajectory.get('atomic_positios_relax', [[site.position for site in structure.sites]])
+        geometry = {'cell': np.asarray(cells[-1]).tolist(), 'positions': np.asarray(positions[-1]).tolist()}
+
+        return JdftxParser.build_partial_structure(geometry, structure)
+
+    @staticmethod
+    def build_summary_arrays(parsed_trajectory):
+        """Return the compact arrays of a run in the lightweight mode, that are added to the `output_parameters`.
+
+        They are the energy and the largest force of every ionic step and the cell and positions of the last step of a
+        run with ionic or lattice iterations, stored as lists in the attributes instead of the `output_trajectory` and
+        `output_structure` nodes.
+
+        :param parsed_trajectory: the parsed trajectory arrays
+        """
+        arrays = {}
+
+        energies = parsed_trajectory.get('energy_free', parsed_trajectory.get('energy_total'))
+        if energies is not None and len(energies):
+            arrays['energies'] = np.asarray(energies, dtype=float).tolist()
+            arrays['energies' + units_suffix] = default_energy_units
+
+        if parsed_trajectory.get('forces'):
+            arrays['max_forces'] = np.linalg.norm(np.asarray(parsed_trajectory['forces']), axis=-1).max(axis=-1).tolist()
+            arrays['max_forces' + units_suffix] = 'eV/angstrom'
+
+        for key, name in (('lattice_relax', 'cell'), ('atomic_positios_relax', 'positions')):
+            if len(parsed_trajectory.get(key, [])):
+                arrays[name] = np.asarray(parsed_trajectory[key][-1], dtype=float).tolist()
+                arrays[name + units_suffix] = 'angstrom'
+
+        return arrays
+
+    @staticmethod
+    def build_summary(parameters, performance, parsed_trajectory, structure):
+        """Return the fixed set of summary values of a run, that are added to the `output_parameters`.
+
+        They allow to filter runs with the `QueryBuilder` on the attributes of a single node, without loading the
+        arrays of the trajectory from the repository.
+
+        :param parameters: the parsed output parameters, with the energies and the convergence flag
+        :param performance: the parsed performance metrics, with the numbers of iterations
+        :param parsed_trajectory: the parsed trajectory arrays, with the forces in eV/angstrom
+        :param structure: the final structure of the run
+        """
+        number_of_atoms = len(structure.sites)
+
+        summary = {
+            'formula': structure.get_formula(),
+            'number_of_atoms': number_of_atoms,
+            'number_of_ionic_steps': performance.get('number_of_ionic_steps', 0),
+            'number_of_electronic_iterations': performance.get('number_of_electronic_iterations', 0),
+            'volume': structure.get_cell_volume(),
+            'volume_units': 'angstrom^3',
+        }
+
+        # the free energy includes the electronic entropy of calculations with smearing
+        energy = parameters.get('energy_free', parameters.get('energy_total'))
+        if energy is not None and number_of_atoms:
+            summary['energy_per_atom'] = energy / number_of_atoms
+            summary['energy_per_atom' + units_suffix] = default_energy_units
+
+        if parsed_trajectory.get('forces'):
+            summary['max_force'] = float(np.linalg.norm(parsed_trajectory['forces'][-1], axis=1).max())
+            summary['max_force' + units_suffix] = 'eV/angstrom'
+
+        return summary
+
+    def get_trajectory_writer(self):
+        """Return the `TrajectoryWriter` of the `output_trajectory` if the `compact_trajectory` setting is set.
+
+        The setting is either True or a dictionary with the `chunk_size` and `single_precision` of the writer.
+        """
+        settings = self.node.inputs.settings.get_dict() if 'settings' in self.node.inputs else {}
+        compact_trajectory = settings.get('compact_trajectory')
+
+        if not compact_trajectory:
+            return None
+
+        from .data.trajectory import TrajectoryWriter
+
+        return TrajectoryWriter(**(compact_trajectory if isinstance(compact_trajectory, dict) else {}))
+
+    @staticmethod
+    @phased('build compact trajectory')
+    def build_compact_trajectory(writer, structure):
+        """Return the `JdftxTrajectoryData` of the frames written by the writer.
+
+        As for `build_output_trajectory`, the cell and positions of the structure are the single frame of a run without
+        ionic or lattice iteration.
+        """
+        if 'cells' not in writer.counts:
+            writer.append('cells', np.array(structure.cell))
+
+        if 'positions' not in writer.counts:
+            writer.append('positions', np.array([site.position for site in structure.sites]))
+
+        from .data.trajectory import JdftxTrajectoryData
+
+        writer.close()
+
+        return JdftxTrajectoryData(writer.filepath, symbols=[str(site.kind_name) for site in structure.sites])
+
     @staticmethod
+    @phased('build trajectory')
     def build_output_trajectory(parsed_trajectory, structure):
         """doc"""
         try:
@@ -109,50 +481,161 @@ class JdftxParser(Parser):
 
         return trajectory
 
-    def parsed_kpoints(self, structure: orm.StructureData) -> orm.KpointsData:
-        """Parse kpoints from end dumped file `aiida.kPts`"""
-        filename = 'aiida.kPts'
+    @phased('parse kpoints')
+    def parsed_kpoints(self, structure: orm.StructureData, prefix: str = 'aiida',
+                       input_kpoints: orm.KpointsData = None) -> orm.KpointsData:
+        """Parse kpoints from end dumped file `aiida.kPts`
+
+        The irreducible kpoints of an input mesh are stored as a `JdftxKpointsData` of their indices in the mesh,
+        unless they are not all points of the mesh, and those of an explicit list as an explicit list.
+
+        :param structure: the structure of which the cell is set on the kpoints
+        :param prefix: the `dump-name` prefix of the dumped files
+        :param input_kpoints: the input kpoints of the run
+        """
+        filename = f'{prefix}.kPts'
 
         if filename not in self.retrieved.list_object_names():
             self.exit_code_stdout = self.exit_codes.ERROR_OUTPUT_STDOUT_MISSING
             return None
 
         try:
-            stdout = self.retrieved.get_object_content(filename)
+            stdout = self.get_object_content(filename)
         except IOError:
             self.exit_code_stdout = self.exit_codes.ERROR_OUTPUT_STDOUT_READ
             return None
 
-        # parse kpoints
-        data_lines = stdout.strip().split('\n')
+        kpoints_list, kpoints_weights = read_kpoints(stdout)
+        kpoints = None
 
-        kpoints_list = []
-        kpoints_weights = []
-        for line in data_lines:
-            kpoints_list.append(
-                [float(i) for i in line.split('[')[1].split(']')[0].split()])
-            kpoints_weights.append(float(line.split('[')[1].split(']')[1]))
+        try:
+            mesh, offset = input_kpoints.get_kpoints_mesh()
+        except AttributeError:
+            pass
+        else:
+            from .data.kpoints import JdftxKpointsData
+            kpoints = JdftxKpointsData.from_explicit_kpoints(kpoints_list, kpoints_weights, mesh, offset)
+
+        if kpoints is None:
+            kpoints = orm.KpointsData()
+            kpoints.set_kpoints(kpoints_list, weights=kpoints_weights, cartesian=False)
 
-        kpoints = orm.KpointsData()
         kpoints.set_cell_from_structure(structure)
-        kpoints.set_kpoints(kpoints_list,
-                            weights=kpoints_weights,
-                            cartesian=False)
 
         return kpoints
 
-    def parsed_ecomponents(self) -> dict:
+    @phased('parse bands')
+    def parsed_bands(self, parameters: dict, kpoints: orm.KpointsData, prefix: str = 'aiida',
+                     input_kpoints: orm.KpointsData = None) -> orm.BandsData:
+        """Parse the band eigenvalues from the end dumped binary file `aiida.eigenvals`
+
+        The file is only dumped when the calculation is run on an explicit list of kpoints. The eigenvalues are
+        stored as doubles in Hartree, with one row of `number_of_bands` values for every state.
+
+        :param parameters: the parsed output parameters, which should contain the number of bands
+        :param kpoints: the kpoints actually used by jdftx, as parsed from `aiida.kPts`
+        :param prefix: the `dump-name` prefix of the dumped files
+        :param input_kpoints: the input kpoints, used instead of the parsed ones to keep their labels
+        """
+        filename = f'{prefix}.eigenvals'
+
+        if filename not in self.retrieved.list_object_names():
+            return None
+
+        try:
+            content = self.get_object_content(filename, mode='rb')
+        except IOError:
+            self.exit_code_stdout = self.exit_codes.ERROR_OUTPUT_STDOUT_READ
+            return None
+
+        number_of_bands = parameters.get('number_of_bands')
+        if not number_of_bands:
+            return None
+
+        eigenvalues = np.frombuffer(content, dtype=np.float64).reshape(-1, number_of_bands)
+        eigenvalues = eigenvalues * CONSTANTS.har_to_ev
+
+        if parameters.get('spin_type') == 'z-spin':
+            # the states of the spin-down channel follow all those of the spin-up channel
+            eigenvalues = eigenvalues.reshape(2, -1, number_of_bands)
+
+        # prefer the input kpoints which may carry labels, if jdftx did not reduce them under symmetry
+        try:
+            if len(input_kpoints.get_kpoints()) == eigenvalues.shape[-2]:
+                kpoints = input_kpoints
+        except AttributeError:
+            pass
+
+        if kpoints is None:
+            return None
+
+        bands = orm.BandsData()
+        bands.set_kpointsdata(kpoints)
+        bands.set_bands(eigenvalues, units='eV')
+
+        return bands
+
+    @phased('parse dos')
+    def parsed_dos(self, prefix: str = 'aiida') -> orm.XyData:
+        """Parse the total and projected density of states from the end dumped file `aiida.dos`
+
+        A spin-polarized run dumps the channels of each spin in `aiida.dosUp` and `aiida.dosDn` instead, which are
+        merged with the spin appended to the names of their columns.
+
+        :param prefix: the `dump-name` prefix of the dumped files
+        :return: `XyData` with the energies in eV as x and a y array in states/eV for every column, or None if the
+            density of states was not dumped
+        """
+        retrieved = self.retrieved.list_object_names()
+
+        suffixes = next(
+            (suffixes for suffixes in DOS_SUFFIXES if all(f'{prefix}.{suffix}' in retrieved for suffix in suffixes)),
+            None
+        )
+
+        if suffixes is None:
+            return None
+
+        names, tables = [], []
+
+        for suffix, label in suffixes.items():
+            try:
+                columns, table = read_dos(self.get_object_content(f'{prefix}.{suffix}'))
+            except IOError:
+                self.exit_code_stdout = self.exit_codes.ERROR_OUTPUT_STDOUT_READ
+                return None
+
+            names += [f'{column}{label}' for column in columns[1:]]
+            tables.append(table)
+
+        energies = tables[0][:, 0]
+
+        if any(table.shape[0] != energies.shape[0] or np.any(table[:, 0] != energies) for table in tables[1:]):
+            # the density of states is linear between the energies of each table, which are merged
+            energies = np.unique(np.concatenate([table[:, 0] for table in tables]))
+            densities = [np.interp(energies, table[:, 0], column, 0., 0.) for table in tables for column in table[:, 1:].T]
+        else:
+            densities = [column for table in tables for column in table[:, 1:].T]
+
+        dos = orm.XyData()
+        dos.set_x(energies, 'Energy', default_energy_units)
+        dos.set_y(densities, names, [DOS_UNITS] * len(names))
+
+        return dos
+
+    @phased('parse ecomponents')
+    def parsed_ecomponents(self, prefix: str = 'aiida') -> dict:
         """
         parse `aiida.Ecomponents` and return a dict of energies
         """
-        filename = 'aiida.Ecomponents'
+        filename = f'{prefix}.Ecomponents'
 
         if filename not in self.retrieved.list_object_names():
             self.exit_code_stdout = self.exit_codes.ERROR_OUTPUT_STDOUT_MISSING
             return {}
 
         try:
-            ecomponots_stdout = self.retrieved.get_object_content(filename)
+            ecomponots_stdout = self.get_object_content(filename)
         except IOError:
             self.exit_code_stdout = self.exit_codes.ERROR_OUTPUT_STDOUT_READ
             return {}
@@ -162,53 +645,47 @@ class JdftxParser(Parser):
         data_lines = ecomponots_stdout.split('\n')
 
         for line in data_lines:
-            for string, key in [
-                ['Eewald', 'energy_ewald'],
-                ['EH', 'energy_hartree'],
-                ['Eloc', 'energy_local'],
-                ['Enl', 'energy_nonlocal'],
-                ['Exc', 'energy_xc'],
-                ['Exc_core', 'energy_xc_core'],
-                ['KE', 'energy_kinetic'],
-                ['Etot', 'energy_total'],
-            ]:
-                if string in line:
-                    value = grep_energy_from_line(line)
-                    ecomponots[key] = value
-                    ecomponots[key + units_suffix] = default_energy_units
+            key = get_energy_key_from_line(line)
+            if key is not None:
+                ecomponots[key] = grep_energy_from_line(line)
+                ecomponots[key + units_suffix] = default_energy_units
 
         return ecomponots
 
-    def parsed_structure(self) -> orm.StructureData:
+    @phased('parse structure')
+    def parsed_structure(self, prefix: str = 'aiida', structure: orm.StructureData = None) -> orm.StructureData:
         """
         parse structure from end dumped file `aiida.lattice` and `aiida.ionpos`
 
-        :param lattice: str, the content of the `aiida.lattice` file
-        :param ionpos: str, content of the `aiida.ionpos` file
+        :param prefix: the `dump-name` prefix of the dumped files
+        :param structure: the input structure, returned if the dumped files cannot be parsed
         """
-        filename = 'aiida.lattice'
+        if structure is None:
+            structure = self.node.inputs.structure
+
+        filename = f'{prefix}.lattice'
 
         if filename not in self.retrieved.list_object_names():
             self.exit_code_stdout = self.exit_codes.ERROR_OUTPUT_STDOUT_MISSING
-            return self.node.inputs.structure
+            return structure
 
         try:
-            lattice_stdout = self.retrieved.get_object_content(filename)
+            lattice_stdout = self.get_object_content(filename)
         except IOError:
             self.exit_code_stdout = self.exit_codes.ERROR_OUTPUT_STDOUT_READ
-            return self.node.inputs.structure
+            return structure
 
-        filename = 'aiida.ionpos'
+        filename = f'{prefix}.ionpos'
 
         if filename not in self.retrieved.list_object_names():
             self.exit_code_stdout = self.exit_codes.ERROR_OUTPUT_STDOUT_MISSING
-            return self.node.inputs.structure
+            return structure
 
         try:
-            ionpos_stdout = self.retrieved.get_object_content(filename)
+            ionpos_stdout = self.get_object_content(filename)
         except IOError:
             self.exit_code_stdout = self.exit_codes.ERROR_OUTPUT_STDOUT_READ
-            return self.node.inputs.structure
+            return structure
 
         data_line = lattice_stdout.strip().split('\n')
 
@@ -226,9 +703,17 @@ class JdftxParser(Parser):
 
         return structure
 
-    def parse_stdout(self) -> dict:
+    @phased('parse stdout')
+    def parse_stdout(self, filename_stdout: str = None, structure: orm.StructureData = None,
+                     trajectory=None) -> dict:
         """Parse the stdout output file into a dict.
 
+        If the stdout was reduced to its summary on the compute node, only the files of the summary are retrieved,
+        which are read instead.
+
+        :param filename_stdout: the name of the stdout file, by default the `output_filename` option
+        :param structure: the input structure of the run, by default the `structure` input
+        :param trajectory: optional writer to which the frames of the trajectory are written instead of being returned
         :return: dict with parsed data
         """
         parsed_data = {
@@ -236,107 +721,144 @@ class JdftxParser(Parser):
             'trajectory': {},
         }
 
-        filename_stdout = self.node.get_option('output_filename')
+        if filename_stdout is None:
+            filename_stdout = self.node.get_option('output_filename')
 
-        if filename_stdout not in self.retrieved.list_object_names():
-            self.exit_code_stdout = self.exit_codes.ERROR_OUTPUT_STDOUT_MISSING
-            return parsed_data
+        if structure is None:
+            structure = self.node.inputs.structure
+
+        filenames = self.retrieved.list_object_names()
+        filename_parameters = filename_stdout + SUMMARY_SUFFIX_PARAMETERS
+        filename_arrays = filename_stdout + SUMMARY_SUFFIX_ARRAYS
 
         try:
-            stdout = self.retrieved.get_object_content(filename_stdout)
+            if filename_stdout in filenames:
+                stdout = self.get_object_content(filename_stdout)
+                with get_stdout_executor(len(stdout)) as executor:
+                    parsed_data = parse_stdout_content(stdout, structure.cell, trajectory, executor)
+            elif filename_parameters in filenames and filename_arrays in filenames:
+                handle_parameters = io.StringIO(self.get_object_content(filename_parameters))
+                handle_arrays = io.BytesIO(self.get_object_content(filename_arrays, mode='rb'))
+                parsed_data = read_summary(handle_parameters, handle_arrays)
+
+                if trajectory is not None:
+                    for name, frames in parsed_data.pop('trajectory').items():
+                        for frame in frames:
+                            trajectory.append(name, frame)
+                    parsed_data['trajectory'] = {}
+            else:
+                self.exit_code_stdout = self.exit_codes.ERROR_OUTPUT_STDOUT_MISSING
+                return parsed_data
         except IOError:
             self.exit_code_stdout = self.exit_codes.ERROR_OUTPUT_STDOUT_READ
             return parsed_data
 
-        # ============== Start real parsing =====================
-        # Separate the input string into separate lines
-        data_lines = stdout.split('\n')
+        tail = parsed_data.pop('tail')
 
-        # loop over all lines to get a broadview of the results
-        calc_success = False
-        for line in data_lines:
+        if not parsed_data.pop('completed'):
+            # a run stopped by the monitor, or killed by the scheduler, shows the divergence in its last minimization
+            monitor = ElecMinimizeMonitor(get_thresholds(self.node))
+            monitor.feed(tail + '\n')
+            reason = monitor.check()
 
-            if 'Done!' in line:
-                calc_success = True
-
-        # parsing the all initial parameters
-
-        # clip the std-out to a list of every relax step
-        # the list contain the list of lines of every electroinc minimization
-        relax_steps = stdout.split(
-            '-------- Electronic minimization -----------')[1:]
-        relax_steps = [i.split('\n') for i in relax_steps]
-
-        trajectory_data = {}
-
-        for data_step in relax_steps:
-
-            do_relax = False  # defined for after check
-
-            for count, line in enumerate(data_step):
-
-                if '# Energy components:' in line:
-                    for line2 in data_step[count:]:
-                        # exit loop
-                        if not line2.strip():
-                            break
-
-                        for string, key in [
-                            ['Eewald', 'energy_ewald'],
-                            ['EH', 'energy_hartree'],
-                            ['Eloc', 'energy_local'],
-                            ['Enl', 'energy_nonlocal'],
-                            ['Exc', 'energy_xc'],
-                            ['Exc_core', 'energy_xc_core'],
-                            ['KE', 'energy_kinetic'],
-                            ['Etot', 'energy_total'],
-                        ]:
-                            if string in line2:
-                                value = grep_energy_from_line(line2)
-                                trajectory_data.setdefault(key,
-                                                           []).append(value)
-
-                if '# Lattice vectors:' in line:
-                    a1 = [float(s) for s in data_step[count + 2].split()[1:4]]
-                    a2 = [float(s) for s in data_step[count + 3].split()[1:4]]
-                    a3 = [float(s) for s in data_step[count + 4].split()[1:4]]
-
-                    cell = np.array([a1, a2, a3]) * CONSTANTS.bohr_to_ang
-                    trajectory_data.setdefault('lattice_relax',
-                                               []).append(cell)
-                    # only in relax calculation will cell be printed out
-                    do_relax = True
-
-                if '# Ionic positions in lattice coordinates:' in line:
-                    positions = []
-                    for line2 in data_step[count + 1:]:
-                        # exit loop
-                        if not line2.strip():
-                            break
-
-                        positions.append(
-                            [float(i) for i in line2.split()[2:5]])
-
-            # at each frame the positions is fractional, transform to angstrom
-            if do_relax:
-                # only in relax calculation will cell be set
-                # transform from fraction to angstrom
-                positions = np.matmul(np.array(positions), cell)
-                trajectory_data.setdefault('atomic_positios_relax',
-                                           []).append(positions)
-
-        parsed_data['trajectory'] = trajectory_data
-
-        if not calc_success:
-            self.exit_code_stdout = self.exit_codes.ERROR_UNEXPECTED_PARSER_EXCEPTION
+            if reason is not None:
+                self.exit_code_stdout = self.exit_codes.ERROR_ELECTRONIC_CONVERGENCE_DIVERGED.format(reason=reason)
+            elif parsed_data.get('geometry') is not None:
+                self.exit_code_stdout = self.exit_codes.ERROR_OUTPUT_STDOUT_PARTIAL
+            else:
+                self.exit_code_stdout = self.exit_codes.ERROR_UNEXPECTED_PARSER_EXCEPTION
 
         return parsed_data
 
 
-def grep_energy_from_line(line):
-    """extract energy from line"""
-    try:
-        return float(line.split('=')[1]) * CONSTANTS.har_to_ev
-    except Exception:
-        raise JdftxOutputParsingError(
-            'Error while parsing energy') from Exception
+def read_kpoints(content):
+    """Read the kpoints dumped by jdftx, a line with the index, the coordinates in brackets and the weight of each.
+
+    :param content: the content of the file
+    :return: the array of the coordinates of the kpoints in reciprocal lattice units and the array of their weights
+    """
+    table = np.loadtxt(io.StringIO(content.replace('[', ' ').replace(']', ' ')), usecols=(1, 2, 3, 4), ndmin=2)
+
+    return table[:, :3], table[:, 3]
+
+
+def read_dos(content):
+    """Read a density of states dumped by jdftx, a table with a header of the quoted names of its columns.
+
+    The first column is the energy and the others the total and projected densities of states, in Hartree and states
+    per Hartree, which are converted to eV and states per eV.
+
+    :param content: the content of the file
+    :return: the list of the names of the columns and the table as an array with a row for every energy
+    """
+    header, _, table = content.partition('\n')
+    columns = re.findall(r'"([^"]*)"', header)
+
+    table = np.loadtxt(io.StringIO(table), ndmin=2).reshape(-1, len(columns))
+    factors = np.full(len(columns), 1. / CONSTANTS.har_to_ev)
+    factors[0] = CONSTANTS.har_to_ev
+
+    return columns, table * factors
+
+
+@contextlib.contextmanager
+def get_stdout_executor(size):
+    """Context manager yielding the pool of processes in which a stdout of `size` characters is parsed, or None.
+
+    The stdout is parsed in several processes only if `AIIDA_JDFTX_PARSE_PROCESSES` is set to more than one and its size
+    exceeds `PARALLEL_STDOUT_SIZE`, since the start of the processes and the transfer of the steps outweigh the gain
+    for smaller files.
+    """
+    processes = int(os.environ.get(ENV_PROCESSES, 1))
+
+    if processes <= 1 or size <= PARALLEL_STDOUT_SIZE:
+        yield None
+        return
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # the daemon runs an event loop in threads, which is not safe to fork
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn')) as executor:
+        yield executor
+
+
+@functools.lru_cache(maxsize=None)
+def get_parser_version():
+    """Return the version of the parser, which changes with the version of the package and with its source.
+
+    Parse products are only reused while the version is the same, such that any change of the parser invalidates them.
+    The parse products depend on the source of many modules besides the parser, e.g. the data classes of the outputs
+    and the outputs requested in the settings of the calculation, so the source of the whole package is hashed.
+    """
+    import hashlib
+    from aiida_jdftx import __version__
+
+    dirpath = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+
+    for root, dirnames, filenames in os.walk(dirpath):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith('.py'):
+                filepath = os.path.join(root, filename)
+                digest.update(os.path.relpath(filepath, dirpath).encode('utf-8') + b'\0')
+                with open(filepath, 'rb') as handle:
+                    digest.update(handle.read())
+
+    return f'{__version__}+{digest.hexdigest()[:12]}'
+
+
+def get_retrieved_hash(retrieved):
+    """Return the hash of the names and the contents of all files of a retrieved `FolderData`."""
+    import hashlib
+
+    digest = hashlib.sha256()
+
+    for name in sorted(retrieved.list_object_names()):
+        digest.update(name.encode('utf-8') + b'\0')
+        with retrieved.open(name, mode='rb') as handle:
+            for block in iter(lambda: handle.read(1 << 20), b''):  # pylint: disable=cell-var-from-loop
+                digest.update(block)
+
+    return digest.hexdigest()
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+"""Opt-in profiling of the phases of the preparation and of the parsing of jdftx calculations.
+
+The profiling is enabled for all calculations by setting the `AIIDA_JDFTX_PROFILE` environment variable, for example in
+the environment of the daemon, or for a single calculation with the `profile` setting. The duration and the peak
+memory of every phase are logged as a JSON record. The peak memory of a phase is the largest memory allocated during the
+phase over that allocated at its start, as traced by `tracemalloc` from Python 3.9, which slows down the allocations
+while the profiling is enabled.
+
+If `AIIDA_JDFTX_PROFILE_FILE` is set, the record is also appended to that file as a JSON line or, if its extension is
+`.prom`, written in the Prometheus text format for the textfile collector of the node exporter. The Prometheus file is
+rewritten atomically with the gauges of the last record of every process, the phases called several times being
+aggregated, such that it does not grow and every series is unique.
+
+Phases are opened with `phase`, which is a no-op unless called within `profile`, such that the instrumented code costs
+a single context variable lookup when the profiling is disabled.
+"""
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import re
+import time
+import tracemalloc
+
+from aiida.common.log import AIIDA_LOGGER, LOG_LEVEL_REPORT
+
+ENV_PROFILE = 'AIIDA_JDFTX_PROFILE'
+ENV_FILE = 'AIIDA_JDFTX_PROFILE_FILE'
+
+PROMETHEUS_EXTENSION = '.prom'
+PROMETHEUS_PREFIX = 'aiida_jdftx'
+
+LOGGER = AIIDA_LOGGER.getChild('jdftx.profiling')
+
+_PROFILER = contextvars.ContextVar('profiler', default=None)
+_NULL_PHASE = contextlib.nullcontext()
+
+
+# the gauges of the Prometheus file, with their help
+PROMETHEUS_METRICS = {
+    'phase_duration_seconds': 'Total duration of the calls of the phase in the last profiled process.',
+    'phase_calls': 'Number of calls of the phase in the last profiled process.',
+    'phase_peak_memory_bytes': 'Largest peak memory allocated during a call of the phase in the last profiled process.',
+    'profile_timestamp_seconds': 'Time at which the last profiled process started.',
+    'profile_pk': 'Pk of the calculation of the last profiled process.',
+}
+
+_PROMETHEUS_SAMPLE = re.compile(r'^(?P<metric>\w+)\{process="(?P<process>[^"]*)"')
+
+
+def get_traced_memory():
+    """Return the current and the peak memory traced by `tracemalloc`, or None if the peak cannot be reset."""
+    if not tracemalloc.is_tracing() or not hasattr(tracemalloc, 'reset_peak'):
+        return None
+
+    return tracemalloc.get_traced_memory()
+
+
+def read_prometheus_samples(filepath, exclude):
+    """Return the samples of a Prometheus file written by `Profiler.write`, except those of a process.
+
+    :param filepath: the path of the file, which may not exist
+    :param exclude: the name of the process whose samples are excluded
+    :return: dictionary of the lines of the samples of every metric, without the prefix
+    """
+    samples = {}
+
+    try:
+        with open(filepath, 'r') as handle:
+            lines = handle.read().splitlines()
+    except FileNotFoundError:
+        return samples
+
+    for line in lines:
+        match = _PROMETHEUS_SAMPLE.match(line)
+
+        if match and match.group('process') != exclude and match.group('metric').startswith(f'{PROMETHEUS_PREFIX}_'):
+            samples.setdefault(match.group('metric')[len(PROMETHEUS_PREFIX) + 1:], []).append(line)
+
+    return samples
+
+
+class Profiler:
+    """Recorder of the duration and the peak memory of the phases of a profiled process."""
+
+    def __init__(self, name, pk=None):
+        """Construct the profiler.
+
+        :param name: the name of the profiled process, e.g. `parse`
+        :param pk: optional pk of the calculation node
+        """
+        self.name = name
+        self.pk = pk
+        self.time = time.time()
+        self.phases = []
+        self._peaks = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Context manager recording a phase, which is recorded after the phases nested in it.
+
+        The peak traced memory is reset at the start of every phase, so the peaks of the nested phases are carried over
+        to the phases enclosing them.
+        """
+        memory = get_traced_memory()
+
+        if memory is not None:
+            current, peak = memory
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+            self._peaks.append(current)
+
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            peak_memory = None
+
+            if memory is not None:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                peak_memory = peak - current
+
+            self.phases.append({'phase': name, 'duration': duration, 'peak_memory': peak_memory})
+
+    def get_record(self):
+        """Return the record of the profiled process as a JSON serializable dictionary."""
+        return {'process': self.name, 'pk': self.pk, 'time': self.time, 'phases': self.phases}
+
+    def get_prometheus_samples(self):
+        """Return the lines of the samples of every Prometheus metric, with the calls of a phase aggregated."""
+        phases = {}
+
+        for entry in self.phases:
+            aggregate = phases.setdefault(entry['phase'], {'duration': 0., 'calls': 0, 'peak_memory': None})
+            aggregate['duration'] += entry['duration']
+            aggregate['calls'] += 1
+            if entry['peak_memory'] is not None:
+                aggregate['peak_memory'] = max(aggregate['peak_memory'] or 0, entry['peak_memory'])
+
+        samples = {metric: [] for metric in PROMETHEUS_METRICS}
+        process = f'process="{self.name}"'
+
+        for name, aggregate in phases.items():
+            labels = f'{process},phase="{name}"'
+            samples['phase_duration_seconds'].append(f'{{{labels}}} {aggregate["duration"]:.6f}')
+            samples['phase_calls'].append(f'{{{labels}}} {aggregate["calls"]}')
+            if aggregate['peak_memory'] is not None:
+                samples['phase_peak_memory_bytes'].append(f'{{{labels}}} {aggregate["peak_memory"]}')
+
+        samples['profile_timestamp_seconds'].append(f'{{{process}}} {self.time:.3f}')
+
+        if self.pk is not None:
+            samples['profile_pk'].append(f'{{{process}}} {self.pk}')
+
+        return {
+            metric: [f'{PROMETHEUS_PREFIX}_{metric}{line}' for line in lines] for metric, lines in samples.items()
+        }
+
+    def write(self, handle, fileformat='jsonl', samples=None):
+        """Write the phases to a file, either as a JSON line or in the Prometheus text format.
+
+        :param handle: a text file-like object
+        :param fileformat: `jsonl` or `prometheus`
+        :param samples: optional samples of other processes written with the Prometheus metrics, as returned by
+            `read_prometheus_samples`
+        """
+        if fileformat == 'jsonl':
+            handle.write(json.dumps(self.get_record()) + '\n')
+            return
+
+        samples = samples or {}
+
+        for metric, lines in self.get_prometheus_samples().items():
+            lines = samples.get(metric, []) + lines
+
+            if not lines:
+                continue
+
+            handle.write(f'# HELP {PROMETHEUS_PREFIX}_{metric} {PROMETHEUS_METRICS[metric]}\n')
+            handle.write(f'# TYPE {PROMETHEUS_PREFIX}_{metric} gauge\n')
+            handle.write(''.join(f'{line}\n' for line in lines))
+
+    def report(self):
+        """Log the record and write it to the file of `AIIDA_JDFTX_PROFILE_FILE`, if set."""
+        LOGGER.log(LOG_LEVEL_REPORT, 'profile of %s: %s', self.name, json.dumps(self.get_record()))
+
+        filepath = os.environ.get(ENV_FILE)
+
+        if not filepath:
+            return
+
+        if not filepath.endswith(PROMETHEUS_EXTENSION):
+            with open(filepath, 'a') as handle:
+                self.write(handle)
+            return
+
+        # the file is replaced atomically, such that the collector never reads a partial file
+        samples = read_prometheus_samples(filepath, self.name)
+
+        with open(f'{filepath}.{os.getpid()}.tmp', 'w') as handle:
+            self.write(handle, 'prometheus', samples)
+
+        os.replace(f'{filepath}.{os.getpid()}.tmp', filepath)
+
+
+@contextlib.contextmanager
+def profile(name, pk=None, enabled=False):
+    """Context manager in which the phases opened with `phase` are profiled, if the profiling is enabled.
+
+    The whole context is recorded as the `total` phase and the record is reported when it exits.
+
+    :param name: the name of the profiled process
+    :param pk: optional pk of the calculation node
+    :param enabled: whether to profile even if `AIIDA_JDFTX_PROFILE` is not set, e.g. from the `profile` setting
+    :return: the `Profiler`, or None if the profiling is disabled
+    """
+    if not enabled and not os.environ.get(ENV_PROFILE):
+        yield None
+        return
+
+    # the tracing is started by the outermost profiled process, and stopped when it exits
+    tracing = not tracemalloc.is_tracing()
+
+    if tracing:
+        tracemalloc.start()
+
+    profiler = Profiler(name, pk)
+    token = _PROFILER.set(profiler)
+
+    try:
+        with profiler.phase('total'):
+            yield profiler
+    finally:
+        _PROFILER.reset(token)
+
+        if tracing:
+            tracemalloc.stop()
+
+        profiler.report()
+
+
+def profiled(name):
+    """Decorator profiling a method of a calculation or parser under `name`, also enabled by the `profile` setting."""
+
+    def decorator(method):
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            node = self.node
+            enabled = 'settings' in node.inputs and node.inputs.settings.get_dict().get('profile', False)
+
+            with profile(name, node.pk, enabled):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def phase(name):
+    """Return a context manager recording a phase of the process profiled by the enclosing `profile`, if any."""
+    profiler = _PROFILER.get()
+
+    if profiler is None:
+        return _NULL_PHASE
+
+    return profiler.phase(name)
+
+
+def phased(name):
+    """Decorator recording every call of a function as a phase of the process profiled by the enclosing `profile`."""
+
+    def decorator(function):
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,456 @@
+# -*- coding: utf-8 -*-
+"""Parsing of the stdout of a jdftx run into plain python and numpy values.
+
+This module only depends on the standard library and numpy, such that it can also run as a standalone script on the
+compute node, see `get_script`. The script reduces the stdout to a compact summary, a JSON file with the parameters and
+a `.npz` file with the trajectory arrays, which is retrieved instead of the stdout and read back by the `JdftxParser`
+with `read_summary`.
+"""
+import io
+import json
+import re
+import sys
+
+import numpy as np
+
+try:
+    from ._constants import CONSTANTS
+except ImportError:
+    # run as the standalone script of `get_script`, in which the constants are defined before this module
+    pass
+
+# the suffixes appended to the name of the stdout file for the files of its summary
+SUMMARY_SUFFIX_PARAMETERS = '.json'
+SUMMARY_SUFFIX_ARRAYS = '.npz'
+
+# labels of the energy components printed by jdftx, mapped onto the output keys
+energy_components = {
+    'Eewald': 'energy_ewald',
+    'EH': 'energy_hartree',
+    'Eloc': 'energy_local',
+    'Enl': 'energy_nonlocal',
+    'Epulay': 'energy_pulay',
+    'Exc': 'energy_xc',
+    'Exc_core': 'energy_xc_core',
+    'EXX': 'energy_exact_exchange',
+    'Evdw': 'energy_vdw',
+    'KE': 'energy_kinetic',
+    'A_diel': 'energy_fluid',
+    'Eband': 'energy_band',
+    '-TS': 'energy_smearing',
+    'muN': 'energy_mu_n',
+    'Etot': 'energy_total',
+    'F': 'energy_free',
+    'G': 'energy_grand_free',
+}
+
+# the number of electronic minimizations of the stdout parsed at once by a worker of `parse_stdout_content`
+DEFAULT_STEPS_CHUNK_SIZE = 1000
+
+# the line that starts every electronic minimization
+electronic_minimization_header = '-------- Electronic minimization'
+
+# prefixes of the iteration lines of the electronic and of the ionic minimizers
+electronic_iteration_prefixes = ('ElecMinimize: Iter:', 'SCF: Cycle:')
+ionic_iteration_prefixes = ('IonicMinimize: Iter:', 'LatticeMinimize: Iter:', 'IonicDynamics: Iter:')
+
+# the line of the profile printed at the end of a run by a jdftx compiled with profiling enabled
+profiler_pattern = re.compile(
+    r'PROFILER:\s+(?P<name>\S+)\s+(?P<mean>\S+)\s+\+/-\s+(?P<std>\S+)\s+s,'
+    r'\s+(?P<calls>\d+)\s+calls,\s+(?P<total>\S+)\s+s total'
+)
+
+
+def parse_stdout_content(stdout, cell, trajectory=None, executor=None, chunk_size=DEFAULT_STEPS_CHUNK_SIZE):
+    """Parse the content of the stdout of a jdftx run.
+
+    :param stdout: the content of the stdout file
+    :param cell: the cell of the input structure in angstrom
+    :param trajectory: optional writer with an `append(name, frame)` method, to which the frames of the trajectory are
+        passed as they are parsed instead of being collected in the `trajectory` lists
+    :param executor: optional `concurrent.futures.Executor` in which the trajectory is parsed in chunks of steps
+    :param chunk_size: the number of electronic minimizations in a chunk parsed by the executor
+    :return: dict with the `parameters`, `trajectory` and `performance` of the run. The `completed` flag is False if
+        the run did not end with `Done!`, in which case `tail` is the stdout of its last electronic minimization and
+        `geometry` the geometry of its last complete ionic step, if any, see `parse_last_geometry`. The trajectory of
+        such a run only includes its complete steps.
+    """
+    # pylint: disable=too-many-locals, too-many-branches, too-many-statements
+    parsed_data = {
+        'parameters': {},
+        'trajectory': {},
+    }
+
+    # Separate the input string into separate lines
+    data_lines = stdout.split('\n')
+
+    # loop over all lines to get a broadview of the results
+    calc_success = False
+    electronic_converged = False
+    ionic_minimization = False
+    ionic_converged = False
+    for line in data_lines:
+
+        if 'Done!' in line:
+            calc_success = True
+
+        # only the convergence of the last electronic minimization matters
+        if line.startswith(electronic_minimization_header):
+            electronic_converged = False
+
+        if line.startswith(('ElecMinimize: Converged', 'SCF: Converged')):
+            electronic_converged = True
+
+        if line.startswith(('IonicMinimize: Iter:', 'LatticeMinimize: Iter:')):
+            ionic_minimization = True
+
+        if line.startswith(('IonicMinimize: Converged', 'LatticeMinimize: Converged')):
+            ionic_converged = True
+
+        if line.startswith('spintype '):
+            parsed_data['parameters']['spin_type'] = line.split()[1]
+
+        if line.startswith('nElectrons:'):
+            values = line.split()
+            parsed_data['parameters']['number_of_electrons'] = float(values[1])
+            parsed_data['parameters']['number_of_bands'] = int(values[3])
+            parsed_data['parameters']['number_of_states'] = int(values[5])
+
+    parsed_data['parameters']['converged'] = calc_success and electronic_converged and (
+        ionic_converged or not ionic_minimization)
+
+    # parsing the all initial parameters
+
+    # clip the std-out to a list of every relax step
+    # the list contain the list of lines of every electroinc minimization
+    relax_steps = stdout.split(
+        '-------- Electronic minimization -----------')[1:]
+
+    # the last step of a run that was stopped can be cut anywhere, it is complete once the ionic iteration is printed
+    if not calc_success and relax_steps and not any(f'\n{prefix}' in relax_steps[-1] for prefix in ionic_iteration_prefixes):
+        relax_steps = relax_steps[:-1]
+
+    trajectory_data = {}
+
+    def append(name, frame):
+        """Add a frame to the trajectory."""
+        if trajectory is not None:
+            trajectory.append(name, frame)
+        else:
+            trajectory_data.setdefault(name, []).append(frame)
+
+    # the lattice vectors as columns in bohr, as printed by jdftx, needed to transform the forces in lattice
+    # coordinates; it is only printed when the lattice is relaxed, otherwise it is the one of the input structure
+    lattice_vectors = np.array(cell).T * CONSTANTS.ang_to_bohr
+
+    if executor is None:
+        parse_steps((step.split('\n') for step in relax_steps), lattice_vectors, append)
+    else:
+        chunks, initial_lattice_vectors = split_steps(relax_steps, lattice_vectors, chunk_size)
+
+        # the chunks are parsed concurrently but their frames are added in order
+        for chunk_data in executor.map(parse_steps_chunk, chunks, initial_lattice_vectors):
+            for name, frames in chunk_data.items():
+                for frame in frames:
+                    append(name, frame)
+
+    parsed_data['trajectory'] = trajectory_data
+    parsed_data['performance'] = parse_performance(data_lines)
+    parsed_data['completed'] = calc_success
+    parsed_data['tail'] = None
+    parsed_data['geometry'] = None
+
+    if not calc_success:
+        parsed_data['geometry'] = parse_last_geometry(relax_steps, cell)
+
+        # the state of a monitor of the electronic convergence only depends on the last electronic minimization
+        index = stdout.rfind('\n' + electronic_minimization_header)
+        parsed_data['tail'] = stdout[index + 1:] if index >= 0 else stdout
+
+    return parsed_data
+
+
+def parse_steps(steps, lattice_vectors, append):
+    """Parse the frames of the trajectory printed after every electronic minimization.
+
+    :param steps: iterable over the lists of lines of the stdout following every electronic minimization header
+    :param lattice_vectors: the lattice vectors in bohr before the first step
+    :param append: function called with the name and the value of every parsed frame, in order
+    """
+    for data_step in steps:
+
+        do_relax = False  # defined for after check
+
+        for count, line in enumerate(data_step):
+
+            if '# Energy components:' in line:
+                for line2 in data_step[count:]:
+                    # exit loop
+                    if not line2.strip():
+                        break
+
+                    key = get_energy_key_from_line(line2)
+                    if key is not None:
+                        value = grep_energy_from_line(line2)
+                        append(key, value)
+
+            if '# Lattice vectors:' in line:
+                lattice_vectors = parse_lattice_vectors(data_step, count)
+                lattice = lattice_vectors * CONSTANTS.bohr_to_ang
+                append('lattice_relax', lattice)
+                # only in relax calculation will cell be printed out
+                do_relax = True
+
+            if '# Ionic positions in lattice coordinates:' in line:
+                positions = parse_rows(data_step, count)
+
+            if line.startswith(('# Forces in Cartesian coordinates:', '# Forces in Lattice coordinates:')):
+                forces = np.array(parse_rows(data_step, count))
+                if 'Lattice' in line:
+                    # the lattice components are the projections onto the lattice vectors
+                    forces = np.linalg.solve(lattice_vectors.T, forces.T).T
+
+                # transform from Hartree/bohr to eV/angstrom
+                forces = forces * CONSTANTS.har_to_ev / CONSTANTS.bohr_to_ang
+                append('forces', forces)
+
+        # at each frame the positions is fractional, transform to angstrom
+        if do_relax:
+            # only in relax calculation will cell be set
+            # transform from fraction to angstrom
+            positions = np.matmul(np.array(positions), lattice)
+            append('atomic_positios_relax', positions)
+
+
+def parse_last_geometry(steps, cell):
+    """Return the geometry of the last step that printed the ionic positions, e.g. to restart a run that was stopped.
+
+    :param steps: the stdout following every electronic minimization header, of the complete steps
+    :param cell: the cell of the input structure in angstrom, used if no step up to the last one printed the lattice
+    :return: dict with the `cell` and the Cartesian `positions` in angstrom as lists, or None if no step printed the
+        ionic positions
+    """
+    headers = ('# Ionic positions in lattice coordinates:', '# Ionic positions in cartesian coordinates:')
+    last = next((number for number in reversed(range(len(steps))) if any(header in steps[number] for header in headers)),
+                None)
+
+    if last is None:
+        return None
+
+    # the lattice vectors are the rows of the printed matrix in bohr, as in `parse_steps`
+    cell = np.array(cell, dtype=float)
+
+    for step in reversed(steps[:last + 1]):
+        if '# Lattice vectors:' in step:
+            lines = step.split('\n')
+            index = max(count for count, line in enumerate(lines) if '# Lattice vectors:' in line)
+            cell = parse_lattice_vectors(lines, index) * CONSTANTS.bohr_to_ang
+            break
+
+    lines = steps[last].split('\n')
+    index = max(count for count, line in enumerate(lines) if line.startswith(headers))
+    positions = np.array(parse_rows(lines, index))
+
+    if lines[index].startswith(headers[0]):
+        positions = positions @ cell
+    else:
+        positions = positions * CONSTANTS.bohr_to_ang
+
+    return {'cell': cell.tolist(), 'positions': positions.tolist()}
+
+
+def parse_lattice_vectors(lines, index):
+    """Return the lattice vectors in bohr printed below the `# Lattice vectors:` line at the index."""
+    return np.array([[float(s) for s in lines[index + offset].split()[1:4]] for offset in (2, 3, 4)])
+
+
+def parse_rows(lines, index):
+    """Return the three values following the species of every row below the line at the index, up to an empty line."""
+    rows = []
+    for line in lines[index + 1:]:
+        # exit loop
+        if not line.strip():
+            break
+
+        rows.append([float(i) for i in line.split()[2:5]])
+
+    return rows
+
+
+def split_steps(steps, lattice_vectors, chunk_size):
+    """Split the steps into chunks that can be parsed independently by `parse_steps_chunk`.
+
+    The only state carried from a step to the next is the last printed lattice, which is determined for the start of
+    every chunk by parsing only the lattice of the last step before it that printed one.
+
+    :return: the list of the chunks of steps and the list of the lattice vectors before every chunk
+    """
+    chunks, initial_lattice_vectors = [], []
+
+    for start in range(0, len(steps), chunk_size):
+        chunks.append(steps[start:start + chunk_size])
+        initial_lattice_vectors.append(lattice_vectors)
+
+        for step in reversed(chunks[-1]):
+            if '# Lattice vectors:' in step:
+                lines = step.split('\n')
+                index = max(count for count, line in enumerate(lines) if '# Lattice vectors:' in line)
+                lattice_vectors = parse_lattice_vectors(lines, index)
+                break
+
+    return chunks, initial_lattice_vectors
+
+
+def parse_steps_chunk(steps, lattice_vectors):
+    """Return the frames of a chunk of steps as lists keyed by their name, e.g. in a worker process."""
+    trajectory_data = {}
+
+    def append(name, frame):
+        trajectory_data.setdefault(name, []).append(frame)
+
+    parse_steps((step.split('\n') for step in steps), lattice_vectors, append)
+
+    return trajectory_data
+
+
+def parse_performance(data_lines):
+    """Parse the timings and the parallelization of a jdftx run from the lines of its stdout.
+
+    All values are flat numbers, such that they can be queried directly on the attributes of the output node. The
+    profile is only printed by jdftx compiled with profiling enabled, every routine adding the keys
+    `profile_{routine}_calls` and `profile_{routine}_time` with its total time in seconds.
+
+    :param data_lines: the lines of the stdout
+    :return: dict with the parsed performance metrics
+    """
+    performance = {}
+
+    # the elapsed times of the iterations of every electronic minimization
+    iteration_times = []
+    number_of_ionic_steps = 0
+
+    for line in data_lines:
+
+        if line.startswith('Run totals:'):
+            values = line.split()
+            performance['number_of_processes'] = int(values[2])
+            performance['number_of_threads'] = int(values[4])
+            performance['number_of_gpus'] = int(values[6])
+
+        elif line.startswith(electronic_minimization_header):
+            iteration_times.append([])
+
+        elif line.startswith(electronic_iteration_prefixes) and 't[s]:' in line:
+            if not iteration_times:
+                iteration_times.append([])
+            iteration_times[-1].append(float(line.split('t[s]:')[1].split()[0]))
+
+        elif line.startswith(ionic_iteration_prefixes):
+            number_of_ionic_steps += 1
+
+        elif 'Duration:' in line:
+            performance['wall_time'] = parse_duration(line.split('Duration:')[1].strip(' )'))
+
+        elif line.startswith('PROFILER:'):
+            match = profiler_pattern.match(line)
+            if match:
+                name = re.sub(r'\W', '_', match.group('name'))
+                performance[f'profile_{name}_calls'] = int(match.group('calls'))
+                performance[f'profile_{name}_time'] = float(match.group('total'))
+
+    number_of_iterations = sum(len(times) for times in iteration_times)
+
+    # the first timed iteration of a minimization also includes its setup, so only the later intervals are averaged
+    intervals = [later - earlier for times in iteration_times for earlier, later in zip(times[:-1], times[1:])]
+
+    if number_of_iterations:
+        performance['number_of_electronic_iterations'] = number_of_iterations
+        performance['number_of_ionic_steps'] = number_of_ionic_steps
+
+    if intervals:
+        performance['time_per_electronic_iteration'] = sum(intervals) / len(intervals)
+
+    return performance
+
+
+def parse_duration(duration):
+    """Return the number of seconds of a duration printed by jdftx in the format `days-hours:minutes:seconds`."""
+    days, time = duration.split('-')
+    hours, minutes, seconds = time.split(':')
+
+    return ((int(days) * 24 + int(hours)) * 60 + int(minutes)) * 60 + float(seconds)
+
+
+def get_energy_key_from_line(line):
+    """Return the output key of the energy component printed on the line, or None if it is not a known component."""
+    if '=' not in line:
+        return None
+
+    return energy_components.get(line.split('=')[0].strip())
+
+
+def grep_energy_from_line(line):
+    """extract energy from line"""
+    try:
+        return float(line.split('=')[1]) * CONSTANTS.har_to_ev
+    except (IndexError, ValueError) as exception:
+        raise ValueError(f'Error while parsing energy from line `{line}`') from exception
+
+
+def write_summary(parsed_data, handle_parameters, handle_arrays):
+    """Write the summary of the parsed stdout, the trajectory arrays to a `.npz` and all other values to a JSON file.
+
+    :param parsed_data: the dictionary returned by `parse_stdout_content`
+    :param handle_parameters: a text file-like object to which the JSON is written
+    :param handle_arrays: a binary file-like object to which the `.npz` is written
+    """
+    trajectory = parsed_data['trajectory']
+    summary = {key: value for key, value in parsed_data.items() if key != 'trajectory'}
+    summary['trajectory_keys'] = list(trajectory)
+
+    json.dump(summary, handle_parameters)
+    np.savez_compressed(handle_arrays, **{key: np.array(value) for key, value in trajectory.items()})
+
+
+def read_summary(handle_parameters, handle_arrays):
+    """Return the parsed stdout from its summary written by `write_summary`.
+
+    The values are exactly those of `parse_stdout_content`, every trajectory value being a list over the steps.
+    """
+    parsed_data = json.load(handle_parameters)
+
+    with np.load(io.BytesIO(handle_arrays.read()), allow_pickle=False) as arrays:
+        parsed_data['trajectory'] = {key: list(arrays[key]) for key in parsed_data.pop('trajectory_keys')}
+
+    return parsed_data
+
+
+def get_script():
+    """Return the source of the standalone script that writes the summary of a stdout file on the compute node.
+
+    The script is the source of this module preceded by the constants it needs, and is run as::
+
+        python aiida_parse.py STDOUT CELL
+
+    where `CELL` is the JSON of the cell of the input structure. The summary is written to `STDOUT.json` and `STDOUT.npz`.
+    """
+    import inspect
+    from . import _constants
+
+    return inspect.getsource(_constants) + '\n\n' + inspect.getsource(sys.modules[__name__])
+
+
+def main(argv):
+    """Write the summary of the stdout file given on the command line, see `get_script`."""
+    filename_stdout, cell = argv
+
+    with open(filename_stdout) as handle:
+        parsed_data = parse_stdout_content(handle.read(), json.loads(cell))
+
+    with open(filename_stdout + SUMMARY_SUFFIX_PARAMETERS, 'w') as handle_parameters, \
+            open(filename_stdout + SUMMARY_SUFFIX_ARRAYS, 'wb') as handle_arrays:
+        write_summary(parsed_data, handle_parameters, handle_arrays)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Tools to prepare and post-process JDFTx calculations."""
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Canonical form of the `parameters` of jdftx calculations and statistics of the caching of a batch of calculations.
+
+AiiDA only reuses a calculation from its cache if all its inputs have the same hash, and the hash of a `Dict` is that
+of its exact content. Parameters that only differ by their whitespace, the formatting of their numbers or the order of
+their commands and options thus never hit the cache, although they write the same jdftx input. The workchains and the
+`parameters` port of the calculations canonicalize plain dictionaries with `canonicalize_parameters`, and the same can
+be done when building a `Dict` by hand.
+"""
+import collections
+import re
+
+# an integer, as opposed to a number that is converted to a float
+INTEGER_PATTERN = re.compile(r'^[+-]?\d+$')
+
+# an integer with a leading zero, which may be a string for jdftx, e.g. the Miller indices of `Slab 001`
+LEADING_ZERO_PATTERN = re.compile(r'^[+-]?0\d')
+NUMBER_PATTERN = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+
+EXTRA_CACHED_FROM = '_aiida_cached_from'
+EXTRA_HASH = '_aiida_hash'
+
+CacheStatistics = collections.namedtuple('CacheStatistics', ['total', 'cached', 'duplicates', 'equivalent'])
+
+
+def canonicalize_token(token):
+    """Return the canonical form of a single whitespace separated token of a command value.
+
+    Integers are written without a plus sign, other numbers in the shortest form that reads back the same float,
+    without a trailing `.0`, such that `10`, `+10` and `10.0` are all `10`. The leading zeros of integers are kept,
+    since they are significant in tokens that jdftx reads as strings, e.g. `001`. Other tokens are unchanged.
+    """
+    if INTEGER_PATTERN.match(token):
+        token = token.lstrip('+')
+        return token if LEADING_ZERO_PATTERN.match(token) else str(int(token))
+
+    if NUMBER_PATTERN.match(token):
+        # adding zero turns a negative zero into a zero
+        text = repr(float(token) + 0.)
+        return text[:-2] if text.endswith('.0') else text
+
+    return token
+
+
+def canonicalize_value(value):
+    """Return the canonical form of the value of a command or of an option of a command.
+
+    Dictionaries of options are sorted by option, other values are written as a string of canonical tokens separated by
+    single spaces. `None`, which removes a command from the parameters of a stage, and booleans are unchanged.
+    """
+    if value is None or isinstance(value, bool):
+        return value
+
+    if isinstance(value, dict):
+        options = ((str(key).strip(), canonicalize_value(option)) for key, option in value.items())
+        return dict(sorted(options, key=lambda item: item[0]))
+
+    return ' '.join(canonicalize_token(token) for token in str(value).split())
+
+
+def canonicalize_parameters(parameters):
+    """Return the canonical form of the parameters of a jdftx calculation, which writes the same input file.
+
+    The command names are stripped of whitespace and the commands are sorted by name, since jdftx does not depend on
+    their order in the input file. The values are canonicalized by `canonicalize_value`.
+
+    :param parameters: dictionary of the jdftx commands
+    :return: a new dictionary
+    """
+    commands = ((str(command).strip(), canonicalize_value(value)) for command, value in parameters.items())
+    return dict(sorted(commands, key=lambda item: item[0]))
+
+
+def get_canonical_key(node):
+    """Return a hash of the inputs of a calculation in which the `parameters` are replaced by their canonical form.
+
+    The key is the same for two calculations of the same process with the same computer and inputs, up to the
+    canonicalization of their parameters. Contrary to the hash of the node, it does not include its attributes.
+    """
+    from aiida.common.hashing import make_hash
+    from aiida.common.links import LinkType
+
+    inputs = {}
+
+    for entry in node.get_incoming(link_type=LinkType.INPUT_CALC).all():
+        if entry.link_label == 'parameters':
+            inputs[entry.link_label] = canonicalize_parameters(entry.node.get_dict())
+        else:
+            inputs[entry.link_label] = entry.node.get_hash()
+
+    return make_hash([node.process_type, node.computer.uuid if node.computer else None, inputs])
+
+
+def get_cache_statistics(pks):
+    """Return the statistics of the caching of a batch of calculations, in order of their pks.
+
+    A calculation counts as a duplicate if it was not taken from the cache although an earlier calculation of the batch
+    has the same hash, for example because the caching was disabled, and as equivalent if it was not taken from the
+    cache and only an earlier calculation with the same canonical parameters exists, a hit that canonicalized
+    parameters would have given.
+
+    :param pks: the pks of the calculations
+    :return: `CacheStatistics` with the number of calculations, of those taken from the cache, of duplicates and of
+        equivalent calculations
+    """
+    from aiida import orm
+
+    cached = duplicates = equivalent = 0
+    hashes, keys = set(), set()
+
+    for pk in sorted(pks):
+        node = orm.load_node(pk)
+        node_hash = node.get_extra(EXTRA_HASH, None)
+        key = get_canonical_key(node)
+
+        if node.get_extra(EXTRA_CACHED_FROM, None) is not None:
+            cached += 1
+        elif node_hash is not None and node_hash in hashes:
+            duplicates += 1
+        elif key in keys:
+            equivalent += 1
+
+        if node_hash is not None:
+            hashes.add(node_hash)
+        keys.add(key)
+
+    return CacheStatistics(len(pks), cached, duplicates, equivalent)
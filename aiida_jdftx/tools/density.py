@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""Conversion of the electron density dumped by jdftx into Gaussian cube and XCrySDen XSF files.
+
+The density is dumped as a raw binary file of doubles in electrons per bohr^3 on the fftbox grid, the last dimension
+being the fastest. It is read through a memory map in slabs of the grid, which are downsampled or cropped and written
+in large formatted blocks, such that the complete grid is never loaded into memory.
+"""
+import re
+
+import numpy as np
+
+from aiida import orm
+from aiida.engine import calcfunction
+
+from .._constants import CONSTANTS
+
+# the number of bytes of the grid that are read and formatted at once
+DEFAULT_BLOCK_SIZE = 8 * 1024**2
+
+FORMATS = ('cube', 'xsf')
+
+
+def get_fftbox_shape(stdout):
+    """Return the shape of the grid of the density from the stdout of a jdftx run.
+
+    The first `Chosen fftbox size` is the one of the density, the later ones being those of the wavefunctions.
+    """
+    match = re.search(r'Chosen fftbox size, S = \[\s*(\d+)\s+(\d+)\s+(\d+)\s*\]', stdout)
+
+    if match is None:
+        raise ValueError('the stdout does not contain the fftbox size')
+
+    return tuple(int(value) for value in match.groups())
+
+
+class DensityGrid:
+    """Downsampled or cropped view of the density dumped by jdftx, read through a memory map.
+
+    :param filepath: the path of the binary density file
+    :param shape: the shape of the fftbox grid
+    :param step: keep every `step` grid points along every direction
+    :param crop: optional ranges `[start, stop]` of the grid points kept along every direction, before the downsampling
+    """
+
+    def __init__(self, filepath, shape, step=1, crop=None):
+        self.shape = tuple(int(value) for value in shape)
+        self.density = np.memmap(filepath, dtype='<f8', mode='r', shape=self.shape)
+        self.step = int(step)
+        self.crop = [tuple(bounds) for bounds in crop] if crop is not None else [(0, size) for size in self.shape]
+        self.slices = [slice(start, stop, self.step) for start, stop in self.crop]
+
+    @property
+    def output_shape(self):
+        """Return the shape of the grid after the downsampling and cropping."""
+        return tuple(len(range(size)[index]) for size, index in zip(self.shape, self.slices))
+
+    def get_voxels(self, cell):
+        """Return the origin and the three voxel vectors of the output grid, in the units of the cell."""
+        cell = np.array(cell)
+        voxels = cell * (self.step / np.array(self.shape))[:, None]
+        origin = (np.array([start for start, _ in self.crop]) / np.array(self.shape)) @ cell
+
+        return origin, voxels
+
+    def iter_slabs(self, block_size=DEFAULT_BLOCK_SIZE, last=None):
+        """Yield the output grid in slabs along the first direction, each read from about `block_size` bytes.
+
+        :param last: optional slice of the last direction to which the slabs are restricted
+        """
+        last = self.slices[2] if last is None else last
+        first = range(self.shape[0])[self.slices[0]]
+        number = max(1, block_size // (self.shape[1] * self.shape[2] * self.density.itemsize))
+
+        for start in range(0, len(first), number):
+            rows = first[start:start + number]
+            yield np.array(self.density[rows.start:rows.stop:rows.step, self.slices[1], last])
+
+    def iter_planes_transposed(self, block_size=DEFAULT_BLOCK_SIZE):
+        """Yield the output grid in blocks of planes along the last direction, with the first direction the fastest.
+
+        Every block requires a pass over the memory map, so the blocks are as large as `block_size` allows.
+        """
+        third = range(self.shape[2])[self.slices[2]]
+        number = max(1, block_size // (self.output_shape[0] * self.output_shape[1] * self.density.itemsize))
+
+        for start in range(0, len(third), number):
+            planes = third[start:start + number]
+            block = np.concatenate(list(self.iter_slabs(block_size, slice(planes.start, planes.stop, planes.step))))
+            yield block.transpose(2, 1, 0)
+
+
+def format_rows(values, row_length, values_per_line=6, value_format='%13.5e'):
+    """Return the text of the values written in rows of `row_length`, every row wrapped every `values_per_line`.
+
+    The whole block is formatted by a single format operation.
+    """
+    full_lines, remainder = divmod(row_length, values_per_line)
+    row_format = (value_format * values_per_line + '\n') * full_lines
+
+    if remainder:
+        row_format += value_format * remainder + '\n'
+
+    number_of_rows = values.size // row_length
+
+    return (row_format * number_of_rows) % tuple(values.ravel())
+
+
+def write_cube(handle, grid, structure, block_size=DEFAULT_BLOCK_SIZE):
+    """Write the density grid as a Gaussian cube file, in bohr and electrons per bohr^3.
+
+    :param handle: a text file-like object
+    :param grid: the `DensityGrid`
+    :param structure: the `StructureData` of the run
+    """
+    cell = np.array(structure.cell) * CONSTANTS.ang_to_bohr
+    origin, voxels = grid.get_voxels(cell)
+    sites = structure.sites
+
+    handle.write('Electron density dumped by jdftx\n')
+    handle.write(f'Grid {grid.shape} with step {grid.step}, outer loop along the first lattice vector\n')
+    handle.write('{:5d} {:12.6f} {:12.6f} {:12.6f}\n'.format(len(sites), *origin))
+
+    for size, voxel in zip(grid.output_shape, voxels):
+        handle.write('{:5d} {:12.6f} {:12.6f} {:12.6f}\n'.format(size, *voxel))
+
+    for site in sites:
+        number = get_atomic_number(structure.get_kind(site.kind_name).symbol)
+        position = np.array(site.position) * CONSTANTS.ang_to_bohr
+        handle.write('{:5d} {:12.6f} {:12.6f} {:12.6f} {:12.6f}\n'.format(number, float(number), *position))
+
+    for slab in grid.iter_slabs(block_size):
+        handle.write(format_rows(slab, grid.output_shape[2]))
+
+
+def write_xsf(handle, grid, structure, block_size=DEFAULT_BLOCK_SIZE):
+    """Write the structure and the density grid as an XCrySDen XSF file, in angstrom and electrons per bohr^3.
+
+    The grid is written as a general grid spanning from its first to its last point, without the periodic images.
+
+    :param handle: a text file-like object
+    :param grid: the `DensityGrid`
+    :param structure: the `StructureData` of the run
+    """
+    cell = np.array(structure.cell)
+    origin, voxels = grid.get_voxels(cell)
+    spans = voxels * (np.array(grid.output_shape) - 1)[:, None]
+
+    handle.write('CRYSTAL\nPRIMVEC\n')
+    handle.write(''.join('{:14.8f} {:14.8f} {:14.8f}\n'.format(*vector) for vector in cell))
+    handle.write(f'PRIMCOORD\n{len(structure.sites)} 1\n')
+
+    for site in structure.sites:
+        number = get_atomic_number(structure.get_kind(site.kind_name).symbol)
+        handle.write('{:3d} {:14.8f} {:14.8f} {:14.8f}\n'.format(number, *site.position))
+
+    handle.write('BEGIN_BLOCK_DATAGRID_3D\ndensity\nBEGIN_DATAGRID_3D_density\n')
+    handle.write('{:d} {:d} {:d}\n'.format(*grid.output_shape))
+    handle.write('{:14.8f} {:14.8f} {:14.8f}\n'.format(*origin))
+    handle.write(''.join('{:14.8f} {:14.8f} {:14.8f}\n'.format(*span) for span in spans))
+
+    for block in grid.iter_planes_transposed(block_size):
+        handle.write(format_rows(block, grid.output_shape[0]))
+
+    handle.write('END_DATAGRID_3D\nEND_BLOCK_DATAGRID_3D\n')
+
+
+def get_atomic_number(symbol):
+    """Return the atomic number of a chemical symbol."""
+    from aiida.common.constants import elements
+
+    return next(number for number, element in elements.items() if element['symbol'] == symbol)
+
+
+def convert_density(filepath, output_filepath, structure, shape, step=1, crop=None, fileformat=None,
+                    block_size=DEFAULT_BLOCK_SIZE):
+    """Convert a density file dumped by jdftx into a cube or XSF file.
+
+    :param filepath: the path of the binary density file
+    :param output_filepath: the path of the written file
+    :param structure: the `StructureData` of the run
+    :param shape: the shape of the fftbox grid, see `get_fftbox_shape`
+    :param step: keep every `step` grid points along every direction
+    :param crop: optional ranges `[start, stop]` of the grid points kept along every direction
+    :param fileformat: `cube` or `xsf`, by default the extension of the output file
+    :param block_size: the number of bytes of the grid read and formatted at once
+    """
+    fileformat = fileformat or output_filepath.rsplit('.', 1)[-1].lower()
+
+    if fileformat not in FORMATS:
+        raise ValueError(f'unsupported format `{fileformat}`, choose from {FORMATS}')
+
+    grid = DensityGrid(filepath, shape, step, crop)
+    writer = write_cube if fileformat == 'cube' else write_xsf
+
+    with open(output_filepath, 'w') as handle:
+        writer(handle, grid, structure, block_size)
+
+
+@calcfunction
+def get_density_file(density, structure, parameters):
+    """Convert the density dumped by jdftx into a cube or XSF file.
+
+    :param density: the `SinglefileData` of the binary density file
+    :param structure: the `StructureData` of the run
+    :param parameters: `Dict` with the `shape` of the fftbox grid and optionally the `step`, `crop` and `format`,
+        by default `cube`
+    :return: `SinglefileData` of the converted file
+    """
+    import os
+    import tempfile
+
+    parameters = parameters.get_dict()
+    fileformat = parameters.get('format', 'cube')
+
+    with tempfile.TemporaryDirectory() as dirpath:
+        filepath = os.path.join(dirpath, 'density')
+        output_filepath = os.path.join(dirpath, f'density.{fileformat}')
+
+        with density.open(mode='rb') as source, open(filepath, 'wb') as target:
+            for block in iter(lambda: source.read(DEFAULT_BLOCK_SIZE), b''):
+                target.write(block)
+
+        convert_density(filepath, output_filepath, structure, parameters['shape'], parameters.get('step', 1),
+                        parameters.get('crop'), fileformat)
+
+        return orm.SinglefileData(output_filepath)
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""Export of the results of `JdftxCalculation` nodes to a partitioned columnar dataset in the Parquet format.
+
+The dataset consists of one directory per table, `parameters`, `structures` and optionally `trajectories`, each with
+one Parquet file per page of calculations. The tables are joined on the `pk` column of the calculation. The export
+can be interrupted and resumed: the last exported pk is recorded in `progress.json` once all tables of a page are
+written.
+"""
+import io
+import json
+import os
+
+import numpy as np
+
+from aiida import orm
+
+from ..stdout import energy_components
+
+PROGRESS_FILENAME = 'progress.json'
+
+TABLE_PARAMETERS = 'parameters'
+TABLE_STRUCTURES = 'structures'
+TABLE_TRAJECTORIES = 'trajectories'
+
+# the column of the values of the output parameters and of the arrays of the trajectories without a column of their own
+COLUMN_OTHER = 'other'
+
+# the types of the columns of the known output parameters, besides the energy components and their units, where the
+# lists are encoded in JSON
+PARAMETER_TYPES = {
+    'spin_type': 'string',
+    'number_of_electrons': 'float64',
+    'number_of_bands': 'int64',
+    'number_of_states': 'int64',
+    'converged': 'bool_',
+    'formula': 'string',
+    'number_of_atoms': 'int64',
+    'number_of_ionic_steps': 'int64',
+    'number_of_electronic_iterations': 'int64',
+    'volume': 'float64',
+    'volume_units': 'string',
+    'energy_per_atom': 'float64',
+    'energy_per_atom_units': 'string',
+    'max_force': 'float64',
+    'max_force_units': 'string',
+    'energies': 'string',
+    'energies_units': 'string',
+    'max_forces': 'string',
+    'max_forces_units': 'string',
+    'cell': 'string',
+    'cell_units': 'string',
+    'positions': 'string',
+    'positions_units': 'string',
+}
+PARAMETER_TYPES.update({key: 'float64' for key in energy_components.values()})
+PARAMETER_TYPES.update({f'{key}_units': 'string' for key in energy_components.values()})
+
+# the arrays of the trajectories with a column of their own
+TRAJECTORY_ARRAYS = ('steps', 'times', 'cells', 'positions', 'velocities', 'forces') + tuple(energy_components.values())
+
+
+def get_schema(table):
+    """Return the schema of a table, the same for every page such that the dataset is read with consistent columns.
+
+    The values without a column of their own, e.g. those added by a later version of the parser, are written in the
+    `other` column: the output parameters as a JSON object, the arrays of the trajectories in a map of the flattened
+    arrays and one of their shapes.
+    """
+    import pyarrow as pa
+
+    if table == TABLE_PARAMETERS:
+        fields = [('pk', pa.int64()), ('uuid', pa.string())]
+        fields += [(key, getattr(pa, value)()) for key, value in PARAMETER_TYPES.items()]
+        fields += [(COLUMN_OTHER, pa.string())]
+    elif table == TABLE_STRUCTURES:
+        fields = [
+            ('pk', pa.int64()),
+            ('cell', pa.list_(pa.list_(pa.float64()))),
+            ('kind_names', pa.list_(pa.string())),
+            ('symbols', pa.list_(pa.string())),
+            ('positions', pa.list_(pa.list_(pa.float64()))),
+        ]
+    elif table == TABLE_TRAJECTORIES:
+        fields = [('pk', pa.int64())]
+        for name in TRAJECTORY_ARRAYS:
+            fields += [(name, pa.list_(pa.float64())), (f'{name}_shape', pa.list_(pa.int64()))]
+        fields += [
+            (COLUMN_OTHER, pa.map_(pa.string(), pa.list_(pa.float64()))),
+            (f'{COLUMN_OTHER}_shape', pa.map_(pa.string(), pa.list_(pa.int64()))),
+        ]
+    else:
+        raise ValueError(f'unknown table `{table}`')
+
+    return pa.schema(fields)
+
+
+def get_calculation_pages(process_type='aiida.calculations:jdftx', group=None, filters=None, page_size=1000,
+                          last_pk=0):
+    """Yield the pks of the successfully finished calculations in pages of increasing pk.
+
+    The pages are queried on demand with a filter on the pk instead of an offset, such that calculations added while
+    iterating do not shift the pages.
+
+    :param process_type: the process type of the calculations
+    :param group: optional group to which the calculations have to belong
+    :param filters: optional additional QueryBuilder filters on the calculation nodes
+    :param page_size: the maximum number of calculations per page
+    :param last_pk: only calculations with a larger pk are returned
+    """
+    while True:
+        builder = orm.QueryBuilder()
+        relationship = {}
+
+        if group is not None:
+            builder.append(orm.Group, filters={'id': group.pk}, tag='group')
+            relationship['with_group'] = 'group'
+
+        builder.append(orm.CalcJobNode, tag='calc', project='id', **relationship,
+            filters={
+                **(filters or {}),
+                'id': {'>': last_pk},
+                'process_type': process_type,
+                'attributes.exit_status': 0,
+            })
+        builder.order_by({'calc': {'id': 'asc'}})
+        builder.limit(page_size)
+
+        pks = builder.all(flat=True)
+
+        if not pks:
+            return
+
+        yield pks
+        last_pk = pks[-1]
+
+
+def get_output_attributes(pks, link_label, node_class):
+    """Return the attributes of the output nodes with the given link label of the calculations, keyed by their pk."""
+    builder = orm.QueryBuilder()
+    builder.append(orm.CalcJobNode, filters={'id': {'in': pks}}, tag='calc', project='id')
+    builder.append(node_class, with_incoming='calc', edge_filters={'label': link_label}, project='attributes')
+
+    return dict(builder.all())
+
+
+def get_structure_row(pk, attributes):
+    """Return the row of the structure table for the attributes of a `StructureData`."""
+    symbols = {kind['name']: kind['symbols'][0] for kind in attributes['kinds']}
+
+    return {
+        'pk': pk,
+        'cell': attributes['cell'],
+        'kind_names': [site['kind_name'] for site in attributes['sites']],
+        'symbols': [symbols[site['kind_name']] for site in attributes['sites']],
+        'positions': [site['position'] for site in attributes['sites']],
+    }
+
+
+def get_parameters_row(pk, uuid, parameters):
+    """Return the row of the parameters table, with the values that are not scalars encoded in JSON.
+
+    The values of the keys without a column of their own are gathered as a JSON object in the `other` column.
+    """
+    row = {'pk': pk, 'uuid': uuid}
+    other = {}
+
+    for key, value in parameters.items():
+        if key not in PARAMETER_TYPES:
+            other[key] = value
+        elif PARAMETER_TYPES[key] == 'string' and not isinstance(value, str):
+            row[key] = json.dumps(value)
+        else:
+            row[key] = value
+
+    row[COLUMN_OTHER] = json.dumps(other) if other else None
+
+    return row
+
+
+def decode_arrays(pk, contents):
+    """Decode the `.npy` contents of the arrays of a trajectory into a row of flattened arrays and their shapes.
+
+    This function is run in the worker processes, so it only receives the raw bytes and has no access to the database.
+
+    :param pk: the pk of the calculation
+    :param contents: dictionary of the bytes of the `.npy` file of every array, keyed by the array name
+    """
+    row = {'pk': pk}
+    other, other_shape = {}, {}
+
+    for name, content in contents.items():
+        array = np.load(io.BytesIO(content))
+        values = np.ascontiguousarray(array, dtype=np.float64).ravel()
+
+        if name in TRAJECTORY_ARRAYS:
+            row[name] = values
+            row[f'{name}_shape'] = list(array.shape)
+        else:
+            other[name] = values
+            other_shape[name] = list(array.shape)
+
+    if other:
+        row[COLUMN_OTHER] = list(other.items())
+        row[f'{COLUMN_OTHER}_shape'] = list(other_shape.items())
+
+    return row
+
+
+def get_trajectory_contents(pks):
+    """Yield the pk of the calculation and the bytes of every array of its `output_trajectory`."""
+    builder = orm.QueryBuilder()
+    builder.append(orm.CalcJobNode, filters={'id': {'in': pks}}, tag='calc', project='id')
+    builder.append(orm.TrajectoryData, with_incoming='calc', edge_filters={'label': 'output_trajectory'}, project='*')
+
+    for pk, trajectory in builder.iterall():
+        names = trajectory.get_arraynames()
+        yield pk, {name: trajectory.get_object_content(f'{name}.npy', mode='rb') for name in names}
+
+
+def write_table(rows, dirpath, filename, schema):
+    """Write the rows as a Parquet file, atomically such that an interrupted export never leaves a partial file.
+
+    Every file of a table is written with the same schema, whatever the keys of its rows: missing values are written
+    as nulls, such that the pages of the table are read as a single dataset.
+
+    :param rows: list of dictionaries keyed by the columns of the schema
+    :param dirpath: the directory of the table
+    :param filename: the name of the file of the page
+    :param schema: the `pyarrow.Schema` of the table, as returned by `get_schema`
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = {name: [row.get(name) for row in rows] for name in schema.names}
+
+    os.makedirs(dirpath, exist_ok=True)
+    filepath = os.path.join(dirpath, filename)
+
+    pq.write_table(pa.table(columns, schema=schema), f'{filepath}.tmp')
+    os.replace(f'{filepath}.tmp', filepath)
+
+
+def export_results(dirpath, group=None, filters=None, page_size=1000, trajectories=False, max_workers=None,
+                   process_type='aiida.calculations:jdftx'):
+    """Export the results of the successfully finished `JdftxCalculation` nodes to a partitioned Parquet dataset.
+
+    Only a single page of calculations is kept in memory at any time. If the directory contains the progress of an
+    interrupted export, it is resumed after the last exported calculation.
+
+    :param dirpath: the directory of the dataset
+    :param group: optional group to which the calculations have to belong
+    :param filters: optional additional QueryBuilder filters on the calculation nodes
+    :param page_size: the number of calculations per page and per Parquet file
+    :param trajectories: whether to export the arrays of the `output_trajectory` as well
+    :param max_workers: the number of worker processes decoding the trajectory arrays, by default the number of CPUs
+    :param process_type: the process type of the calculations
+    :return: the number of exported calculations
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    try:
+        import pyarrow  # pylint: disable=unused-import
+    except ImportError as exception:
+        raise ImportError('the export requires `pyarrow`: install it with `pip install aiida-jdftx[export]`') from exception
+
+    progress_filepath = os.path.join(dirpath, PROGRESS_FILENAME)
+
+    try:
+        with open(progress_filepath) as handle:
+            progress = json.load(handle)
+    except FileNotFoundError:
+        progress = {'last_pk': 0, 'number_of_calculations': 0}
+
+    pages = get_calculation_pages(process_type, group, filters, page_size, progress['last_pk'])
+    schemas = {table: get_schema(table) for table in (TABLE_PARAMETERS, TABLE_STRUCTURES, TABLE_TRAJECTORIES)}
+
+    # the worker processes are only needed to decode the trajectory arrays
+    executor = ProcessPoolExecutor(max_workers=max_workers) if trajectories else None
+
+    try:
+        for pks in pages:
+            filename = f'part-{pks[0]:012d}-{pks[-1]:012d}.parquet'
+
+            builder = orm.QueryBuilder()
+            builder.append(orm.CalcJobNode, filters={'id': {'in': pks}}, project=['id', 'uuid'])
+            uuids = dict(builder.all())
+
+            parameters = get_output_attributes(pks, 'output_parameters', orm.Dict)
+            rows = [get_parameters_row(pk, uuids[pk], parameters.get(pk, {})) for pk in pks]
+            write_table(rows, os.path.join(dirpath, TABLE_PARAMETERS), filename, schemas[TABLE_PARAMETERS])
+
+            # the parser only creates an `output_structure` if the structure changed, otherwise take the input one
+            structures = get_output_attributes(pks, 'output_structure', orm.StructureData)
+            missing = [pk for pk in pks if pk not in structures]
+
+            if missing:
+                builder = orm.QueryBuilder()
+                builder.append(orm.CalcJobNode, filters={'id': {'in': missing}}, tag='calc', project='id')
+                builder.append(orm.StructureData, with_outgoing='calc', edge_filters={'label': 'structure'},
+                    project='attributes')
+                structures.update(dict(builder.all()))
+
+            rows = [get_structure_row(pk, structures[pk]) for pk in pks if pk in structures]
+            write_table(rows, os.path.join(dirpath, TABLE_STRUCTURES), filename, schemas[TABLE_STRUCTURES])
+
+            if trajectories:
+                futures = [executor.submit(decode_arrays, pk, contents) for pk, contents in get_trajectory_contents(pks)]
+                rows = sorted((future.result() for future in futures), key=lambda row: row['pk'])
+                write_table(rows, os.path.join(dirpath, TABLE_TRAJECTORIES), filename, schemas[TABLE_TRAJECTORIES])
+
+            progress['last_pk'] = pks[-1]
+            progress['number_of_calculations'] += len(pks)
+
+            with open(f'{progress_filepath}.tmp', 'w') as handle:
+                json.dump(progress, handle)
+            os.replace(f'{progress_filepath}.tmp', progress_filepath)
+
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return progress['number_of_calculations']
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""Fingerprints of crystal structures and a persistent index of them, to skip the submission of duplicate structures.
+
+The fingerprint of a structure is its composition and, for every pair of species, the smeared histogram of the
+interatomic distances up to a cutoff, counted over all periodic images and divided by the number of atoms. It is thus
+invariant to the order of the sites, to a translation and to the choice of the cell, including supercells, and varies
+continuously with the positions such that near duplicates have close fingerprints.
+
+The index is a SQLite database of the fingerprints of the structures that were submitted, with the uuid of the process
+that was submitted for each. Only the fingerprints of the same composition are compared. They are loaded from the
+database once per composition into a matrix in memory, which is then only extended with the rows added since, such
+that a lookup does not decode the blobs again. The candidates are first selected on the sum of their fingerprint, a
+lower bound of the distance, such that only a few rows of the matrix are compared element by element.
+"""
+import sqlite3
+
+import numpy as np
+
+from .symmetry import get_fractional_positions
+
+DEFAULT_CUTOFF = 6.  # angstrom
+DEFAULT_BIN_WIDTH = 0.1  # angstrom
+DEFAULT_TOLERANCE = 0.02
+
+EXTRA_DUPLICATE_OF = 'jdftx_duplicate_of'
+
+
+def get_fingerprint(cell, positions, symbols, cutoff=DEFAULT_CUTOFF, width=DEFAULT_BIN_WIDTH):
+    """Return the fingerprint of a structure, the concatenated histograms of the distances of every pair of species.
+
+    The histogram is smeared with a Gaussian of the width of a bin. The pairs are ordered by their sorted symbols, such
+    that the fingerprints of structures of the same composition can be compared element by element.
+
+    :param cell: the lattice vectors as rows, in angstrom
+    :param positions: the Cartesian positions of the sites, in angstrom
+    :param symbols: the chemical symbols of the sites
+    :param cutoff: the largest distance included in the histograms
+    :param width: the width of the bins
+    :return: a float32 array
+    """
+    cell = np.asarray(cell, dtype=float)
+    positions = get_fractional_positions(cell, positions) @ cell
+    species, numbers = np.unique(symbols, return_inverse=True)
+
+    # the number of images along every lattice vector that contain all neighbours within the cutoff of the wrapped
+    # positions, from the spacing of the lattice planes
+    spacings = 1. / np.linalg.norm(np.linalg.inv(cell), axis=0)
+    repeats = np.ceil(cutoff / spacings).astype(int) + 1
+    grid = np.meshgrid(*[np.arange(-repeat, repeat + 1) for repeat in repeats], indexing='ij')
+    images = np.stack(grid, axis=-1).reshape(-1, 3) @ cell
+
+    # the index of the pair of species of every pair of sites, the pairs being ordered as the upper triangle
+    pairs = np.full((len(species), len(species)), -1)
+    pairs[np.triu_indices(len(species))] = np.arange(len(species) * (len(species) + 1) // 2)
+    pairs = np.maximum(pairs, pairs.T)
+
+    centers = np.arange(width / 2, cutoff, width)
+    histograms = np.zeros((pairs.max() + 1, len(centers)))
+
+    for position, number in zip(positions, numbers):
+        vectors = positions[:, np.newaxis, :] + images[np.newaxis, :, :] - position
+        distances = np.linalg.norm(vectors, axis=-1)
+        mask = (distances > 1e-8) & (distances < cutoff)
+
+        weights = np.exp(-0.5 * ((distances[mask][:, np.newaxis] - centers) / width)**2)
+        neighbours = np.broadcast_to(pairs[number][numbers][:, np.newaxis], distances.shape)[mask]
+        np.add.at(histograms, neighbours, weights)
+
+    return (histograms / len(positions)).astype(np.float32).ravel()
+
+
+def get_distances(fingerprint, fingerprints):
+    """Return the relative L1 distances between a fingerprint and each of the rows of an array of fingerprints."""
+    norms = np.maximum(np.abs(fingerprints).sum(axis=1), np.abs(fingerprint).sum())
+
+    return np.abs(fingerprints - fingerprint).sum(axis=1) / np.maximum(norms, np.finfo(np.float32).tiny)
+
+
+def get_structure_fingerprint(structure, cutoff=DEFAULT_CUTOFF, width=DEFAULT_BIN_WIDTH):
+    """Return the composition and the fingerprint of a `StructureData`."""
+    symbols = [structure.get_kind(site.kind_name).symbol for site in structure.sites]
+    positions = [site.position for site in structure.sites]
+
+    return structure.get_formula(mode='hill_compact'), get_fingerprint(structure.cell, positions, symbols, cutoff, width)
+
+
+class _CompositionFingerprints:
+    """The fingerprints of a composition loaded from the index, in a matrix grown by doubling its capacity."""
+
+    def __init__(self, size):
+        self.last_id = 0
+        self.count = 0
+        self.uuids = []
+        self.matrix = np.empty((16, size), dtype=np.float32)
+        self.norms = np.empty(16, dtype=np.float32)
+
+    def extend(self, uuids, fingerprints):
+        """Append the rows of an array of fingerprints with their uuids."""
+        count = self.count + len(uuids)
+
+        if count > len(self.matrix):
+            capacity = max(count, 2 * len(self.matrix))
+            self.matrix = np.resize(self.matrix, (capacity, self.matrix.shape[1]))
+            self.norms = np.resize(self.norms, capacity)
+
+        self.matrix[self.count:count] = fingerprints
+        self.norms[self.count:count] = np.abs(fingerprints).sum(axis=1)
+        self.uuids.extend(uuids)
+        self.count = count
+
+    def find(self, fingerprint, tolerance):
+        """Return the uuid of the closest fingerprint within the tolerance, or None."""
+        norm = np.abs(fingerprint).sum()
+        norms = self.norms[:self.count]
+
+        # the difference of the norms is a lower bound of the L1 distance
+        candidates = np.flatnonzero(np.abs(norms - norm) <= tolerance * np.maximum(norms, norm))
+
+        if len(candidates) == 0:
+            return None
+
+        distances = get_distances(fingerprint, self.matrix[candidates])
+        closest = int(np.argmin(distances))
+
+        return self.uuids[candidates[closest]] if distances[closest] <= tolerance else None
+
+
+class FingerprintIndex:
+    """Persistent index of the fingerprints of structures in a SQLite database, with the uuid of a node for each."""
+
+    def __init__(self, filepath, tolerance=DEFAULT_TOLERANCE):
+        """Construct the index, creating the database if it does not exist.
+
+        :param filepath: the path of the database
+        :param tolerance: the largest relative distance of the fingerprints of duplicate structures
+        """
+        self.tolerance = tolerance
+        self.fingerprints = {}
+        self.connection = sqlite3.connect(filepath)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS fingerprints '
+            '(id INTEGER PRIMARY KEY, composition TEXT NOT NULL, uuid TEXT NOT NULL, fingerprint BLOB NOT NULL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS composition_id_index ON fingerprints (composition, id)')
+        self.connection.commit()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM fingerprints').fetchone()[0]
+
+    def close(self):
+        """Close the database."""
+        self.connection.close()
+
+    def add(self, composition, fingerprint, uuid):
+        """Add a fingerprint with the uuid of its node."""
+        fingerprint = np.asarray(fingerprint, dtype=np.float32)
+        self.connection.execute(
+            'INSERT INTO fingerprints (composition, uuid, fingerprint) VALUES (?, ?, ?)',
+            (composition, uuid, fingerprint.tobytes()),
+        )
+        self.connection.commit()
+
+    def find(self, composition, fingerprint):
+        """Return the uuid of the closest fingerprint of the same composition within the tolerance, or None.
+
+        The fingerprints of the composition that were added to the database since the previous lookup, including by
+        other processes, are loaded first.
+        """
+        fingerprint = np.asarray(fingerprint, dtype=np.float32)
+        key = (composition, fingerprint.size)
+
+        if key not in self.fingerprints:
+            self.fingerprints[key] = _CompositionFingerprints(fingerprint.size)
+
+        fingerprints = self.fingerprints[key]
+
+        rows = self.connection.execute(
+            'SELECT id, uuid, fingerprint FROM fingerprints WHERE composition = ? AND id > ? ORDER BY id',
+            (composition, fingerprints.last_id),
+        ).fetchall()
+
+        if rows:
+            fingerprints.last_id = rows[-1][0]
+            rows = [(uuid, blob) for _, uuid, blob in rows if len(blob) == fingerprint.nbytes]
+
+        if rows:
+            matrix = np.frombuffer(b''.join(blob for _, blob in rows), dtype=np.float32).reshape(len(rows), -1)
+            fingerprints.extend([uuid for uuid, _ in rows], matrix)
+
+        return fingerprints.find(fingerprint, self.tolerance)
+
+
+def submit_unique(structures, get_builder, index, submit=None):
+    """Submit a process for every structure that is not a duplicate of a structure in the index.
+
+    The structure of a duplicate gets the `jdftx_duplicate_of` extra with the uuid of the process of the equivalent
+    structure, which is returned in its place. The fingerprint of every submitted structure is added to the index, such
+    that duplicates within the structures are also skipped.
+
+    :param structures: iterable of `StructureData`
+    :param get_builder: function returning the builder of the process of a structure
+    :param index: the `FingerprintIndex`
+    :param submit: the function submitting a builder, by default `aiida.engine.submit`
+    :return: the list of the submitted or equivalent processes of the structures
+    """
+    from aiida import orm
+
+    if submit is None:
+        from aiida.engine import submit
+
+    processes = []
+
+    for structure in structures:
+        composition, fingerprint = get_structure_fingerprint(structure)
+        uuid = index.find(composition, fingerprint)
+
+        if uuid is not None:
+            structure.set_extra(EXTRA_DUPLICATE_OF, uuid)
+            processes.append(orm.load_node(uuid))
+            continue
+
+        process = submit(get_builder(structure))
+        index.add(composition, fingerprint, process.uuid)
+        processes.append(process)
+
+    return processes
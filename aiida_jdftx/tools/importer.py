@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""Import of JDFTx runs done outside of AiiDA as finished `JdftxCalculation` nodes with their full provenance.
+
+The input file of a run is parsed back into the `structure`, `kpoints` and `parameters` inputs, i.e. the inverse of
+`JdftxCalculation._generate_inputdata`. The output files are stored as the `retrieved` folder, with the names used by
+`JdftxCalculation`, and parsed by the `JdftxParser` into the output nodes of the calculation.
+"""
+import collections
+import glob
+import os
+import re
+
+import numpy as np
+
+from aiida import orm
+from aiida.common.log import AIIDA_LOGGER
+
+from .._constants import CONSTANTS
+from ..inputfile import read_input_commands
+
+LOGGER = AIIDA_LOGGER.getChild('jdftx.importer')
+
+EXTRA_SOURCE = 'jdftx_import_source'
+
+# the commands that are converted into the structure, the kpoints and the dumped files instead of the parameters
+STRUCTURE_COMMANDS = ('lattice', 'lattice-scale', 'coords-type', 'ion', 'ion-species')
+KPOINTS_COMMANDS = ('kpoint', 'kpoint-folding')
+DUMP_COMMANDS = ('dump', 'dump-name', 'dump-interval', 'dump-only')
+
+ImportReport = collections.namedtuple('ImportReport', ['imported', 'failed'])
+
+
+def get_structure(commands):
+    """Return the `StructureData` described by the `lattice`, `lattice-scale`, `coords-type` and `ion` commands.
+
+    As in jdftx, the lattice vectors are the columns of the `lattice` matrix in bohr, and the ionic positions are in
+    lattice coordinates unless `coords-type` is `cartesian`, wherever that command is in the file.
+    """
+    from aiida.orm.nodes.data.structure import Kind, Site
+
+    lattice = None
+    scale = np.ones(3)
+    cartesian = False
+    ions = []
+
+    for command, arguments in commands:
+        values = arguments.split()
+
+        if command == 'lattice':
+            try:
+                lattice = np.array([float(value) for value in values]).reshape(3, 3)
+            except ValueError as exception:
+                message = f'only explicit lattice vectors are supported, got `lattice {arguments}`'
+                raise ValueError(message) from exception
+        elif command == 'lattice-scale':
+            scale = np.array([float(value) for value in values])
+        elif command == 'coords-type':
+            cartesian = arguments.lower() == 'cartesian'
+        elif command == 'ion':
+            ions.append((values[0], np.array([float(value) for value in values[1:4]])))
+
+    if lattice is None:
+        raise ValueError('the input file does not define the `lattice`')
+
+    # the lattice vectors are the scaled columns
+    cell = (lattice * scale).T * CONSTANTS.bohr_to_ang
+    structure = orm.StructureData(cell=cell.tolist())
+
+    for name in dict.fromkeys(name for name, _ in ions):
+        symbol = re.match(r'[A-Z][a-z]?', name.capitalize()).group()
+        structure.append_kind(Kind(name=name, symbols=symbol))
+
+    for name, position in ions:
+        position = position * CONSTANTS.bohr_to_ang if cartesian else position @ cell
+        structure.append_site(Site(kind_name=name, position=position.tolist()))
+
+    return structure
+
+
+def get_kpoints(commands, structure):
+    """Return the `KpointsData` described by the `kpoint-folding` and `kpoint` commands.
+
+    A folding is a mesh, whose offset is the single folded kpoint. Without folding, the kpoints are an explicit list.
+    """
+    folding = None
+    kpoints = []
+
+    for command, arguments in commands:
+        if command == 'kpoint-folding':
+            folding = [int(value) for value in arguments.split()]
+        elif command == 'kpoint':
+            kpoints.append([float(value) for value in arguments.split()[:4]])
+
+    result = orm.KpointsData()
+    result.set_cell_from_structure(structure)
+
+    # the default of jdftx is the Gamma point only
+    kpoints = np.array(kpoints or [[0., 0., 0., 1.]])
+
+    if folding is not None:
+        if len(kpoints) > 1:
+            raise ValueError('the folding of more than one kpoint is not supported')
+        result.set_kpoints_mesh(folding, offset=kpoints[0][:3].tolist())
+    else:
+        result.set_kpoints(kpoints[:, :3], weights=kpoints[:, 3] / kpoints[:, 3].sum())
+
+    return result
+
+
+def get_parameters(commands):
+    """Return the `Dict` of the parameters, i.e. all commands except those of the structure, kpoints and dumps.
+
+    A command that is repeated in the input file keeps its last arguments.
+    """
+    excluded = STRUCTURE_COMMANDS + KPOINTS_COMMANDS + DUMP_COMMANDS
+    return orm.Dict(dict={command: arguments for command, arguments in commands if command not in excluded})
+
+
+def get_dump_filename(commands, suffix):
+    """Return the name of the file dumped with the given variable name, according to the `dump-name` command."""
+    pattern = '$VAR'
+
+    for command, arguments in commands:
+        if command == 'dump-name':
+            pattern = arguments
+
+    return pattern.replace('$VAR', suffix)
+
+
+def find_file(dirpath, filename, extension):
+    """Return the path of the given file in the directory, or of its single file with the extension."""
+    if filename is not None:
+        return os.path.join(dirpath, filename)
+
+    filepaths = glob.glob(os.path.join(dirpath, f'*{extension}'))
+
+    if len(filepaths) != 1:
+        raise ValueError(f'expected a single `*{extension}` file in `{dirpath}`, found {len(filepaths)}')
+
+    return filepaths[0]
+
+
+def import_directory(dirpath, computer, code=None, pseudo_family=None, input_filename=None, output_filename=None):
+    """Import the jdftx run in a directory as a finished `JdftxCalculation` node.
+
+    :param dirpath: the directory of the run
+    :param computer: the `Computer` on which the run was done
+    :param code: optional `Code` of the jdftx executable, linked as the `code` input
+    :param pseudo_family: optional pseudopotential family, whose pseudopotentials are linked as the `pseudos` inputs
+    :param input_filename: the name of the input file, by default the single `*.in` file
+    :param output_filename: the name of the stdout file, by default the single `*.out` file
+    :return: the stored `CalcJobNode`
+    """
+    # pylint: disable=protected-access
+    from aiida.common import LinkType
+    from aiida.engine import ProcessState
+    from aiida.plugins import CalculationFactory
+    from aiida_jdftx.parsers import JdftxParser
+
+    JdftxCalculation = CalculationFactory('jdftx')
+
+    dirpath = os.path.abspath(dirpath)
+    input_filepath = find_file(dirpath, input_filename, '.in')
+    output_filepath = find_file(dirpath, output_filename, '.out')
+
+    commands = read_input_commands(input_filepath)
+    structure = get_structure(commands)
+
+    inputs = {
+        'structure': structure,
+        'kpoints': get_kpoints(commands, structure),
+        'parameters': get_parameters(commands),
+    }
+
+    if code is not None:
+        inputs['code'] = code
+
+    if pseudo_family is not None:
+        for kind, pseudo in pseudo_family.get_pseudos(structure=structure).items():
+            inputs[f'pseudos__{kind}'] = pseudo
+
+    node = orm.CalcJobNode(computer=computer, process_type='aiida.calculations:jdftx')
+    node.label = os.path.basename(dirpath)
+    node.set_option('input_filename', JdftxCalculation._DEFAULT_INPUT_FILE)
+    node.set_option('output_filename', JdftxCalculation._DEFAULT_OUTPUT_FILE)
+    node.set_option('parser_name', 'jdftx')
+    node.set_option('resources', {'num_machines': 1})
+    node.set_remote_workdir(dirpath)
+
+    for link_label, input_node in inputs.items():
+        node.add_incoming(input_node.store(), link_type=LinkType.INPUT_CALC, link_label=link_label)
+
+    node.store()
+    node.set_extra(EXTRA_SOURCE, dirpath)
+
+    # store the files under the names of a `JdftxCalculation`, which are those expected by the parser
+    retrieved = orm.FolderData()
+    retrieved.put_object_from_file(input_filepath, JdftxCalculation._DEFAULT_INPUT_FILE)
+    retrieved.put_object_from_file(output_filepath, JdftxCalculation._DEFAULT_OUTPUT_FILE)
+
+    prefix = JdftxCalculation._DUMP_PREFIX
+    for suffix in JdftxCalculation._DUMP_RETRIEVE_SUFFIXES + ['eigenvals']:
+        filepath = os.path.join(dirpath, get_dump_filename(commands, suffix))
+        if os.path.isfile(filepath):
+            retrieved.put_object_from_file(filepath, f'{prefix}.{suffix}')
+
+    retrieved.add_incoming(node, link_type=LinkType.CREATE, link_label='retrieved')
+    retrieved.store()
+
+    parser = JdftxParser(node)
+    exit_code = parser.parse()
+
+    for link_label, output in parser.outputs.items():
+        output.add_incoming(node, link_type=LinkType.CREATE, link_label=link_label)
+        output.store()
+
+    node.set_process_state(ProcessState.FINISHED)
+    node.set_exit_status(exit_code.status if exit_code else 0)
+    node.set_exit_message(exit_code.message if exit_code else None)
+    node.seal()
+
+    return node
+
+
+def import_chunk(dirpaths, computer_pk, code_pk=None, pseudo_family_pk=None, group_pk=None):
+    """Import a chunk of directories in a single database transaction, e.g. in a worker process.
+
+    The input files of all directories are read first, such that a directory with an invalid input file is skipped
+    without aborting the transaction of the others.
+
+    :return: a tuple of the pks of the imported calculations and of the directories that failed
+    """
+    from aiida.manage.manager import get_manager
+
+    computer = orm.load_computer(computer_pk)
+    code = orm.load_code(code_pk) if code_pk is not None else None
+    pseudo_family = orm.load_group(pseudo_family_pk) if pseudo_family_pk is not None else None
+
+    valid, failed = [], []
+
+    for dirpath in dirpaths:
+        try:
+            read_input_commands(find_file(dirpath, None, '.in'))
+            find_file(dirpath, None, '.out')
+        except (OSError, ValueError) as exception:
+            LOGGER.warning('skipping `%s`: %s', dirpath, exception)
+            failed.append(dirpath)
+        else:
+            valid.append(dirpath)
+
+    try:
+        with get_manager().get_backend().transaction():
+            pks = [import_directory(dirpath, computer, code, pseudo_family).pk for dirpath in valid]
+
+            if group_pk is not None:
+                orm.load_group(group_pk).add_nodes([orm.load_node(pk) for pk in pks])
+    except Exception:  # pylint: disable=broad-except
+        LOGGER.exception('failed to import the chunk starting with `%s`', dirpaths[0])
+        return [], failed + valid
+
+    return pks, failed
+
+
+def import_directories(dirpaths, computer, code=None, pseudo_family=None, group=None, max_workers=None,
+                       chunk_size=50, callback=None):
+    """Import the jdftx runs of the directories in a pool of worker processes, one transaction per chunk.
+
+    :param dirpaths: the directories of the runs
+    :param computer: the `Computer` on which the runs were done
+    :param code: optional `Code` of the jdftx executable
+    :param pseudo_family: optional pseudopotential family of the runs
+    :param group: optional group to which the imported calculations are added
+    :param max_workers: the number of worker processes, by default the number of CPUs
+    :param chunk_size: the number of directories imported in a single transaction
+    :param callback: optional function called with the number of processed directories after every chunk
+    :return: an `ImportReport` with the pks of the imported calculations and the directories that failed
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    from aiida.manage.configuration import get_profile
+    from .reparse import initialize_worker
+
+    chunks = [dirpaths[index:index + chunk_size] for index in range(0, len(dirpaths), chunk_size)]
+    imported, failed = [], []
+
+    arguments = (
+        computer.pk,
+        code.pk if code is not None else None,
+        pseudo_family.pk if pseudo_family is not None else None,
+        group.pk if group is not None else None,
+    )
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=initialize_worker, initargs=(get_profile().name,)) as executor:
+        futures = [executor.submit(import_chunk, chunk, *arguments) for chunk in chunks]
+
+        for future in as_completed(futures):
+            pks, failures = future.result()
+            imported.extend(pks)
+            failed.extend(failures)
+
+            if callback is not None:
+                callback(len(imported) + len(failed))
+
+    return ImportReport(sorted(imported), failed)
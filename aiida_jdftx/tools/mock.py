@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""Stand-in for the jdftx executable, to measure the throughput of the plugin without jdftx or a cluster.
+
+It is installed as the `aiida-jdftx-mock` console script, which is set up as the executable of a code and called with
+the command line of jdftx, `aiida-jdftx-mock -i aiida.in -o aiida.out`. It reads the input file, sleeps and writes a
+stdout and the dumped files in the formats of jdftx, which the `JdftxParser` parses like those of a real run:
+
+* the stdout has an electronic minimization for every ionic step, `nIterations` of the `ionic-minimize` or
+  `lattice-minimize` command plus one, with the positions and forces of all atoms;
+* the dumped files are those of the `dump End` command, the size of the eigenvalues, wavefunctions and density
+  scaling with the number of atoms and kpoints.
+
+The run is configured by the environment, e.g. through the `environment_variables` option of the calculation:
+`AIIDA_JDFTX_MOCK_DURATION` is the duration of the run in seconds, spread over its ionic steps, and
+`AIIDA_JDFTX_MOCK_ITERATIONS` the number of electronic iterations of every ionic step. The values only depend on the
+input file, such that the same input always gives the same outputs.
+"""
+import argparse
+import datetime
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+
+from ..inputfile import read_input_commands
+
+ENV_DURATION = 'AIIDA_JDFTX_MOCK_DURATION'
+ENV_ITERATIONS = 'AIIDA_JDFTX_MOCK_ITERATIONS'
+
+DEFAULT_DURATION = 1.  # seconds
+DEFAULT_ITERATIONS = 10
+
+# the valence electrons of every atom and the number of plane waves per atom of a kpoint, which set the sizes
+VALENCE_ELECTRONS = 4
+BASIS_PER_ATOM = 200
+DENSITY_PER_ATOM = 4096
+
+# the energies in Hartree of the density of states and the width of the Gaussian smearing of its levels
+DOS_ENERGIES = np.linspace(-0.5, 0.5, 1001)
+DOS_WIDTH = 0.01
+
+# the energy components printed by jdftx, as fractions of the total energy
+ENERGY_COMPONENTS = {'Eewald': 1.066, 'EH': -0.070, 'Eloc': 0.324, 'Enl': -0.234, 'Exc': 0.305, 'KE': -0.391}
+ENERGY_PER_ATOM = -3.94  # Hartree
+
+SEPARATOR = '-------------------------------------'
+
+
+class MockRun:
+    """Run of the mock jdftx, with the structure, kpoints and dumped quantities of its input file."""
+
+    def __init__(self, commands):
+        """Construct the run from the commands of the input file.
+
+        :param commands: list of tuples of the command name and the string of its arguments
+        """
+        self.commands = commands
+        inputs = dict(commands)
+
+        self.lattice = np.array([float(value) for value in inputs['lattice'].split()]).reshape(3, 3)
+        self.species = [arguments.split()[0] for command, arguments in commands if command == 'ion']
+        positions = np.array([[float(value) for value in arguments.split()[1:4]]
+                              for command, arguments in commands if command == 'ion'])
+
+        if inputs.get('coords-type', 'lattice').lower() == 'cartesian':
+            positions = np.linalg.solve(self.lattice, positions.T).T
+
+        self.positions = positions
+        self.kpoints = self.get_kpoints([arguments for command, arguments in commands if command == 'kpoint'],
+                                        inputs.get('kpoint-folding'))
+
+        self.relax_lattice = 'lattice-minimize' in inputs
+        minimize = inputs.get('lattice-minimize', inputs.get('ionic-minimize', ''))
+        options = minimize.split()
+        options = dict(zip(options[::2], options[1::2]))
+        self.number_of_steps = int(options.get('nIterations', 0)) + 1
+
+        self.dump_name = inputs.get('dump-name', '$VAR')
+        self.dump_quantities = [
+            quantity for command, arguments in commands if command == 'dump'
+            for quantity in arguments.split()[1:] if arguments.split()[0] == 'End'
+        ]
+
+        self.number_of_electrons = VALENCE_ELECTRONS * len(self.species)
+        self.number_of_bands = self.number_of_electrons // 2 + 2
+
+        seed = hashlib.md5(repr(commands).encode('utf-8')).digest()
+        self.rng = np.random.default_rng(int.from_bytes(seed[:8], 'little'))
+        self.energy = ENERGY_PER_ATOM * len(self.species) * (1. + 0.01 * self.rng.random())
+        self.displacements = self.rng.normal(0., 0.01, self.positions.shape)
+
+    @staticmethod
+    def get_kpoints(kpoints, folding):
+        """Return the kpoints in reciprocal lattice coordinates and their weights, the folded mesh if any."""
+        kpoints = np.array([[float(value) for value in kpoint.split()[:4]] for kpoint in kpoints] or [[0., 0., 0., 1.]])
+
+        if folding is not None:
+            mesh = [int(value) for value in folding.split()]
+            grid = np.stack(np.meshgrid(*[np.arange(size) for size in mesh], indexing='ij'), axis=-1).reshape(-1, 3)
+            points = (grid + kpoints[0, :3]) / mesh
+            points -= np.round(points)
+            return points, np.full(len(points), 1. / len(points))
+
+        return kpoints[:, :3], kpoints[:, 3] / kpoints[:, 3].sum()
+
+    def get_filename(self, variable):
+        """Return the name of a dumped file."""
+        return self.dump_name.replace('$VAR', variable)
+
+    def get_step(self, step):
+        """Return the lattice, the positions, the forces and the total energy of an ionic step.
+
+        The first step is the geometry of the input, which relaxes towards displaced positions pulled by the forces.
+        """
+        decay = 0.5**step
+        positions = self.positions + self.displacements * (1. - decay)
+        forces = self.displacements * decay * 0.1
+        lattice = self.lattice * (1. - 0.002 * (1. - decay)) if self.relax_lattice else self.lattice
+        energy = self.energy - 0.01 * (1. - decay)
+
+        return lattice, positions, forces, energy
+
+    def write_header(self, handle, command_line):
+        """Write the header of the stdout up to the end of the initialization."""
+        handle.write('\n*************** JDFTx 1.6.0 (mock) ***************\n\n')
+        handle.write(f'Start date and time: {datetime.datetime.now().ctime()}\n')
+        handle.write(f'Executable jdftx with command-line: {command_line}\n')
+        handle.write('Run totals: 1 processes, 1 threads, 0 GPUs\n\n\n')
+        handle.write('Input parsed successfully to the following command list (including defaults):\n\n')
+
+        for command, arguments in self.commands:
+            handle.write(f'{command} {arguments}\n')
+
+        handle.write('\n\nspintype no-spin\n\n')
+        handle.write(f'nElectrons: {self.number_of_electrons:10.6f}   nBands: {self.number_of_bands}   '
+                     f'nStates: {len(self.kpoints[0])}\n\n')
+        handle.write('Initialization completed successfully at t[s]:      0.00\n\n')
+
+    def write_step(self, handle, step, start, duration):
+        """Write the electronic minimization and the ionic step to the stdout, spreading the duration over them."""
+        lattice, positions, forces, energy = self.get_step(step)
+        iterations = int(os.environ.get(ENV_ITERATIONS, DEFAULT_ITERATIONS))
+
+        handle.write('\n-------- Electronic minimization -----------\n')
+        for iteration in range(iterations):
+            time.sleep(duration / iterations)
+            value = energy + 0.1 * 0.5**iteration
+            handle.write(f'ElecMinimize: Iter: {iteration:3d}  Etot: {value:.15f}  |grad|_K:  {0.5**iteration:.3e}  '
+                         f'alpha:  1.000e+00  linmin: -1.000e-04  t[s]: {time.time() - start:10.2f}\n')
+            handle.flush()
+        handle.write('ElecMinimize: Converged (|Delta Etot|<1.000000e-08 for 2 iters).\n\n')
+
+        if self.relax_lattice:
+            handle.write('# Lattice vectors:\nR = \n')
+            for row in lattice:
+                handle.write('[ ' + ''.join(f'{value:13g}' for value in row) + '  ]\n')
+            handle.write(f'unit cell volume = {abs(np.linalg.det(lattice)):g}\n\n')
+
+        handle.write('# Ionic positions in lattice coordinates:\n')
+        for species, position in zip(self.species, positions):
+            handle.write(f'ion {species} ' + ''.join(f'{value:20.15f}' for value in position) + ' 1\n')
+
+        handle.write('\n# Forces in Lattice coordinates:\n')
+        for species, force in zip(self.species, forces):
+            handle.write(f'force {species} ' + ''.join(f'{value:20.15f}' for value in force) + ' 1\n')
+
+        handle.write('\n')
+        self.write_energy_components(handle, energy)
+
+        minimizer = 'LatticeMinimize' if self.relax_lattice else 'IonicMinimize'
+        handle.write(f'\n{minimizer}: Iter: {step:3d}  Etot: {energy:.15f}  |grad|_K:  {0.5**step * 1e-2:.3e}  '
+                     f't[s]: {time.time() - start:10.2f}\n')
+        handle.flush()
+
+    @staticmethod
+    def write_energy_components(handle, energy):
+        """Write the energy components, as printed in the stdout and in the `Ecomponents` file."""
+        handle.write('# Energy components:\n')
+        for name, fraction in ENERGY_COMPONENTS.items():
+            handle.write(f'{name:>9} = {energy * fraction:25.16f}\n')
+        handle.write(SEPARATOR + '\n')
+        handle.write(f'{"Etot":>9} = {energy:25.16f}\n\n')
+
+    def write_dumps(self, handle, dirpath):
+        """Write the files of the quantities dumped at the end of the run and their lines in the stdout."""
+        lattice, positions, _, energy = self.get_step(self.number_of_steps - 1)
+        number_of_states = len(self.kpoints[0])
+        writers = {
+            'IonicPositions': ('ionpos', lambda dump: self.write_ionpos(dump, lattice, positions), 'w'),
+            'Lattice': ('lattice', lambda dump: self.write_lattice(dump, lattice), 'w'),
+            'Ecomponents': ('Ecomponents', lambda dump: self.write_energy_components(dump, energy), 'w'),
+            'Kpoints': ('kPts', self.write_kpoints, 'w'),
+            'DOS': ('dos', self.write_dos, 'w'),
+            'BandEigs': ('eigenvals', lambda dump: self.write_array(dump, (number_of_states, self.number_of_bands)),
+                         'wb'),
+            'ElecDensity': ('n', lambda dump: self.write_array(dump, (DENSITY_PER_ATOM * len(self.species),)), 'wb'),
+            'Wfns': ('wfns', lambda dump: self.write_array(
+                dump, (number_of_states, self.number_of_bands, BASIS_PER_ATOM * len(self.species), 2)), 'wb'),
+        }
+
+        for quantity in self.dump_quantities:
+            if quantity not in writers:
+                continue
+
+            variable, writer, mode = writers[quantity]
+            filename = self.get_filename(variable)
+
+            with open(os.path.join(dirpath, filename), mode) as dump:
+                writer(dump)
+
+            handle.write(f"Dumping '{filename}' ... done\n")
+
+    def write_ionpos(self, handle, lattice, positions):
+        """Write the `ionpos` file of the ionic positions, in Cartesian coordinates in bohr."""
+        handle.write('# Ionic positions in cartesian coordinates:\n')
+        for species, position in zip(self.species, positions @ lattice.T):
+            handle.write(f'ion {species} ' + ''.join(f'{value:20.15f}' for value in position) + ' 1\n')
+
+    @staticmethod
+    def write_lattice(handle, lattice):
+        """Write the `lattice` file of the lattice vectors, as the columns of the matrix in bohr."""
+        handle.write('lattice \\\n')
+        handle.write(' \\\n'.join('\t' + ''.join(f'{value:20.15f}' for value in row) for row in lattice))
+        handle.write(' #Note: latt-scale has been absorbed into these lattice vectors.\n')
+
+    def write_kpoints(self, handle):
+        """Write the `kPts` file of the kpoints and their weights."""
+        for index, (kpoint, weight) in enumerate(zip(*self.kpoints)):
+            handle.write(f'{index:5d}  [ ' + ' '.join(f'{value:+.7f}' for value in kpoint) + f' ]  {weight:.9f}\n')
+
+    def write_dos(self, handle):
+        """Write the `dos` file of the total density of states, of random levels smeared by Gaussians, in Hartree."""
+        levels = self.rng.uniform(DOS_ENERGIES[0], DOS_ENERGIES[-1], self.number_of_bands)
+        gaussians = np.exp(-0.5 * ((DOS_ENERGIES[:, np.newaxis] - levels) / DOS_WIDTH)**2)
+        total = 2. * gaussians.sum(axis=1) / (DOS_WIDTH * np.sqrt(2. * np.pi))
+
+        handle.write('"Energy"\t"Total"\n')
+        np.savetxt(handle, np.column_stack([DOS_ENERGIES, total]), fmt='%.6e', delimiter='\t')
+
+    def write_array(self, handle, shape):
+        """Write an array of random doubles of the given shape, as the binary files of jdftx."""
+        self.rng.random(shape).tofile(handle)
+
+    def run(self, handle, dirpath, command_line, duration):
+        """Write the stdout and the dumped files of the run, which lasts about the given duration in seconds."""
+        start = time.time()
+        self.write_header(handle, command_line)
+
+        for step in range(self.number_of_steps):
+            self.write_step(handle, step, start, duration / self.number_of_steps)
+
+        minimizer = 'LatticeMinimize' if self.relax_lattice else 'IonicMinimize'
+        handle.write(f'{minimizer}: Converged (|grad|_K<1.000000e-04).\n\n')
+        self.write_dumps(handle, dirpath)
+
+        elapsed = datetime.timedelta(seconds=time.time() - start)
+        handle.write(f'End date and time: {datetime.datetime.now().ctime()}  (Duration: 0-{elapsed})\n')
+        handle.write('Done!\n')
+
+
+def main(argv=None):
+    """Run the mock jdftx with the command line of jdftx, of which only the input and output files are used."""
+    parser = argparse.ArgumentParser(description='Stand-in for the jdftx executable.')
+    parser.add_argument('-i', '--input', required=True, help='the input file')
+    parser.add_argument('-o', '--output', help='the output file, by default the stdout')
+    arguments, _ = parser.parse_known_args(argv)
+
+    run = MockRun(read_input_commands(arguments.input))
+    duration = float(os.environ.get(ENV_DURATION, DEFAULT_DURATION))
+    command_line = ' '.join(sys.argv[1:] if argv is None else argv)
+    dirpath = os.path.dirname(os.path.abspath(arguments.input))
+
+    if arguments.output is None:
+        run.run(sys.stdout, dirpath, command_line, duration)
+    else:
+        with open(arguments.output, 'w') as handle:
+            run.run(handle, dirpath, command_line, duration)
+
+
+if __name__ == '__main__':
+    main()
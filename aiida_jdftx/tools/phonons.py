@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Finite-displacement force constants implemented with NumPy only."""
+import numpy as np
+
+from .symmetry import get_cartesian_rotations, get_equivalent_atoms, get_symmetry_operations
+
+
+def get_displacements(cell, positions, numbers, displacement, symprec=1e-4):
+    """Return the symmetry-reduced set of atomic displacements of a supercell.
+
+    Only one atom of every set of symmetry-equivalent atoms is displaced, by plus and minus `displacement` along each
+    Cartesian direction.
+
+    :return: a tuple of the displaced atom indices and of the Cartesian displacement vectors, in pairs of plus and minus
+    """
+    _, _, permutations = get_symmetry_operations(cell, positions, numbers, symprec)
+
+    atoms, vectors = [], []
+    for atom in np.unique(get_equivalent_atoms(permutations)):
+        for direction in np.eye(3):
+            for sign in (1, -1):
+                atoms.append(atom)
+                vectors.append(sign * displacement * direction)
+
+    return np.array(atoms), np.array(vectors)
+
+
+def compute_force_constants(cell, positions, numbers, atoms, vectors, forces, symprec=1e-4):
+    """Compute the force constants from the forces of the displaced supercells by central differences.
+
+    The force constants of the atoms that were not displaced are obtained from those of their symmetry-equivalent
+    representative by the symmetry operation that maps one onto the other.
+
+    :param atoms: the index of the displaced atom of every displaced supercell
+    :param vectors: the Cartesian displacement vector of every displaced supercell, in pairs of plus and minus
+    :param forces: the forces (natoms, 3) of every displaced supercell
+    :return: the force constants with shape (natoms, natoms, 3, 3), where `fc[i, j, a, b]` is the second derivative
+        of the energy with respect to the displacement of atom `i` along `a` and atom `j` along `b`
+    """
+    natoms = len(positions)
+    atoms, vectors, forces = np.asarray(atoms), np.asarray(vectors), np.asarray(forces)
+    force_constants = np.zeros((natoms, natoms, 3, 3))
+
+    for plus, minus in zip(range(0, len(atoms), 2), range(1, len(atoms), 2)):
+        step = vectors[plus] - vectors[minus]
+        direction = np.argmax(np.abs(step))
+        force_constants[atoms[plus], :, direction, :] = -(forces[plus] - forces[minus]) / step[direction]
+
+    rotations, _, permutations = get_symmetry_operations(cell, positions, numbers, symprec)
+    cartesian_rotations = get_cartesian_rotations(cell, rotations)
+    equivalent_atoms = get_equivalent_atoms(permutations)
+
+    for atom in range(natoms):
+        representative = equivalent_atoms[atom]
+        if representative == atom:
+            continue
+
+        # the operation maps the displacement of the representative onto that of the atom, and atom j onto perm[j]
+        operation = np.flatnonzero(permutations[:, representative] == atom)[0]
+        rotation = cartesian_rotations[operation]
+        force_constants[atom, permutations[operation]] = np.einsum(
+            'ab,jbc,dc->jad', rotation, force_constants[representative], rotation
+        )
+
+    return force_constants
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Parallel re-parsing of finished `JdftxCalculation` nodes with the current version of the `JdftxParser`.
+
+The calculations are never modified: every re-parse is stored as a new `CalcFunctionNode` with the retrieved folder as
+input and the parsed outputs, which is added to a target group. Its extras record the calculation, the hash of the
+retrieved files and the parser version, such that a calculation is skipped if the same retrieved files of the same
+calculation were already parsed by the same parser version. Another calculation with identical retrieved files, e.g. a
+clone from the cache or a calculation with other settings, is parsed, since its outputs depend on its inputs.
+"""
+import collections
+import time
+
+from aiida import orm
+from aiida.common.log import AIIDA_LOGGER
+
+LOGGER = AIIDA_LOGGER.getChild('jdftx.reparse')
+
+EXTRA_CALCULATION = 'jdftx_reparse_calculation'
+EXTRA_RETRIEVED_HASH = 'jdftx_reparse_retrieved_hash'
+EXTRA_PARSER_VERSION = 'jdftx_reparse_parser_version'
+
+STATUS_PARSED = 'parsed'
+STATUS_SKIPPED = 'skipped'
+STATUS_FAILED = 'failed'
+
+ReparseReport = collections.namedtuple('ReparseReport', ['counts', 'elapsed'])
+
+
+def get_calculation_filters(pks=None, past_days=None, exit_status=None):
+    """Return the QueryBuilder filters on the calculation nodes that select the calculations to re-parse.
+
+    :param pks: optional list of the pks of the calculations
+    :param past_days: optional number of days within which the calculations were created
+    :param exit_status: optional exit status of the calculations
+    """
+    filters = {}
+
+    if pks:
+        filters['id'] = {'in': list(pks)}
+
+    if past_days is not None:
+        import datetime
+        from aiida.common import timezone
+        filters['ctime'] = {'>': timezone.now() - datetime.timedelta(days=past_days)}
+
+    if exit_status is not None:
+        filters['attributes.exit_status'] = exit_status
+
+    return filters
+
+
+def get_calculations(group=None, filters=None, process_type='aiida.calculations:jdftx'):
+    """Return the pks of the finished calculations to re-parse, in increasing order.
+
+    :param group: optional group to which the calculations have to belong
+    :param filters: optional additional QueryBuilder filters on the calculation nodes
+    :param process_type: the process type of the calculations
+    """
+    builder = orm.QueryBuilder()
+    relationship = {}
+
+    if group is not None:
+        builder.append(orm.Group, filters={'id': group.pk}, tag='group')
+        relationship['with_group'] = 'group'
+
+    builder.append(orm.CalcJobNode, tag='calc', project='id', **relationship, filters={
+        **(filters or {}),
+        'process_type': process_type,
+        'attributes.process_state': 'finished',
+    })
+    builder.order_by({'calc': {'id': 'asc'}})
+
+    return builder.all(flat=True)
+
+
+def get_parsed_keys(target_group, parser_version):
+    """Return the keys of the calculations already parsed by this parser version into the target group.
+
+    :return: set of tuples of the uuid of the calculation, the hash of its retrieved folder and the parser version
+    """
+    builder = orm.QueryBuilder()
+    builder.append(orm.Group, filters={'id': target_group.pk}, tag='group')
+    builder.append(orm.CalcFunctionNode, with_group='group',
+        project=[f'extras.{EXTRA_CALCULATION}', f'extras.{EXTRA_RETRIEVED_HASH}', f'extras.{EXTRA_PARSER_VERSION}'],
+        filters={f'extras.{EXTRA_PARSER_VERSION}': parser_version})
+
+    return set(tuple(row) for row in builder.all())
+
+
+def reparse_calculation(node, target_group, parsed_keys, parser_version):
+    """Re-parse a single calculation, unless its retrieved files were already parsed by this parser version.
+
+    :param parsed_keys: the keys of the calculations already parsed, as returned by `get_parsed_keys`
+    :return: the status of the re-parse
+    """
+    from aiida_jdftx.parsers import JdftxParser, get_retrieved_hash
+
+    retrieved_hash = get_retrieved_hash(node.outputs.retrieved)
+
+    if (node.uuid, retrieved_hash, parser_version) in parsed_keys:
+        return STATUS_SKIPPED
+
+    _, calcfunction = JdftxParser.parse_from_node(node, store_provenance=True)
+
+    calcfunction.set_extra_many({
+        EXTRA_CALCULATION: node.uuid,
+        EXTRA_RETRIEVED_HASH: retrieved_hash,
+        EXTRA_PARSER_VERSION: parser_version,
+    })
+    target_group.add_nodes(calcfunction)
+
+    return STATUS_PARSED if calcfunction.is_finished_ok else STATUS_FAILED
+
+
+def initialize_worker(profile_name):
+    """Load the profile in a worker process, which opens its own connection to the database."""
+    from aiida import load_profile
+    load_profile(profile_name)
+
+
+def _reparse_chunk(pks, target_group_pk, parsed_keys, parser_version):
+    """Re-parse a chunk of calculations in a worker process and return the status of each of them."""
+    target_group = orm.load_group(target_group_pk)
+    statuses = []
+
+    for pk in pks:
+        try:
+            statuses.append(reparse_calculation(orm.load_node(pk), target_group, parsed_keys, parser_version))
+        except Exception:  # pylint: disable=broad-except
+            LOGGER.exception('failed to re-parse CalcJobNode<%d>', pk)
+            statuses.append(STATUS_FAILED)
+
+    return statuses
+
+
+def reparse_calculations(pks, target_group, max_workers=None, chunk_size=100, callback=None):
+    """Re-parse the calculations in a pool of worker processes and add the parse processes to the target group.
+
+    The worker processes are started with the `spawn` method and load the current profile themselves, since a
+    database connection cannot be shared with forked processes.
+
+    :param pks: the pks of the calculations
+    :param target_group: the group to which the `CalcFunctionNode` of every re-parse is added
+    :param max_workers: the number of worker processes, by default the number of CPUs
+    :param chunk_size: the number of calculations sent at once to a worker process
+    :param callback: optional function called with the number of processed calculations after every chunk
+    :return: a `ReparseReport` with the number of calculations per status and the elapsed time in seconds
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    from aiida.manage.configuration import get_profile
+    from aiida_jdftx.parsers import get_parser_version
+
+    start = time.perf_counter()
+
+    parser_version = get_parser_version()
+    parsed_keys = get_parsed_keys(target_group, parser_version)
+    chunks = [pks[index:index + chunk_size] for index in range(0, len(pks), chunk_size)]
+    counts = collections.Counter()
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=initialize_worker, initargs=(get_profile().name,)) as executor:
+        futures = [
+            executor.submit(_reparse_chunk, chunk, target_group.pk, parsed_keys, parser_version) for chunk in chunks
+        ]
+
+        for future in as_completed(futures):
+            counts.update(future.result())
+
+            if callback is not None:
+                callback(sum(counts.values()))
+
+    return ReparseReport(dict(counts), time.perf_counter() - start)
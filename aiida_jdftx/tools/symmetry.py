@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""Crystal symmetry analysis implemented with NumPy only.
+
+The cell is given with the lattice vectors as rows and the positions in Cartesian coordinates, both in the same units.
+Symmetry operations are returned in fractional coordinates, acting on fractional positions as column vectors,
+`f' = W f + t`.
+"""
+import itertools
+
+import numpy as np
+
+# all integer matrices with entries -1, 0 or 1, which contain the point operations of any reduced cell
+_CANDIDATE_ROTATIONS = np.array(list(itertools.product((-1, 0, 1), repeat=9))).reshape(-1, 3, 3)
+
+
+def get_fractional_positions(cell, positions):
+    """Return the positions in fractional coordinates, wrapped into the unit cell."""
+    fractional = np.linalg.solve(np.asarray(cell, dtype=float).T, np.asarray(positions, dtype=float).T).T
+    return fractional - np.floor(fractional)
+
+
+def get_lattice_rotations(cell, symprec=1e-4):
+    """Return the rotations, in fractional coordinates, that leave the lattice invariant.
+
+    :param cell: the lattice vectors as rows
+    :param symprec: the tolerance on the lattice vector lengths, in the units of the cell
+    """
+    cell = np.asarray(cell, dtype=float)
+    metric = cell @ cell.T
+
+    # a rotation W maps the lattice onto itself if it preserves the metric, W^T G W = G
+    transformed = np.einsum('nji,jk,nkl->nil', _CANDIDATE_ROTATIONS, metric, _CANDIDATE_ROTATIONS)
+    tolerance = 2 * symprec * np.sqrt(np.max(np.diag(metric)))
+    mask = np.all(np.abs(transformed - metric) < tolerance, axis=(1, 2))
+
+    return _CANDIDATE_ROTATIONS[mask]
+
+
+def get_atom_mapping(cell, fractional, numbers, rotation, translation, symprec=1e-4):
+    """Return the permutation of the atoms induced by a symmetry operation, or None if it is not a symmetry.
+
+    :return: an array `perm` such that the operation maps atom `i` onto atom `perm[i]`
+    """
+    transformed = fractional @ rotation.T + translation
+    difference = transformed[:, np.newaxis, :] - fractional[np.newaxis, :, :]
+    difference -= np.round(difference)
+    distances = np.linalg.norm(difference @ cell, axis=-1)
+    distances[numbers[:, np.newaxis] != numbers[np.newaxis, :]] = np.inf
+
+    permutation = np.argmin(distances, axis=1)
+    if np.any(distances[np.arange(len(numbers)), permutation] > symprec):
+        return None
+    if len(np.unique(permutation)) != len(permutation):
+        return None
+
+    return permutation
+
+
+def get_symmetry_operations(cell, positions, numbers, symprec=1e-4):
+    """Return the space group operations of a crystal.
+
+    :param cell: the lattice vectors as rows
+    :param positions: the Cartesian positions of the atoms
+    :param numbers: an integer per atom identifying its species
+    :param symprec: the tolerance on the atomic positions, in the units of the cell
+    :return: a tuple of the rotations (n, 3, 3), translations (n, 3) and atom permutations (n, natoms)
+    """
+    cell = np.asarray(cell, dtype=float)
+    numbers = np.asarray(numbers)
+    fractional = get_fractional_positions(cell, positions)
+
+    # the operations must map one atom of the least abundant species onto an atom of the same species
+    species, counts = np.unique(numbers, return_counts=True)
+    reference = np.flatnonzero(numbers == species[np.argmin(counts)])
+
+    rotations, translations, permutations = [], [], []
+
+    for rotation in get_lattice_rotations(cell, symprec):
+        rotated = fractional[reference[0]] @ rotation.T
+        for target in reference:
+            translation = fractional[target] - rotated
+            translation -= np.floor(translation)
+            permutation = get_atom_mapping(cell, fractional, numbers, rotation, translation, symprec)
+            if permutation is not None:
+                rotations.append(rotation)
+                translations.append(translation)
+                permutations.append(permutation)
+
+    return np.array(rotations), np.array(translations), np.array(permutations)
+
+
+def get_cartesian_rotations(cell, rotations):
+    """Return the rotations transformed from fractional to Cartesian coordinates, `R = A^T W A^-T`."""
+    cell = np.asarray(cell, dtype=float)
+    return np.einsum('ij,njk,kl->nil', cell.T, rotations, np.linalg.inv(cell.T))
+
+
+def get_equivalent_atoms(permutations):
+    """Return for every atom the index of the representative, i.e. the lowest index, of its orbit."""
+    return np.min(permutations, axis=0)
+
+
+def get_pure_translations(cell, positions, numbers, symprec=1e-4):
+    """Return the translations, in fractional coordinates, that map the crystal onto itself, including zero.
+
+    A cell with more than one pure translation is not primitive, the translations being the lattice vectors of the
+    primitive lattice within the cell.
+    """
+    cell = np.asarray(cell, dtype=float)
+    numbers = np.asarray(numbers)
+    fractional = get_fractional_positions(cell, positions)
+
+    # the translations must map one atom of the least abundant species onto an atom of the same species
+    species, counts = np.unique(numbers, return_counts=True)
+    reference = np.flatnonzero(numbers == species[np.argmin(counts)])
+    identity = np.eye(3, dtype=int)
+
+    translations = []
+
+    for target in reference:
+        translation = fractional[target] - fractional[reference[0]]
+        translation -= np.floor(translation)
+        if get_atom_mapping(cell, fractional, numbers, identity, translation, symprec) is not None:
+            translations.append(translation)
+
+    return np.array(translations)
+
+
+def get_primitive_cell(cell, positions, numbers, symprec=1e-4):
+    """Return the primitive cell of a crystal and the relation of its atoms to those of the original cell.
+
+    The primitive lattice vectors are the shortest vectors of the pure translations that span a cell of the volume of
+    the original cell divided by their number. The original cell and positions are recovered with `expand_primitive_cell`.
+
+    :param cell: the lattice vectors as rows
+    :param positions: the Cartesian positions of the atoms
+    :param numbers: an integer per atom identifying its species
+    :param symprec: the tolerance on the atomic positions, in the units of the cell
+    :return: a tuple of the primitive cell, the Cartesian positions and the numbers of its atoms, the integer
+        transformation `M` such that `cell = M @ primitive_cell`, and for every atom of the original cell the index of
+        its atom in the primitive cell and the integer lattice vector by which it is shifted
+    :raises ValueError: if no primitive cell consistent with the translations is found
+    """
+    cell = np.asarray(cell, dtype=float)
+    positions = np.asarray(positions, dtype=float)
+    numbers = np.asarray(numbers)
+    translations = get_pure_translations(cell, positions, numbers, symprec)
+    size = len(translations)
+
+    if size == 1:
+        return cell, positions, numbers, np.eye(3, dtype=int), np.arange(len(numbers)), np.zeros((len(numbers), 3), int)
+
+    if len(numbers) % size:
+        raise ValueError(f'the {len(numbers)} atoms are not a multiple of the {size} pure translations')
+
+    # the lattice vectors of the primitive lattice in and around the cell, in fractional coordinates, shortest first
+    # and, among those of the same length, those within the cell first
+    images = np.array(list(itertools.product((0, 1, -1), repeat=3)))
+    candidates = (translations[:, np.newaxis, :] + images[np.newaxis, :, :]).reshape(-1, 3)
+    lengths = np.linalg.norm(candidates @ cell, axis=1)
+    order = np.argsort(np.round(lengths / symprec), kind='stable')
+    candidates = candidates[order][lengths[order] > symprec]
+
+    basis = [candidates[0]]
+
+    for candidate in candidates[1:]:
+        first, vector = basis[0] @ cell, candidate @ cell
+        sine = np.linalg.norm(np.cross(first, vector)) / np.linalg.norm(first) / np.linalg.norm(vector)
+        if len(basis) == 1 and sine > 1e-3:
+            basis.append(candidate)
+        elif len(basis) == 2 and abs(abs(np.linalg.det([*basis, candidate])) - 1. / size) < 1e-3 / size:
+            basis.append(candidate)
+            break
+    else:
+        raise ValueError('no basis of the primitive lattice was found among the pure translations')
+
+    basis = np.array(basis)
+    if np.linalg.det(basis) < 0:
+        basis[2] *= -1
+
+    transformation = np.linalg.inv(basis)
+    if np.any(np.abs(transformation - np.round(transformation)) > 1e-3):
+        raise ValueError('the primitive lattice vectors do not generate the lattice of the cell')
+
+    transformation = np.round(transformation).astype(int)
+    primitive_cell = basis @ cell
+
+    # every atom is an atom of the primitive cell shifted by a lattice vector of the primitive cell
+    fractional = np.linalg.solve(primitive_cell.T, positions.T).T
+    primitive_fractional, primitive_numbers = [], []
+    mapping = np.zeros(len(numbers), dtype=int)
+
+    for index, (position, number) in enumerate(zip(fractional, numbers)):
+        for atom, (reference, reference_number) in enumerate(zip(primitive_fractional, primitive_numbers)):
+            difference = position - reference
+            if number == reference_number and np.linalg.norm((difference - np.round(difference)) @ primitive_cell) < symprec:
+                mapping[index] = atom
+                break
+        else:
+            mapping[index] = len(primitive_fractional)
+            primitive_fractional.append(position - np.floor(position))
+            primitive_numbers.append(number)
+
+    if len(primitive_fractional) * size != len(numbers):
+        raise ValueError(f'{len(primitive_fractional)} distinct atoms were found for {size} pure translations')
+
+    primitive_fractional = np.array(primitive_fractional)
+    shifts = np.round(fractional - primitive_fractional[mapping]).astype(int)
+
+    return (primitive_cell, primitive_fractional @ primitive_cell, np.array(primitive_numbers), transformation, mapping,
+            shifts)
+
+
+def expand_primitive_cell(primitive_cell, primitive_positions, transformation, mapping, shifts):
+    """Return the cell and the Cartesian positions of the original cell of a primitive cell from `get_primitive_cell`.
+
+    The primitive cell and positions may differ from those that were returned, e.g. after a relaxation, which is then
+    applied to all the images of every atom.
+    """
+    primitive_cell = np.asarray(primitive_cell, dtype=float)
+    fractional = np.linalg.solve(primitive_cell.T, np.asarray(primitive_positions, dtype=float).T).T
+
+    return np.asarray(transformation) @ primitive_cell, (fractional[mapping] + shifts) @ primitive_cell
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Workchain to compute a band structure with JDFTx, running the k-point path in concurrent chunks."""
+from aiida import orm
+from aiida.common import AttributeDict
+from aiida.engine import ToContext, WorkChain, calcfunction
+from aiida.plugins import WorkflowFactory
+
+JdftxBaseWorkChain = WorkflowFactory('jdftx.base')
+
+
+@calcfunction
+def split_kpoints(kpoints, max_kpoints):
+    """Split an explicit list of kpoints into consecutive chunks of at most `max_kpoints` kpoints.
+
+    :param kpoints: a KpointsData with an explicit list of kpoints, e.g. a path through the Brillouin zone
+    :param max_kpoints: an Int with the maximum number of kpoints per chunk
+    :returns: a dictionary of KpointsData with labels `chunk_0`, `chunk_1`, ... in the order of the input list
+    """
+    kpoints_list = kpoints.get_kpoints()
+    boundaries = range(0, len(kpoints_list), max_kpoints.value)
+
+    chunks = {}
+    for index, start in enumerate(boundaries):
+        chunk = orm.KpointsData()
+        chunk.set_cell(kpoints.cell, kpoints.pbc)
+        chunk.set_kpoints(kpoints_list[start:start + max_kpoints.value])
+        chunks[f'chunk_{index}'] = chunk
+
+    return chunks
+
+
+@calcfunction
+def merge_bands(kpoints, **bands):
+    """Stitch the band eigenvalues computed on consecutive chunks of a kpoint path into a single `BandsData`.
+
+    :param kpoints: the KpointsData of the full path, whose labels are kept in the output
+    :param bands: the BandsData of every chunk, keyed `chunk_0`, `chunk_1`, ...
+    :returns: a BandsData with the eigenvalues along the full path
+    """
+    import numpy as np
+
+    labels = sorted(bands, key=lambda label: int(label.split('_')[-1]))
+    arrays = [bands[label].get_bands() for label in labels]
+
+    merged = orm.BandsData()
+    merged.set_kpointsdata(kpoints)
+    merged.set_bands(np.concatenate(arrays, axis=-2), units=bands[labels[0]].units)
+
+    return merged
+
+
+class JdftxBandsWorkChain(WorkChain):
+    """Workchain to compute a band structure with JDFTx.
+
+    A self-consistent calculation is run first with `JdftxBaseWorkChain`. Its electron density is then kept fixed
+    in non-self-consistent calculations along the kpoint path, which is split in chunks that are all run concurrently.
+    """
+
+    # the commands that would change the structure or the density in a non-self-consistent run
+    _BANDS_EXCLUDED_PARAMETERS = ('lattice-minimize', 'ionic-minimize', 'ionic-dynamics', 'initial-state')
+
+    @classmethod
+    def define(cls, spec):
+        """Define the process specification."""
+        # yapf: disable
+        super().define(spec)
+        spec.expose_inputs(JdftxBaseWorkChain, namespace='scf',
+            namespace_options={'help': 'Inputs for the `JdftxBaseWorkChain` of the self-consistent calculation.'})
+        spec.expose_inputs(JdftxBaseWorkChain, namespace='bands',
+            exclude=('kpoints', 'kpoints_distance', 'kpoints_force_parity', 'jdftx.structure',
+                     'jdftx.parent_folder'),
+            namespace_options={'help': 'Inputs for the `JdftxBaseWorkChain` of the band calculations.'})
+        spec.input('bands_kpoints', valid_type=orm.KpointsData,
+            help='Explicit list of kpoints, e.g. a path through the Brillouin zone, to compute the bands on.')
+        spec.input('max_kpoints_per_job', valid_type=orm.Int, default=lambda: orm.Int(50),
+            help='The maximum number of kpoints in each of the concurrent band calculations.')
+
+        spec.outline(
+            cls.run_scf,
+            cls.inspect_scf,
+            cls.run_bands,
+            cls.inspect_bands,
+            cls.results,
+        )
+
+        spec.output('scf_parameters', valid_type=orm.Dict,
+            help='The output parameters of the self-consistent calculation.')
+        spec.output('band_structure', valid_type=orm.BandsData,
+            help='The band structure along the full `bands_kpoints` path.')
+
+        spec.exit_code(401, 'ERROR_SUB_PROCESS_FAILED_SCF',
+            message='The scf JdftxBaseWorkChain sub process failed.')
+        spec.exit_code(402, 'ERROR_SUB_PROCESS_FAILED_BANDS',
+            message='One of the bands JdftxBaseWorkChain sub processes failed.')
+
+    def run_scf(self):
+        """Run the self-consistent `JdftxBaseWorkChain` that produces the density used for the bands."""
+        inputs = AttributeDict(self.exposed_inputs(JdftxBaseWorkChain, namespace='scf'))
+        inputs.metadata.call_link_label = 'scf'
+
+        running = self.submit(JdftxBaseWorkChain, **inputs)
+        self.report(f'launching JdftxBaseWorkChain<{running.pk}> in scf mode')
+
+        return ToContext(workchain_scf=running)
+
+    def inspect_scf(self):
+        """Verify that the scf `JdftxBaseWorkChain` finished successfully."""
+        workchain = self.ctx.workchain_scf
+
+        if not workchain.is_finished_ok:
+            self.report(f'scf JdftxBaseWorkChain failed with exit status {workchain.exit_status}')
+            return self.exit_codes.ERROR_SUB_PROCESS_FAILED_SCF  # pylint: disable=no-member
+
+        self.ctx.current_folder = workchain.outputs.remote_folder
+
+        if 'output_structure' in workchain.outputs:
+            self.ctx.current_structure = workchain.outputs.output_structure
+        else:
+            self.ctx.current_structure = self.inputs.scf.jdftx.structure
+
+    def run_bands(self):
+        """Run one non-self-consistent `JdftxBaseWorkChain` for every chunk of the kpoint path, all concurrently."""
+        chunks = split_kpoints(self.inputs.bands_kpoints, self.inputs.max_kpoints_per_job)
+
+        parameters = self.inputs.bands.jdftx.parameters.get_dict()
+        for key in self._BANDS_EXCLUDED_PARAMETERS:
+            parameters.pop(key, None)
+
+        # keep the density of the scf calculation fixed, and the kpoints in the order of the path
+        parameters['fix-electron-density'] = 'aiida.$VAR'
+        parameters.setdefault('symmetries', 'none')
+
+        self.ctx.chunk_labels = sorted(chunks, key=lambda label: int(label.split('_')[-1]))
+
+        for label in self.ctx.chunk_labels:
+            inputs = AttributeDict(self.exposed_inputs(JdftxBaseWorkChain, namespace='bands'))
+            inputs.metadata.call_link_label = f'bands_{label}'
+            inputs.kpoints = chunks[label]
+            inputs.jdftx.structure = self.ctx.current_structure
+            inputs.jdftx.parent_folder = self.ctx.current_folder
+            inputs.jdftx.parameters = orm.Dict(dict=parameters)
+
+            running = self.submit(JdftxBaseWorkChain, **inputs)
+            self.report(f'launching JdftxBaseWorkChain<{running.pk}> for the kpoints of {label}')
+            self.to_context(**{f'workchain_bands_{label}': running})
+
+    def inspect_bands(self):
+        """Verify that all the bands `JdftxBaseWorkChain` finished successfully."""
+        for label in self.ctx.chunk_labels:
+            workchain = self.ctx[f'workchain_bands_{label}']
+            if not workchain.is_finished_ok:
+                self.report(f'bands JdftxBaseWorkChain of {label} failed with exit status {workchain.exit_status}')
+                return self.exit_codes.ERROR_SUB_PROCESS_FAILED_BANDS  # pylint: disable=no-member
+
+    def results(self):
+        """Stitch the bands of all chunks together and attach the outputs."""
+        bands = {label: self.ctx[f'workchain_bands_{label}'].outputs.output_band for label in self.ctx.chunk_labels}
+        band_structure = merge_bands(self.inputs.bands_kpoints, **bands)
+
+        self.out('scf_parameters', self.ctx.workchain_scf.outputs.output_parameters)
+        self.out('band_structure', band_structure)
+        self.report('band structure successfully completed')
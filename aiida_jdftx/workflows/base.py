@@ -2,13 +2,27 @@
 """Workchain to run a JDFTx's jdftx calculation with automated error handling and restarts."""
 
 from aiida import orm
-from aiida.engine import BaseRestartWorkChain, while_
+from aiida.engine import BaseRestartWorkChain, ProcessHandlerReport, process_handler, while_
 from aiida.plugins import CalculationFactory
 from aiida.common import AttributeDict
 from aiida.engine import calcfunction
 
+from ..tools.caching import canonicalize_parameters
+from ..tools.symmetry import expand_primitive_cell, get_primitive_cell
+
 JdftxCalculation = CalculationFactory('jdftx')
 
+# the output parameters that are proportional to the size of the cell, in addition to the energies
+EXTENSIVE_PARAMETERS = ('number_of_atoms', 'number_of_electrons', 'number_of_bands', 'volume', 'energies')
+
+# the arrays of the output trajectory with a value for every site, along their second axis
+PER_SITE_ARRAYS = ('forces',)
+
+
+def is_energy(key):
+    """Return True if the output parameter or trajectory array is an energy of the whole cell."""
+    return key.startswith('energy_') and key != 'energy_per_atom' and not key.endswith('_units')
+
 # -*- coding: utf-8 -*-
 """Calculation function to compute a k-point mesh for a structure with a guaranteed minimum k-point distance."""
 
@@ -48,11 +62,118 @@ def create_kpoints_from_distance(structure, distance, force_parity):
     return kpoints
 
 
+@calcfunction
+def get_primitive_structure(structure):
+    """Reduce a structure to its primitive cell.
+
+    :param structure: the StructureData of the original cell
+    :returns: a dictionary with the `primitive_structure` and the `transformation`, an ArrayData with the integer
+        `transformation` matrix of the primitive to the original cell, and for every site of the original cell the
+        index of its site in the primitive cell, `mapping`, and the lattice vector by which it is shifted, `shifts`
+    """
+    kind_names = [kind.name for kind in structure.kinds]
+    numbers = [kind_names.index(site.kind_name) for site in structure.sites]
+    positions = [site.position for site in structure.sites]
+    cell, positions, numbers, matrix, mapping, shifts = get_primitive_cell(structure.cell, positions, numbers)
+
+    primitive_structure = orm.StructureData(cell=cell.tolist(), pbc=structure.pbc)
+    for position, number in zip(positions, numbers):
+        kind = structure.get_kind(kind_names[number])
+        primitive_structure.append_atom(position=position.tolist(), symbols=kind.symbols, weights=kind.weights,
+                                        name=kind.name)
+
+    transformation = orm.ArrayData()
+    transformation.set_array('transformation', matrix)
+    transformation.set_array('mapping', mapping)
+    transformation.set_array('shifts', shifts)
+
+    return {'primitive_structure': primitive_structure, 'transformation': transformation}
+
+
+@calcfunction
+def map_to_original_cell(
+    structure, transformation, output_parameters, output_structure=None, output_trajectory=None, output_dos=None
+):
+    """Map the outputs of a calculation of a primitive cell from `get_primitive_structure` onto the original cell.
+
+    The energies and the other extensive output parameters are multiplied by the number of primitive cells in the
+    original cell, and so are the energies of every step of the output trajectory. The structures of the output
+    structure and of every frame of the output trajectory are expanded with the sites of the original cell in their
+    order, and so are the per-site arrays of the trajectory, such as the forces. The densities of states, which are
+    per cell, are multiplied by the number of primitive cells as well.
+
+    :param structure: the StructureData of the original cell
+    :param transformation: the `transformation` output of `get_primitive_structure`
+    :param output_parameters: the output parameters of the calculation
+    :param output_structure: optional output structure of the calculation
+    :param output_trajectory: optional output TrajectoryData of the calculation
+    :param output_dos: optional output XyData of the density of states of the calculation
+    :returns: a dictionary of the outputs of the original cell, with the link labels of those of the calculation
+    """
+    import numpy as np
+
+    matrix, mapping, shifts = (transformation.get_array(name) for name in ('transformation', 'mapping', 'shifts'))
+    factor = int(round(abs(np.linalg.det(matrix))))
+
+    parameters = output_parameters.get_dict()
+    for key, value in parameters.items():
+        if key in EXTENSIVE_PARAMETERS or is_energy(key):
+            parameters[key] = (np.asarray(value) * factor).tolist()
+    parameters['formula'] = structure.get_formula()
+
+    results = {'output_parameters': orm.Dict(dict=parameters)}
+
+    if output_structure is not None:
+        positions = [site.position for site in output_structure.sites]
+        cell, positions = expand_primitive_cell(output_structure.cell, positions, matrix, mapping, shifts)
+        results['output_structure'] = structure.clone()
+        results['output_structure'].reset_cell(cell.tolist())
+        results['output_structure'].reset_sites_positions(positions.tolist())
+
+    if output_trajectory is not None:
+        frames = [
+            expand_primitive_cell(cell, positions, matrix, mapping, shifts)
+            for cell, positions in zip(output_trajectory.get_cells(), output_trajectory.get_positions())
+        ]
+        trajectory = orm.TrajectoryData()
+        trajectory.set_trajectory(
+            stepids=output_trajectory.get_stepids(),
+            cells=np.array([cell for cell, _ in frames]),
+            positions=np.array([positions for _, positions in frames]),
+            symbols=[site.kind_name for site in structure.sites],
+        )
+
+        for name in output_trajectory.get_arraynames():
+            if name in ('steps', 'cells', 'positions'):
+                continue
+            array = output_trajectory.get_array(name)
+            if name in PER_SITE_ARRAYS:
+                array = array[:, mapping]
+            elif is_energy(name):
+                array = array * factor
+            trajectory.set_array(name, array)
+
+        results['output_trajectory'] = trajectory
+
+    if output_dos is not None:
+        x_name, x_array, x_units = output_dos.get_x()
+        y_names, y_arrays, y_units = zip(*output_dos.get_y())
+        dos = orm.XyData()
+        dos.set_x(x_array, x_name, x_units)
+        dos.set_y([array * factor for array in y_arrays], list(y_names), list(y_units))
+        results['output_dos'] = dos
+
+    return results
+
+
 class JdftxBaseWorkChain(BaseRestartWorkChain):
     """Workchain to run a JDFTx's jdftx calculation with automated error handling and restarts."""
 
     _process_class = JdftxCalculation
 
+    # factor by which the step of the electronic minimizer or the mixing fraction is reduced after a divergence
+    _DIVERGENCE_SCALING = 0.5
+
     @classmethod
     def define(cls, spec):
         """Define the process specification."""
@@ -69,9 +190,14 @@ class JdftxBaseWorkChain(BaseRestartWorkChain):
             help='Optional input when constructing the k-points based on a desired `kpoints_distance`. Setting this to '
                  '`True` will force the k-point mesh to have an even number of points along each lattice vector except '
                  'for any non-periodic directions.')
+        spec.input('reduce_to_primitive', valid_type=orm.Bool, required=False,
+            help='Run the calculations on the primitive cell of the structure, if it is not primitive, and map the '
+                 'outputs back onto the original cell. The k-points from `kpoints_distance` are those of the primitive '
+                 'cell, while explicit `kpoints` are used as they are.')
 
         spec.outline(
             cls.setup,
+            cls.reduce_structure,
             cls.validate_kpoints,
             while_(cls.should_run_process)(
                 cls.run_process,
@@ -95,6 +221,46 @@ class JdftxBaseWorkChain(BaseRestartWorkChain):
         self.ctx.restart_calc = None
         self.ctx.inputs = AttributeDict(self.exposed_inputs(JdftxCalculation, 'jdftx'))
 
+        # equivalent parameters written differently should give the same hash, such that the calculation can be cached
+        parameters = canonicalize_parameters(self.ctx.inputs.parameters.get_dict())
+        if parameters != self.ctx.inputs.parameters.get_dict():
+            self.ctx.inputs.parameters = orm.Dict(dict=parameters)
+
+    def reduce_structure(self):
+        """Replace the structure of the calculations by its primitive cell, if `reduce_to_primitive` is set.
+
+        The reduction is skipped for structures that are not periodic in all directions, or of which the sites are
+        fixed individually by the `fixed_coords` setting.
+        """
+        if not self.inputs.get('reduce_to_primitive', orm.Bool(False)).value:
+            return
+
+        structure = self.ctx.inputs.structure
+        settings = self.ctx.inputs.settings.get_dict() if 'settings' in self.ctx.inputs else {}
+
+        if not all(structure.pbc) or 'fixed_coords' in settings:
+            self.report('not reducing the structure to its primitive cell: it is not periodic or has fixed sites')
+            return
+
+        kind_names = [kind.name for kind in structure.kinds]
+        numbers = [kind_names.index(site.kind_name) for site in structure.sites]
+
+        try:
+            _, positions, *_ = get_primitive_cell(structure.cell, [site.position for site in structure.sites], numbers)
+        except ValueError as exception:
+            self.report(f'not reducing the structure to its primitive cell: {exception}')
+            return
+
+        if len(positions) == len(structure.sites):
+            return
+
+        metadata = {'call_link_label': 'get_primitive_structure'}
+        results = get_primitive_structure(structure, metadata=metadata)  # pylint: disable=unexpected-keyword-arg
+        self.ctx.inputs.structure = results['primitive_structure']
+        self.ctx.transformation = results['transformation']
+
+        self.report(f'reduced the structure of {len(structure.sites)} sites to its primitive cell of {len(positions)}')
+
     def validate_kpoints(self):
         """Validate the inputs related to k-points.
         Either an explicit `KpointsData` with given mesh/path, or a desired k-points distance should be specified. In
@@ -108,7 +274,7 @@ class JdftxBaseWorkChain(BaseRestartWorkChain):
             kpoints = self.inputs.kpoints
         except AttributeError:
             inputs = {
-                'structure': self.inputs.jdftx.structure,
+                'structure': self.ctx.inputs.structure,
                 'distance': self.inputs.kpoints_distance,
                 'force_parity': self.inputs.get('kpoints_force_parity', orm.Bool(False)),
                 'metadata': {
@@ -118,3 +284,79 @@ class JdftxBaseWorkChain(BaseRestartWorkChain):
             kpoints = create_kpoints_from_distance(**inputs)  # pylint: disable=unexpected-keyword-arg
 
         self.ctx.inputs.kpoints = kpoints
+
+    def exposed_outputs(self, node, process_class, namespace=None, agglomerate=True):
+        """Return the exposed outputs of a calculation, mapped onto the original cell if the structure was reduced.
+
+        This is how `results` collects the outputs of the last calculation, that are thus those of the original cell.
+        A compact `JdftxTrajectoryData` trajectory is not mapped and remains that of the primitive cell.
+        """
+        outputs = super().exposed_outputs(node, process_class, namespace, agglomerate)
+
+        if 'transformation' not in self.ctx or 'output_parameters' not in outputs:
+            return outputs
+
+        inputs = {
+            key: outputs[key] for key in ('output_parameters', 'output_structure', 'output_trajectory', 'output_dos')
+            if isinstance(outputs.get(key), (orm.Dict, orm.StructureData, orm.TrajectoryData, orm.XyData))
+        }
+        inputs['metadata'] = {'call_link_label': 'map_to_original_cell'}
+        outputs.update(map_to_original_cell(self.inputs.jdftx.structure, self.ctx.transformation, **inputs))
+
+        return outputs
+
+    @staticmethod
+    def _scale_command_option(parameters, command, option, default, factor):
+        """Scale an option of a jdftx command in place and return its new value.
+
+        The value of the command in the parameters can be either a dict of options or a string of option value pairs,
+        and keeps its type. A command that is not in the parameters is added with the scaled default option.
+        """
+        value = parameters.get(command, '')
+
+        if isinstance(value, dict):
+            value[option] = float(value.get(option, default)) * factor
+            return value[option]
+
+        tokens = str(value).split()
+        options = dict(zip(tokens[::2], tokens[1::2]))
+        options[option] = float(options.get(option, default)) * factor
+        parameters[command] = ' '.join(f'{key} {option_value}' for key, option_value in options.items())
+
+        return options[option]
+
+    @process_handler(priority=410, exit_codes=[JdftxCalculation.exit_codes.ERROR_ELECTRONIC_CONVERGENCE_DIVERGED])
+    def handle_electronic_convergence_diverged(self, calculation):
+        """Handle `ERROR_ELECTRONIC_CONVERGENCE_DIVERGED`: restart with a smaller mixing fraction or minimizer step.
+
+        The self-consistent field iterations get a smaller `mixFraction`, the direct minimization a smaller initial
+        step `alphaTstart`. A relaxation restarts from the structure of its last complete ionic step, if any.
+        """
+        parameters = self.ctx.inputs.parameters.get_dict()
+
+        if 'electronic-scf' in parameters:
+            command, option, default = 'electronic-scf', 'mixFraction', 0.5
+        else:
+            command, option, default = 'electronic-minimize', 'alphaTstart', 1.0
+
+        value = self._scale_command_option(parameters, command, option, default, self._DIVERGENCE_SCALING)
+        self.ctx.inputs.parameters = orm.Dict(dict=canonicalize_parameters(parameters))
+
+        # a relaxation stopped after some complete ionic steps is restarted from the last of them
+        if 'output_structure' in calculation.outputs:
+            self.ctx.inputs.structure = calculation.outputs.output_structure
+
+        self.report(f'{calculation.process_label}<{calculation.pk}> stopped: {calculation.exit_message}')
+        self.report(f'restarting with `{command}` option `{option}` reduced to {value}')
+
+        return ProcessHandlerReport(True)
+
+    @process_handler(priority=420, exit_codes=[JdftxCalculation.exit_codes.ERROR_OUTPUT_STDOUT_PARTIAL])
+    def handle_partial_run(self, calculation):
+        """Handle `ERROR_OUTPUT_STDOUT_PARTIAL`: restart from the structure of the last complete ionic step."""
+        self.ctx.inputs.structure = calculation.outputs.output_structure
+
+        self.report(f'{calculation.process_label}<{calculation.pk}> stopped before the end of the run')
+        self.report('restarting from the structure of its last complete ionic step')
+
+        return ProcessHandlerReport(True)
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""Workchain to compute the force constants with JDFTx by finite displacements in a supercell."""
+from aiida import orm
+from aiida.common import AttributeDict
+from aiida.engine import ToContext, WorkChain, calcfunction, while_
+from aiida.plugins import WorkflowFactory
+
+JdftxBaseWorkChain = WorkflowFactory('jdftx.base')
+
+
+def get_supercell(structure, multiplicity):
+    """Return the supercell of a structure repeated `multiplicity` times along each lattice vector.
+
+    The atoms are ordered by lattice translation first, so the first atoms of the supercell are those of the unit cell.
+
+    :param structure: the StructureData of the unit cell
+    :param multiplicity: a list of three integers
+    :returns: an unstored StructureData of the supercell
+    """
+    import itertools
+    import numpy as np
+    from aiida.orm.nodes.data.structure import Site
+
+    cell = np.array(structure.cell)
+    supercell = orm.StructureData(cell=(cell.T * multiplicity).T.tolist())
+    supercell.set_pbc(structure.pbc)
+
+    for kind in structure.kinds:
+        supercell.append_kind(kind)
+
+    for translation in itertools.product(*[range(repeat) for repeat in multiplicity]):
+        shift = np.array(translation) @ cell
+        for site in structure.sites:
+            supercell.append_site(Site(kind_name=site.kind_name, position=(np.array(site.position) + shift).tolist()))
+
+    return supercell
+
+
+def get_kind_numbers(structure):
+    """Return an integer per site identifying its kind, to compare the sites in the symmetry analysis."""
+    kind_names = [kind.name for kind in structure.kinds]
+    return [kind_names.index(site.kind_name) for site in structure.sites]
+
+
+def get_displaced_structure(structure, atom, vector):
+    """Return a copy of the structure with the given atom displaced by the Cartesian vector."""
+    import numpy as np
+    from aiida.orm.nodes.data.structure import Site
+
+    displaced = orm.StructureData(cell=structure.cell)
+    displaced.set_pbc(structure.pbc)
+
+    for kind in structure.kinds:
+        displaced.append_kind(kind)
+
+    for index, site in enumerate(structure.sites):
+        position = np.array(site.position) + (vector if index == atom else 0.)
+        displaced.append_site(Site(kind_name=site.kind_name, position=position.tolist()))
+
+    return displaced
+
+
+@calcfunction
+def get_displaced_supercells(structure, supercell_matrix, displacement):
+    """Generate the supercell and its symmetry-reduced set of displaced copies.
+
+    :param structure: the StructureData of the unit cell
+    :param supercell_matrix: a List of the three multiplicities of the supercell along the lattice vectors
+    :param displacement: a Float with the displacement in angstrom
+    :returns: the `supercell`, the `displacements` ArrayData with the displaced `atoms` and `vectors`, and the
+        displaced supercells keyed `displaced_0`, `displaced_1`, ...
+    """
+    import numpy as np
+    from aiida_jdftx.tools.phonons import get_displacements
+
+    supercell = get_supercell(structure, supercell_matrix.get_list())
+    positions = np.array([site.position for site in supercell.sites])
+    atoms, vectors = get_displacements(supercell.cell, positions, get_kind_numbers(supercell), displacement.value)
+
+    displacements = orm.ArrayData()
+    displacements.set_array('atoms', atoms)
+    displacements.set_array('vectors', vectors)
+
+    results = {'supercell': supercell, 'displacements': displacements}
+
+    for index, (atom, vector) in enumerate(zip(atoms, vectors)):
+        results[f'displaced_{index}'] = get_displaced_structure(supercell, atom, vector)
+
+    return results
+
+
+@calcfunction
+def get_force_constants(supercell, displacements, **trajectories):
+    """Collect the forces of the displaced supercells into the force constants.
+
+    :param supercell: the StructureData of the pristine supercell
+    :param displacements: the ArrayData of the displacements as returned by `get_displaced_supercells`
+    :param trajectories: the `output_trajectory` of the calculation of every displaced supercell, keyed like the
+        displaced supercells, from which the forces of the last step are taken
+    :returns: an ArrayData with the `force_constants` in eV/angstrom^2
+    """
+    import numpy as np
+    from aiida_jdftx.tools.phonons import compute_force_constants
+
+    labels = sorted(trajectories, key=lambda label: int(label.split('_')[-1]))
+    forces = [trajectories[label].get_array('forces')[-1] for label in labels]
+
+    force_constants = compute_force_constants(
+        supercell.cell,
+        np.array([site.position for site in supercell.sites]),
+        get_kind_numbers(supercell),
+        displacements.get_array('atoms'),
+        displacements.get_array('vectors'),
+        forces,
+    )
+
+    result = orm.ArrayData()
+    result.set_array('force_constants', force_constants)
+
+    return result
+
+
+class JdftxPhononWorkChain(WorkChain):
+    """Workchain to compute the force constants with JDFTx by finite displacements in a supercell.
+
+    The pristine supercell is computed first. The symmetry-reduced displaced supercells are then all started from its
+    electron density and run concurrently, at most `max_concurrent` at a time.
+    """
+
+    @classmethod
+    def define(cls, spec):
+        """Define the process specification."""
+        # yapf: disable
+        super().define(spec)
+        spec.expose_inputs(JdftxBaseWorkChain, namespace='scf', exclude=('jdftx.structure', 'jdftx.parent_folder'),
+            namespace_options={'help': 'Inputs for the `JdftxBaseWorkChain` of the supercell calculations.'})
+        spec.input('structure', valid_type=orm.StructureData,
+            help='The unit cell structure.')
+        spec.input('supercell_matrix', valid_type=orm.List, default=lambda: orm.List(list=[2, 2, 2]),
+            help='The multiplicities of the supercell along the three lattice vectors.')
+        spec.input('displacement', valid_type=orm.Float, default=lambda: orm.Float(0.01),
+            help='The displacement of the atoms in angstrom.')
+        spec.input('max_concurrent', valid_type=orm.Int, default=lambda: orm.Int(10),
+            help='The maximum number of displaced supercell calculations running at the same time.')
+
+        spec.outline(
+            cls.setup,
+            cls.run_pristine,
+            cls.inspect_pristine,
+            while_(cls.should_run_displaced)(
+                cls.run_displaced,
+                cls.inspect_displaced,
+            ),
+            cls.results,
+        )
+
+        spec.output('supercell', valid_type=orm.StructureData,
+            help='The pristine supercell.')
+        spec.output('force_constants', valid_type=orm.ArrayData,
+            help='The force constants of the supercell in eV/angstrom^2, with shape (natoms, natoms, 3, 3).')
+
+        spec.exit_code(401, 'ERROR_SUB_PROCESS_FAILED_PRISTINE',
+            message='The JdftxBaseWorkChain of the pristine supercell failed.')
+        spec.exit_code(402, 'ERROR_SUB_PROCESS_FAILED_DISPLACED',
+            message='One of the JdftxBaseWorkChain of the displaced supercells failed.')
+
+    def setup(self):
+        """Generate the pristine and the symmetry-reduced displaced supercells."""
+        results = get_displaced_supercells(self.inputs.structure, self.inputs.supercell_matrix, self.inputs.displacement)
+
+        self.ctx.supercell = results['supercell']
+        self.ctx.displacements = results['displacements']
+        self.ctx.displaced = {label: node for label, node in results.items() if label.startswith('displaced_')}
+        self.ctx.labels = sorted(self.ctx.displaced, key=lambda label: int(label.split('_')[-1]))
+        self.ctx.iteration = 0
+
+    def run_pristine(self):
+        """Run the `JdftxBaseWorkChain` of the pristine supercell."""
+        inputs = AttributeDict(self.exposed_inputs(JdftxBaseWorkChain, namespace='scf'))
+        inputs.metadata.call_link_label = 'pristine'
+        inputs.jdftx.structure = self.ctx.supercell
+
+        running = self.submit(JdftxBaseWorkChain, **inputs)
+        self.report(f'launching JdftxBaseWorkChain<{running.pk}> for the pristine supercell')
+
+        return ToContext(workchain_pristine=running)
+
+    def inspect_pristine(self):
+        """Verify that the `JdftxBaseWorkChain` of the pristine supercell finished successfully."""
+        workchain = self.ctx.workchain_pristine
+
+        if not workchain.is_finished_ok:
+            self.report(f'pristine JdftxBaseWorkChain failed with exit status {workchain.exit_status}')
+            return self.exit_codes.ERROR_SUB_PROCESS_FAILED_PRISTINE  # pylint: disable=no-member
+
+    def should_run_displaced(self):
+        """Return whether there are displaced supercells left to run."""
+        return self.ctx.iteration * self.inputs.max_concurrent.value < len(self.ctx.labels)
+
+    def run_displaced(self):
+        """Run the next batch of at most `max_concurrent` displaced supercells, seeded with the pristine density."""
+        parameters = self.inputs.scf.jdftx.parameters.get_dict()
+        parameters['initial-state'] = 'aiida.$VAR'
+        parameters['forces-output-coords'] = 'Cartesian'
+        parameters = orm.Dict(dict=parameters)
+
+        size = self.inputs.max_concurrent.value
+        batch = self.ctx.labels[self.ctx.iteration * size:(self.ctx.iteration + 1) * size]
+        self.ctx.iteration += 1
+
+        for label in batch:
+            inputs = AttributeDict(self.exposed_inputs(JdftxBaseWorkChain, namespace='scf'))
+            inputs.metadata.call_link_label = label
+            inputs.jdftx.structure = self.ctx.displaced[label]
+            inputs.jdftx.parameters = parameters
+            inputs.jdftx.parent_folder = self.ctx.workchain_pristine.outputs.remote_folder
+
+            running = self.submit(JdftxBaseWorkChain, **inputs)
+            self.report(f'launching JdftxBaseWorkChain<{running.pk}> for {label}')
+            self.to_context(**{f'workchain_{label}': running})
+
+        self.ctx.batch = batch
+
+    def inspect_displaced(self):
+        """Verify that the `JdftxBaseWorkChain` of the last batch of displaced supercells finished successfully."""
+        for label in self.ctx.batch:
+            workchain = self.ctx[f'workchain_{label}']
+            if not workchain.is_finished_ok:
+                self.report(f'JdftxBaseWorkChain of {label} failed with exit status {workchain.exit_status}')
+                return self.exit_codes.ERROR_SUB_PROCESS_FAILED_DISPLACED  # pylint: disable=no-member
+
+    def results(self):
+        """Collect the forces of all displaced supercells into the force constants."""
+        trajectories = {label: self.ctx[f'workchain_{label}'].outputs.output_trajectory for label in self.ctx.labels}
+        force_constants = get_force_constants(self.ctx.supercell, self.ctx.displacements, **trajectories)
+
+        self.out('supercell', self.ctx.supercell)
+        self.out('force_constants', force_constants)
+        self.report('force constants successfully computed')
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""Workchain to compute the solvation free energy with JDFTx, starting the solvated run from the vacuum state."""
+from aiida import orm
+from aiida.common import AttributeDict
+from aiida.engine import ToContext, WorkChain, calcfunction
+from aiida.plugins import WorkflowFactory
+
+JdftxBaseWorkChain = WorkflowFactory('jdftx.base')
+
+
+def get_final_energy_key(parameters):
+    """Return the key of the final energy in the output parameters of a calculation.
+
+    The free energy `energy_free` is printed by jdftx for calculations with smearing, and the total energy
+    `energy_total` otherwise.
+
+    :param parameters: the dictionary of the `output_parameters`
+    """
+    return 'energy_free' if 'energy_free' in parameters else 'energy_total'
+
+
+@calcfunction
+def get_solvation_energy(vacuum_parameters, solvated_parameters):
+    """Compute the solvation free energy as the difference of the solvated and the vacuum final energies.
+
+    The final energy of both calculations must be the same quantity, the free energy `energy_free` of calculations with
+    smearing or the total energy `energy_total` otherwise.
+
+    :param vacuum_parameters: the `output_parameters` of the vacuum calculation
+    :param solvated_parameters: the `output_parameters` of the solvated calculation
+    :returns: a Float with the solvation free energy in eV
+    :raises ValueError: if the final energies of the calculations are different quantities
+    """
+    vacuum_parameters = vacuum_parameters.get_dict()
+    solvated_parameters = solvated_parameters.get_dict()
+    key = get_final_energy_key(vacuum_parameters)
+
+    if get_final_energy_key(solvated_parameters) != key:
+        raise ValueError(
+            f'the final energy of the vacuum calculation is `{key}` but that of the solvated calculation is '
+            f'`{get_final_energy_key(solvated_parameters)}`'
+        )
+
+    return orm.Float(solvated_parameters[key] - vacuum_parameters[key])
+
+
+class JdftxSolvationWorkChain(WorkChain):
+    """Workchain to compute the solvation free energy with JDFTx.
+
+    A vacuum calculation is run first with the `base` inputs. The solvated calculation then adds the
+    `solvation_parameters` and starts from the wavefunctions and the final structure of the vacuum calculation.
+    """
+
+    _VACUUM_DUMP_FREQUENCY = 'End'
+    _VACUUM_DUMP_QUANTITY = 'State'
+    _STATE_FILES = ['aiida.wfns']
+
+    @classmethod
+    def define(cls, spec):
+        """Define the process specification."""
+        # yapf: disable
+        super().define(spec)
+        spec.expose_inputs(JdftxBaseWorkChain, namespace='base',
+            namespace_options={'help': 'Inputs for the `JdftxBaseWorkChain` shared by the vacuum and solvated runs.'})
+        spec.input('solvation_parameters', valid_type=orm.Dict,
+            default=lambda: orm.Dict(dict={
+                'fluid': 'LinearPCM',
+                'pcm-variant': 'CANDLE',
+                'fluid-solvent': 'H2O',
+            }),
+            help='The fluid commands that are added to the parameters of the solvated calculation.')
+
+        spec.outline(
+            cls.run_vacuum,
+            cls.inspect_vacuum,
+            cls.run_solvated,
+            cls.inspect_solvated,
+            cls.results,
+        )
+
+        spec.output('vacuum_parameters', valid_type=orm.Dict,
+            help='The output parameters of the vacuum calculation.')
+        spec.output('solvated_parameters', valid_type=orm.Dict,
+            help='The output parameters of the solvated calculation.')
+        spec.output('solvation_energy', valid_type=orm.Float,
+            help='The solvation free energy in eV.')
+
+        spec.exit_code(401, 'ERROR_SUB_PROCESS_FAILED_VACUUM',
+            message='The vacuum JdftxBaseWorkChain sub process failed.')
+        spec.exit_code(402, 'ERROR_SUB_PROCESS_FAILED_SOLVATED',
+            message='The solvated JdftxBaseWorkChain sub process failed.')
+        spec.exit_code(403, 'ERROR_INCONSISTENT_FINAL_ENERGIES',
+            message='The final energies of the vacuum and solvated calculations are different quantities.')
+
+    @staticmethod
+    def _is_fluid_command(key):
+        """Return True if the jdftx command configures the implicit solvation model."""
+        return key.startswith('fluid') or key.startswith('pcm-')
+
+    @classmethod
+    def _get_vacuum_dump(cls, dump):
+        """Return the `dump` command of the vacuum run, which dumps the state on top of the quantities of the user.
+
+        :param dump: the `dump` command of the parameters, e.g. `End BandEigs`, or None
+        """
+        if dump is None:
+            return f'{cls._VACUUM_DUMP_FREQUENCY} {cls._VACUUM_DUMP_QUANTITY}'
+
+        words = str(dump).split()
+
+        if cls._VACUUM_DUMP_QUANTITY not in words[1:]:
+            words.append(cls._VACUUM_DUMP_QUANTITY)
+
+        return ' '.join(words)
+
+    def run_vacuum(self):
+        """Run the vacuum `JdftxBaseWorkChain`, dumping its final state for the solvated run."""
+        inputs = AttributeDict(self.exposed_inputs(JdftxBaseWorkChain, namespace='base'))
+        inputs.metadata.call_link_label = 'vacuum'
+
+        parameters = {
+            key: value for key, value in inputs.jdftx.parameters.get_dict().items() if not self._is_fluid_command(key)
+        }
+        parameters['dump'] = self._get_vacuum_dump(parameters.get('dump'))
+        inputs.jdftx.parameters = orm.Dict(dict=parameters)
+
+        running = self.submit(JdftxBaseWorkChain, **inputs)
+        self.report(f'launching JdftxBaseWorkChain<{running.pk}> in vacuum')
+
+        return ToContext(workchain_vacuum=running)
+
+    def inspect_vacuum(self):
+        """Verify that the vacuum `JdftxBaseWorkChain` finished successfully."""
+        workchain = self.ctx.workchain_vacuum
+
+        if not workchain.is_finished_ok:
+            self.report(f'vacuum JdftxBaseWorkChain failed with exit status {workchain.exit_status}')
+            return self.exit_codes.ERROR_SUB_PROCESS_FAILED_VACUUM  # pylint: disable=no-member
+
+    def run_solvated(self):
+        """Run the solvated `JdftxBaseWorkChain` from the wavefunctions and ionic state of the vacuum run."""
+        workchain = self.ctx.workchain_vacuum
+
+        inputs = AttributeDict(self.exposed_inputs(JdftxBaseWorkChain, namespace='base'))
+        inputs.metadata.call_link_label = 'solvated'
+
+        parameters = inputs.jdftx.parameters.get_dict()
+        parameters.update(self.inputs.solvation_parameters.get_dict())
+        parameters['initial-state'] = 'aiida.$VAR'
+        inputs.jdftx.parameters = orm.Dict(dict=parameters)
+
+        settings = inputs.jdftx.settings.get_dict() if 'settings' in inputs.jdftx else {}
+        settings['parent_folder_files'] = self._STATE_FILES
+        inputs.jdftx.settings = orm.Dict(dict=settings)
+        inputs.jdftx.parent_folder = workchain.outputs.remote_folder
+
+        if 'output_structure' in workchain.outputs:
+            inputs.jdftx.structure = workchain.outputs.output_structure
+
+        running = self.submit(JdftxBaseWorkChain, **inputs)
+        self.report(f'launching JdftxBaseWorkChain<{running.pk}> in solvent')
+
+        return ToContext(workchain_solvated=running)
+
+    def inspect_solvated(self):
+        """Verify that the solvated `JdftxBaseWorkChain` finished successfully."""
+        workchain = self.ctx.workchain_solvated
+
+        if not workchain.is_finished_ok:
+            self.report(f'solvated JdftxBaseWorkChain failed with exit status {workchain.exit_status}')
+            return self.exit_codes.ERROR_SUB_PROCESS_FAILED_SOLVATED  # pylint: disable=no-member
+
+    def results(self):
+        """Attach the output parameters of both runs and the solvation free energy."""
+        vacuum_parameters = self.ctx.workchain_vacuum.outputs.output_parameters
+        solvated_parameters = self.ctx.workchain_solvated.outputs.output_parameters
+
+        self.out('vacuum_parameters', vacuum_parameters)
+        self.out('solvated_parameters', solvated_parameters)
+
+        keys = [get_final_energy_key(parameters.get_dict()) for parameters in (vacuum_parameters, solvated_parameters)]
+
+        if keys[0] != keys[1]:
+            self.report(f'the final energies of the vacuum and solvated calculations are `{keys[0]}` and `{keys[1]}`')
+            return self.exit_codes.ERROR_INCONSISTENT_FINAL_ENERGIES  # pylint: disable=no-member
+
+        self.out('solvation_energy', get_solvation_energy(vacuum_parameters, solvated_parameters))
+        self.report('solvation free energy successfully computed')
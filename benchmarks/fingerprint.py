@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the lookup of a fingerprint in a `FingerprintIndex` of many structures of the same composition.
+
+The index is filled with synthetic fingerprints: that of a silicon structure scaled by a random factor, as for structures
+of different densities, with noise. The lookups alternate with additions as in `submit_unique`, and are compared with
+selecting and decoding all the fingerprints of the composition on every lookup, as the index did before.
+
+Run with `python benchmarks/fingerprint.py [number_of_entries]`: the database is a temporary file.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from aiida_jdftx.tools.fingerprint import FingerprintIndex, get_distances, get_fingerprint
+
+LOOKUPS = 100
+
+PARAM = 5.43
+CELL = np.array([[PARAM / 2., PARAM / 2., 0], [PARAM / 2., 0, PARAM / 2.], [0, PARAM / 2., PARAM / 2.]])
+POSITIONS = np.array([[0., 0., 0.], [PARAM / 4., PARAM / 4., PARAM / 4.]])
+
+
+def generate_fingerprints(number, seed=0):
+    """Return the synthetic fingerprints of structures of the same composition."""
+    rng = np.random.default_rng(seed)
+    reference = get_fingerprint(CELL, POSITIONS, ['Si', 'Si'])
+    scales = rng.uniform(0.5, 1.5, (number, 1))
+    noise = rng.normal(0., 0.01, (number, len(reference)))
+
+    return (reference * scales + noise).astype(np.float32)
+
+
+def find_decoding(index, composition, fingerprint):
+    """Return the uuid of the closest fingerprint, selecting and decoding all the fingerprints of the composition."""
+    rows = index.connection.execute(
+        'SELECT uuid, fingerprint FROM fingerprints WHERE composition = ?', (composition,)
+    ).fetchall()
+    fingerprints = np.frombuffer(b''.join(blob for _, blob in rows), dtype=np.float32).reshape(len(rows), -1)
+    distances = get_distances(fingerprint, fingerprints)
+    closest = int(np.argmin(distances))
+
+    return rows[closest][0] if distances[closest] <= index.tolerance else None
+
+
+def main(number):
+    """Fill an index with the fingerprints and report the timings of the lookups."""
+    fingerprints = generate_fingerprints(number + LOOKUPS)
+
+    with tempfile.TemporaryDirectory() as dirpath:
+        index = FingerprintIndex(os.path.join(dirpath, 'fingerprints.sqlite'))
+        index.connection.executemany(
+            'INSERT INTO fingerprints (composition, uuid, fingerprint) VALUES (?, ?, ?)',
+            (('Si', f'uuid{entry}', fingerprint.tobytes()) for entry, fingerprint in enumerate(fingerprints[:number])),
+        )
+        index.connection.commit()
+        print(f'{len(index)} fingerprints of {fingerprints.shape[1]} values')
+
+        start = time.perf_counter()
+        index.find('Si', fingerprints[0])
+        print(f'first lookup, loading the composition: {time.perf_counter() - start:8.4f} s')
+
+        for label, function in (('decoding', find_decoding), ('index', FingerprintIndex.find)):
+            timings = []
+            for entry in range(number, number + LOOKUPS):
+                start = time.perf_counter()
+                function(index, 'Si', fingerprints[entry])
+                timings.append(time.perf_counter() - start)
+                index.add('Si', fingerprints[entry], f'uuid{entry}')
+
+            print(f'{label:<10} lookup median {np.median(timings) * 1e3:8.3f} ms, max {max(timings) * 1e3:8.3f} ms')
+
+        index.close()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
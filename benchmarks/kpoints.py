@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the parsing and storage of the compact `output_kpoints` against the explicit list of kpoints.
+
+The `aiida.kPts` file of a dense mesh reduced by time reversal symmetry is parsed either line by line into an explicit
+`KpointsData`, as the parser did before, or with a single `np.loadtxt` into a `JdftxKpointsData` of the indices of the
+kpoints in the mesh. The storage is the size of the files of the arrays of the nodes in the repository.
+
+Run with `verdi run benchmarks/kpoints.py [mesh_size]`: the nodes are not stored.
+"""
+import sys
+import time
+
+import numpy as np
+
+REPEATS = 5
+
+
+def generate_kpts(size):
+    """Return the content of the `kPts` file of the irreducible kpoints of a mesh under time reversal symmetry."""
+    mesh = np.array([size] * 3)
+    grid = np.stack(np.meshgrid(*[np.arange(size)] * 3, indexing='ij'), axis=-1).reshape(-1, 3)
+
+    # every point is equivalent to its opposite, which is the point of the flattened mesh with the index `partners`
+    partners = np.ravel_multi_index(tuple((-grid % mesh).T), mesh)
+    irreducible = np.arange(len(grid)) <= partners
+    weights = np.where(partners == np.arange(len(grid)), 1., 2.)[irreducible] * 2. / len(grid)
+
+    kpoints = grid[irreducible] / mesh
+    kpoints -= np.ceil(kpoints - 0.5)
+
+    return ''.join(
+        f'{index:5d}  [ {kpoint[0]:+.7f} {kpoint[1]:+.7f} {kpoint[2]:+.7f} ]  {weight:.9f}\n'
+        for index, (kpoint, weight) in enumerate(zip(kpoints, weights))
+    )
+
+
+def parse_explicit(content):
+    """Return an explicit `KpointsData` of the kpoints, parsed line by line."""
+    from aiida import orm
+
+    kpoints_list = []
+    kpoints_weights = []
+    for line in content.strip().split('\n'):
+        kpoints_list.append([float(i) for i in line.split('[')[1].split(']')[0].split()])
+        kpoints_weights.append(float(line.split('[')[1].split(']')[1]))
+
+    kpoints = orm.KpointsData()
+    kpoints.set_kpoints(kpoints_list, weights=kpoints_weights, cartesian=False)
+
+    return kpoints
+
+
+def parse_compact(content, size):
+    """Return the `JdftxKpointsData` of the kpoints, read with a single `np.loadtxt`."""
+    from aiida_jdftx.data.kpoints import JdftxKpointsData
+    from aiida_jdftx.parsers import read_kpoints
+
+    kpoints, weights = read_kpoints(content)
+
+    return JdftxKpointsData.from_explicit_kpoints(kpoints, weights, [size] * 3, [0., 0., 0.])
+
+
+def get_repository_size(node):
+    """Return the total size in bytes of the files of a node in the repository."""
+    return sum(len(node.get_object_content(name, mode='rb')) for name in node.list_object_names())
+
+
+def main(size):
+    """Parse the kpoints of the mesh with both representations and report the timings and the storage."""
+    content = generate_kpts(size)
+    print(f'mesh {size}x{size}x{size}: {len(content.splitlines())} irreducible kpoints, {len(content)} bytes of kPts')
+
+    for label, function in (('explicit', parse_explicit), ('compact', lambda content: parse_compact(content, size))):
+        timings = []
+        for _ in range(REPEATS):
+            start = time.perf_counter()
+            node = function(content)
+            timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        node.get_kpoints(also_weights=True)
+        first = time.perf_counter() - start
+
+        start = time.perf_counter()
+        node.get_kpoints(also_weights=True)
+        second = time.perf_counter() - start
+
+        print(f'{label:<10} parse {min(timings):8.4f} s  storage {get_repository_size(node):>10d} bytes  '
+              f'get_kpoints {first:8.4f} s, then {second:8.4f} s')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 48)
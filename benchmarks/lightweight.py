@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the nodes and the storage of the outputs of the parser with and without the `lightweight` setting.
+
+The retrieved files of the parser test fixtures are parsed twice, with the default outputs and with the `lightweight`
+setting, and the outputs are stored. The created nodes are found with the `QueryBuilder` as the outputs of the
+calculation function of the parsing, and their storage is the size of their attributes in JSON and of their files in
+the repository. The retrieved files, which are the same for both, are not counted.
+
+Run with `verdi run benchmarks/lightweight.py [fixture ...]` on a disposable profile with a `localhost` computer: the
+nodes are added to a group that is emptied and deleted at the end.
+"""
+import json
+import os
+import sys
+
+GROUP_LABEL = 'aiida-jdftx-benchmark-lightweight'
+COMPUTER = 'localhost'
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'tests', 'parsers', 'fixtures')
+FIXTURES = ('default', 'relax', 'dos')
+
+MODES = (('default', {}), ('lightweight', {'lightweight': True}))
+
+
+def get_calculation(name, settings):
+    """Return a stored `CalcJobNode` of a silicon calculation with the retrieved files of a fixture."""
+    from aiida import orm
+    from aiida.common import LinkType
+
+    param = 5.43
+    structure = orm.StructureData(cell=[[param / 2., param / 2., 0], [param / 2., 0, param / 2.],
+                                        [0, param / 2., param / 2.]])
+    structure.append_atom(position=(0., 0., 0.), symbols='Si', name='Si')
+    structure.append_atom(position=(param / 4., param / 4., param / 4.), symbols='Si', name='Si')
+
+    kpoints = orm.KpointsData()
+    kpoints.set_cell_from_structure(structure)
+    kpoints.set_kpoints_mesh_from_density(0.15)
+
+    inputs = {
+        'structure': structure,
+        'kpoints': kpoints,
+        'parameters': orm.Dict(dict={}),
+        'settings': orm.Dict(dict=settings),
+    }
+
+    node = orm.CalcJobNode(computer=orm.Computer.objects.get(label=COMPUTER), process_type='aiida.calculations:jdftx')
+    node.set_option('resources', {'num_machines': 1, 'num_mpiprocs_per_machine': 1})
+    node.set_attribute('input_filename', 'aiida.in')
+    node.set_attribute('output_filename', 'aiida.out')
+
+    for link_label, input_node in inputs.items():
+        node.add_incoming(input_node.store(), link_type=LinkType.INPUT_CALC, link_label=link_label)
+
+    node.store()
+
+    retrieved = orm.FolderData()
+    retrieved.put_object_from_tree(os.path.join(FIXTURES_DIRECTORY, name))
+    retrieved.add_incoming(node, link_type=LinkType.CREATE, link_label='retrieved')
+    retrieved.store()
+
+    return node
+
+
+def get_outputs_storage(calcfunction):
+    """Return the number of the outputs of a calculation function and the bytes of their attributes and files."""
+    from aiida import orm
+
+    builder = orm.QueryBuilder()
+    builder.append(orm.CalcFunctionNode, filters={'id': calcfunction.pk}, tag='calcfunction')
+    builder.append(orm.Data, with_incoming='calcfunction', project=['*', 'attributes'])
+
+    attributes_bytes = 0
+    repository_bytes = 0
+
+    for node, attributes in builder.iterall():
+        attributes_bytes += len(json.dumps(attributes))
+        repository_bytes += sum(len(node.get_object_content(name, mode='rb')) for name in node.list_object_names())
+
+    return builder.count(), attributes_bytes, repository_bytes
+
+
+def main(fixtures):
+    """Parse the fixtures with and without the `lightweight` setting and report the nodes and storage of the outputs."""
+    from aiida import orm
+    from aiida.plugins import ParserFactory
+
+    parser = ParserFactory('jdftx')
+    group, _ = orm.Group.objects.get_or_create(GROUP_LABEL)
+
+    print(f'{"fixture":<10} {"mode":<12} {"nodes":>6} {"attributes":>12} {"repository":>12}')
+
+    try:
+        for name in fixtures:
+            for mode, settings in MODES:
+                node = get_calculation(name, settings)
+                _, calcfunction = parser.parse_from_node(node, store_provenance=True)
+                group.add_nodes([node, calcfunction] + list(calcfunction.get_outgoing().all_nodes()))
+
+                if not calcfunction.is_finished_ok:
+                    print(f'{name:<10} {mode:<12} failed: {calcfunction.exit_message}')
+                    continue
+
+                count, attributes_bytes, repository_bytes = get_outputs_storage(calcfunction)
+                print(f'{name:<10} {mode:<12} {count:>6d} {attributes_bytes:>12d} {repository_bytes:>12d}')
+    finally:
+        from aiida.tools import delete_group_nodes
+        delete_group_nodes([group.pk], dry_run=False)
+        orm.Group.objects.delete(group.pk)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:] or FIXTURES)
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the query of relaxations on the summary values of `output_parameters` against loading trajectories.
+
+Run with `verdi run benchmarks/summary_query.py [number_of_runs]` on a disposable profile: it stores the synthetic
+nodes of `number_of_runs` relaxations in a group that is emptied and deleted at the end.
+"""
+import sys
+import time
+
+import numpy as np
+
+GROUP_LABEL = 'aiida-jdftx-benchmark-summary-query'
+
+# find all relaxations with a final energy per atom below this value in eV and more ionic steps than this number
+ENERGY_PER_ATOM = -107.2
+IONIC_STEPS = 50
+
+
+def generate_runs(group, number_of_runs, number_of_atoms=8, seed=0):
+    """Store the `output_parameters` and `output_trajectory` of synthetic relaxations and add them to the group."""
+    from aiida import orm
+
+    rng = np.random.default_rng(seed)
+    symbols = ['Si'] * number_of_atoms
+
+    for _ in range(number_of_runs):
+        steps = int(rng.integers(1, 100))
+        energies = -107.25 * number_of_atoms + rng.normal(0., 0.5, steps)
+
+        trajectory = orm.TrajectoryData()
+        trajectory.set_trajectory(
+            stepids=np.arange(steps),
+            cells=np.tile(np.eye(3) * 5.43, (steps, 1, 1)),
+            positions=rng.random((steps, number_of_atoms, 3)) * 5.43,
+            symbols=symbols,
+        )
+        trajectory.set_array('energy_total', energies)
+        trajectory.set_array('forces', rng.normal(0., 0.01, (steps, number_of_atoms, 3)))
+
+        parameters = orm.Dict(dict={
+            'energy_total': energies[-1],
+            'energy_per_atom': energies[-1] / number_of_atoms,
+            'number_of_atoms': number_of_atoms,
+            'number_of_ionic_steps': steps,
+            'max_force': float(np.linalg.norm(trajectory.get_array('forces')[-1], axis=1).max()),
+            'converged': True,
+        })
+
+        group.add_nodes([trajectory.store(), parameters.store()])
+
+
+def query_summary(group):
+    """Return the pks of the `output_parameters` matching the filters, evaluated in the database."""
+    from aiida import orm
+
+    builder = orm.QueryBuilder()
+    builder.append(orm.Group, filters={'label': group.label}, tag='group')
+    builder.append(orm.Dict, with_group='group', project='id', filters={
+        'attributes.energy_per_atom': {'<': ENERGY_PER_ATOM},
+        'attributes.number_of_ionic_steps': {'>': IONIC_STEPS},
+    })
+
+    return builder.all(flat=True)
+
+
+def query_trajectories(group):
+    """Return the pks of the `output_trajectory` matching the filters, loading every trajectory from the repository."""
+    from aiida import orm
+
+    builder = orm.QueryBuilder()
+    builder.append(orm.Group, filters={'label': group.label}, tag='group')
+    builder.append(orm.TrajectoryData, with_group='group')
+
+    pks = []
+    for trajectory, in builder.iterall():
+        energies = trajectory.get_array('energy_total')
+        if energies[-1] / len(trajectory.symbols) < ENERGY_PER_ATOM and len(energies) > IONIC_STEPS:
+            pks.append(trajectory.pk)
+
+    return pks
+
+
+def main(number_of_runs):
+    """Generate the synthetic runs, time both queries and clean up."""
+    from aiida import orm
+
+    group, _ = orm.Group.objects.get_or_create(GROUP_LABEL)
+
+    try:
+        start = time.perf_counter()
+        generate_runs(group, number_of_runs)
+        print(f'generated {number_of_runs} runs in {time.perf_counter() - start:.2f} s')
+
+        for function in (query_summary, query_trajectories):
+            start = time.perf_counter()
+            matches = function(group)
+            print(f'{function.__name__:<20} {len(matches):>8d} matches in {time.perf_counter() - start:8.3f} s')
+    finally:
+        from aiida.tools import delete_group_nodes
+        delete_group_nodes([group.pk], dry_run=False)
+        orm.Group.objects.delete(group.pk)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
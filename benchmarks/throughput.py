@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the end-to-end throughput of `JdftxBaseWorkChain`s run with the mock jdftx executable.
+
+Every work chain goes through the submission, upload, run, retrieval and parsing of its calculation on a local computer,
+the run being done by `aiida-jdftx-mock`, such that the measured throughput is that of the plugin and of AiiDA only.
+
+Run with `verdi run benchmarks/throughput.py [number_of_workchains] [computer]` on a disposable profile with the
+daemon running, e.g. `verdi daemon start 4`. The computer, `localhost` by default, must use the `local`
+transport. The script reports the jobs per minute, the CPU time of the daemon workers per job and the percentiles of
+the parse latency, the time from the creation of the retrieved folder to the last output of the parser. The nodes are
+deleted at the end.
+"""
+import io
+import shutil
+import sys
+import time
+
+import numpy as np
+
+GROUP_LABEL = 'aiida-jdftx-benchmark-throughput'
+
+# the duration in seconds of a run of the mock, its number of ionic steps and the size of the supercell of silicon
+MOCK_DURATION = 1.
+IONIC_STEPS = 5
+SUPERCELL = (2, 2, 2)
+
+PERCENTILES = (50, 90, 99)
+
+
+def get_daemon_cpu_time():
+    """Return the total CPU time in seconds of the processes of the daemon, or None if it is not running."""
+    import psutil
+    from aiida.engine.daemon.client import get_daemon_client
+
+    pid = get_daemon_client().get_daemon_pid()
+
+    if pid is None:
+        return None
+
+    processes = [psutil.Process(pid)] + psutil.Process(pid).children(recursive=True)
+    cpu_time = 0.
+
+    for process in processes:
+        try:
+            times = process.cpu_times()
+        except psutil.NoSuchProcess:
+            continue
+        cpu_time += times.user + times.system
+
+    return cpu_time
+
+
+def get_inputs(computer):
+    """Return the inputs of a `JdftxBaseWorkChain` of a silicon supercell, run with the mock executable."""
+    from aiida import orm
+    from aiida_pseudo.data.pseudo import UpfData
+
+    from aiida_jdftx.utils import get_default_options
+
+    executable = shutil.which('aiida-jdftx-mock')
+    if executable is None:
+        raise RuntimeError('the `aiida-jdftx-mock` executable was not found, is `aiida-jdftx` installed?')
+
+    code = orm.Code(input_plugin_name='jdftx', remote_computer_exec=[computer, executable])
+    code.label = 'jdftx-mock'
+    code.store()
+
+    content = '<UPF version="2.0.1"><PP_HEADER\nelement="Si"\nz_valence="4.0"\n/></UPF>\n'
+    pseudo = UpfData(io.BytesIO(content.encode('utf-8')), filename='Si.upf').store()
+
+    param = 5.43
+    structure = orm.StructureData(cell=[[param / 2., param / 2., 0], [param / 2., 0, param / 2.],
+                                        [0, param / 2., param / 2.]])
+    structure.append_atom(position=(0., 0., 0.), symbols='Si', name='Si')
+    structure.append_atom(position=(param / 4., param / 4., param / 4.), symbols='Si', name='Si')
+    structure = orm.StructureData(ase=structure.get_ase().repeat(SUPERCELL))
+
+    options = get_default_options()
+    options['environment_variables'] = {'AIIDA_JDFTX_MOCK_DURATION': str(MOCK_DURATION)}
+
+    return {
+        'jdftx': {
+            'code': code,
+            'structure': structure,
+            'parameters': orm.Dict(dict={'elec-cutoff': '20 100', 'ionic-minimize': {'nIterations': IONIC_STEPS}}),
+            'pseudos': {'Si': pseudo},
+            'metadata': {'options': options},
+        },
+        'kpoints_distance': orm.Float(0.3),
+    }
+
+
+def get_parse_latency(workchain):
+    """Return the time in seconds from the creation of the retrieved folder to the last output of the parser."""
+    from aiida import orm
+    from aiida.common.links import LinkType
+
+    calculation = [node for node in workchain.called if isinstance(node, orm.CalcJobNode)][-1]
+    outputs = calculation.get_outgoing(link_type=LinkType.CREATE).all()
+    retrieved = [entry.node for entry in outputs if entry.link_label == 'retrieved'][0]
+    parsed = [entry.node.ctime for entry in outputs if entry.link_label not in ('retrieved', 'remote_folder')]
+
+    return (max(parsed) - retrieved.ctime).total_seconds()
+
+
+def main(number_of_workchains, computer_label):
+    """Submit the work chains, wait for them to terminate, report the throughput and clean up."""
+    from aiida import orm
+    from aiida.engine import submit
+    from aiida.plugins import WorkflowFactory
+
+    JdftxBaseWorkChain = WorkflowFactory('jdftx.base')
+
+    if get_daemon_cpu_time() is None:
+        raise RuntimeError('the daemon is not running, start it with `verdi daemon start`')
+
+    group, _ = orm.Group.objects.get_or_create(GROUP_LABEL)
+
+    try:
+        inputs = get_inputs(orm.load_computer(computer_label))
+        group.add_nodes([inputs['jdftx']['code'], inputs['jdftx']['pseudos']['Si']])
+
+        cpu_time = get_daemon_cpu_time()
+        start = time.perf_counter()
+
+        workchains = [submit(JdftxBaseWorkChain, **inputs) for _ in range(number_of_workchains)]
+        group.add_nodes(workchains)
+        print(f'submitted {number_of_workchains} work chains in {time.perf_counter() - start:.2f} s')
+
+        while not all(workchain.is_terminated for workchain in workchains):
+            time.sleep(1.)
+
+        elapsed = time.perf_counter() - start
+        cpu_time = get_daemon_cpu_time() - cpu_time
+
+        finished = [workchain for workchain in workchains if workchain.is_finished_ok]
+        latencies = [get_parse_latency(workchain) for workchain in finished]
+
+        print(f'{len(finished)} of {number_of_workchains} work chains finished ok in {elapsed:.1f} s')
+        print(f'throughput            {60. * number_of_workchains / elapsed:10.2f} jobs/min')
+        print(f'daemon CPU per job    {cpu_time / number_of_workchains:10.3f} s')
+
+        if latencies:
+            for percentile, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES)):
+                print(f'parse latency p{percentile:<5d} {value:10.3f} s')
+    finally:
+        from aiida.tools import delete_group_nodes
+        delete_group_nodes([group.pk], dry_run=False)
+        orm.Group.objects.delete(group.pk)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200, sys.argv[2] if len(sys.argv) > 2 else 'localhost')
@@ -35,3 +35,133 @@ def test_jdftx_default(fixture_sandbox, generate_calc_job,
     assert sorted(fixture_sandbox.get_content_list()) == sorted(
         ['aiida.in', 'pseudo'])
     file_regression.check(input_written, encoding='utf-8', extension='.in')
+
+
+def test_jdftx_kpoints_list(fixture_sandbox, generate_calc_job,
+                            generate_inputs_jdftx):
+    """Test a `JdftxCalculation` with an explicit list of kpoints."""
+    from aiida import orm
+
+    entry_point_name = 'jdftx'
+
+    inputs = generate_inputs_jdftx()
+    kpoints = orm.KpointsData()
+    kpoints.set_cell_from_structure(inputs['structure'])
+    kpoints.set_kpoints([[0., 0., 0.], [0.5, 0., 0.5]])
+    inputs['kpoints'] = kpoints
+
+    calc_info = generate_calc_job(fixture_sandbox, entry_point_name, inputs)
+
+    assert 'aiida.eigenvals' in calc_info.retrieve_list
+
+    with fixture_sandbox.open('aiida.in') as handle:
+        input_written = handle.read()
+
+    assert 'kpoint-folding' not in input_written
+    assert 'kpoint 0.0000000000 0.0000000000 0.0000000000 0.5000000000\n' in input_written
+    assert 'kpoint 0.5000000000 0.0000000000 0.5000000000 0.5000000000\n' in input_written
+    assert 'dump End ElecDensity Kpoints Ecomponents Lattice IonicPositions BandEigs\n' in input_written
+
+
+def test_jdftx_chain(fixture_sandbox, generate_calc_job, generate_inputs_jdftx):
+    """Test a `JdftxChainCalculation` running a relax and a scf stage in one job."""
+    from aiida import orm
+
+    entry_point_name = 'jdftx.chain'
+
+    inputs = generate_inputs_jdftx()
+    inputs['stages'] = orm.List(list=[
+        {'name': 'relax', 'parameters': {'lattice-minimize': {'nIterations': 10}}},
+        {'name': 'scf', 'parameters': {'lattice-minimize': None}},
+    ])
+    inputs['settings'] = orm.Dict(dict={'local_scratch': '/scratch'})
+
+    calc_info = generate_calc_job(fixture_sandbox, entry_point_name, inputs)
+
+    assert [codeinfo.cmdline_params for codeinfo in calc_info.codes_info] == [
+        ['-i', 'relax.in', '-o', 'relax.out'],
+        ['-i', 'scf.in', '-o', 'scf.out'],
+    ]
+    assert 'relax.wfns' not in calc_info.retrieve_list
+    assert sorted(calc_info.retrieve_list) == sorted([
+        'relax.out', 'relax.kPts', 'relax.Ecomponents', 'relax.lattice', 'relax.ionpos',
+        'scf.out', 'scf.kPts', 'scf.Ecomponents', 'scf.lattice', 'scf.ionpos',
+    ])
+    assert '/relax.wfns relax.wfns\n' in calc_info.prepend_text
+    assert 'scf.wfns' not in calc_info.prepend_text
+
+    with fixture_sandbox.open('relax.in') as handle:
+        relax_input = handle.read()
+
+    with fixture_sandbox.open('scf.in') as handle:
+        scf_input = handle.read()
+
+    assert 'dump End ElecDensity Kpoints Ecomponents Lattice IonicPositions State\n' in relax_input
+    assert 'lattice-minimize' not in scf_input
+    assert 'include relax.lattice\n' in scf_input
+    assert 'include relax.ionpos\n' in scf_input
+    assert 'initial-state                  relax.$VAR\n' in scf_input
+
+
+def test_jdftx_remote_parse(fixture_sandbox, generate_calc_job, generate_inputs_jdftx):
+    """Test a `JdftxCalculation` whose stdout is reduced to its summary on the compute node."""
+    from aiida import orm
+
+    inputs = generate_inputs_jdftx()
+    inputs['settings'] = orm.Dict(dict={'remote_parse': True})
+
+    calc_info = generate_calc_job(fixture_sandbox, 'jdftx', inputs)
+
+    assert 'aiida.out' not in calc_info.retrieve_list
+    assert 'aiida.out.json' in calc_info.retrieve_list
+    assert 'aiida.out.npz' in calc_info.retrieve_list
+    assert calc_info.append_text.startswith('python3 aiida_parse.py aiida.out ')
+    assert 'aiida_parse.py' in fixture_sandbox.get_content_list()
+
+
+def test_jdftx_watchdog(fixture_sandbox, generate_calc_job, generate_inputs_jdftx):
+    """Test a `JdftxCalculation` whose stdout is followed by a watchdog started before jdftx and stopped after it."""
+    from aiida import orm
+
+    inputs = generate_inputs_jdftx()
+    inputs['settings'] = orm.Dict(dict={'watchdog': True, 'remote_parse': True, 'monitor': {'linmin_failures': 2}})
+
+    calc_info = generate_calc_job(fixture_sandbox, 'jdftx', inputs)
+
+    assert calc_info.prepend_text == (
+        'python3 aiida_monitor.py aiida.out \'{"linmin_failures": 2}\' &\nAIIDA_JDFTX_WATCHDOG=$!\n'
+    )
+    assert calc_info.append_text.startswith('kill $AIIDA_JDFTX_WATCHDOG 2> /dev/null\npython3 aiida_parse.py aiida.out ')
+    assert 'aiida_monitor.py' in fixture_sandbox.get_content_list()
+
+
+def test_jdftx_dos(fixture_sandbox, generate_calc_job, generate_inputs_jdftx):
+    """Test a `JdftxCalculation` that dumps the density of states when the `density-of-states` command is set."""
+    from aiida import orm
+
+    inputs = generate_inputs_jdftx()
+    parameters = inputs['parameters'].get_dict()
+    parameters['density-of-states'] = 'Etol 1e-06 Total Orbital Si 1 s Orbital Si 1 p'
+    inputs['parameters'] = orm.Dict(dict=parameters)
+
+    calc_info = generate_calc_job(fixture_sandbox, 'jdftx', inputs)
+
+    assert 'aiida.dos*' in calc_info.retrieve_list
+
+    with fixture_sandbox.open('aiida.in') as handle:
+        input_written = handle.read()
+
+    assert 'density-of-states              Etol 1e-06 Total Orbital Si 1 s Orbital Si 1 p\n' in input_written
+    assert 'dump End ElecDensity Kpoints Ecomponents Lattice IonicPositions DOS\n' in input_written
+
+
+def test_jdftx_lightweight(fixture_sandbox, generate_calc_job, generate_inputs_jdftx):
+    """Test that a lightweight `JdftxCalculation` only retrieves the dumped files of the requested outputs."""
+    from aiida import orm
+
+    inputs = generate_inputs_jdftx()
+    inputs['settings'] = orm.Dict(dict={'lightweight': ['output_kpoints']})
+
+    calc_info = generate_calc_job(fixture_sandbox, 'jdftx', inputs)
+
+    assert sorted(calc_info.retrieve_list) == ['aiida.Ecomponents', 'aiida.kPts', 'aiida.out']
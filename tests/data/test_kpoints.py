@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `aiida_jdftx.data.kpoints` module."""
+import os
+
+import numpy as np
+
+from aiida_jdftx.data.kpoints import JdftxKpointsData, get_mesh_indices, get_mesh_kpoints
+from aiida_jdftx.parsers import read_kpoints
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'parsers', 'fixtures')
+
+
+def read_fixture_kpoints(name):
+    """Return the kpoints and weights of the `aiida.kPts` of a parser fixture."""
+    with open(os.path.join(FIXTURES, name, 'aiida.kPts')) as handle:
+        return read_kpoints(handle.read())
+
+
+def test_mesh_indices():
+    """Test that the kpoints of a mesh are rebuilt from their indices as written by jdftx."""
+    for name, offset in (('default', [0.5, 0.5, 0.5]), ('relax', [0., 0., 0.])):
+        kpoints, _ = read_fixture_kpoints(name)
+        indices = get_mesh_indices(kpoints, [8, 8, 8], offset)
+
+        assert len(set(indices)) == len(kpoints)
+        np.testing.assert_allclose(get_mesh_kpoints([8, 8, 8], offset, indices), kpoints, atol=1e-7)
+
+    assert get_mesh_indices(kpoints, [6, 6, 6], [0., 0., 0.]) is None
+
+
+def test_kpoints_data(clear_database_before_test):
+    """Test that the stored compact kpoints return the explicit list of kpoints and weights they were built from."""
+    from aiida import orm
+
+    kpoints, weights = read_fixture_kpoints('default')
+    node = JdftxKpointsData.from_explicit_kpoints(kpoints, weights, [8, 8, 8], [0.5, 0.5, 0.5])
+    node.store()
+
+    loaded = orm.load_node(node.pk)
+    assert loaded.get_kpoints_mesh() == ([8, 8, 8], [0.5, 0.5, 0.5])
+    assert loaded.get_array('indices').dtype == np.int32
+
+    loaded_kpoints, loaded_weights = loaded.get_kpoints(also_weights=True)
+    np.testing.assert_allclose(loaded_kpoints, kpoints, atol=1e-7)
+    np.testing.assert_allclose(loaded_weights, weights, atol=1e-9)
+
+    assert JdftxKpointsData.from_explicit_kpoints(kpoints, weights + 1e-3, [8, 8, 8], [0.5, 0.5, 0.5]) is None
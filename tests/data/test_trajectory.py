@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `aiida_jdftx.data.trajectory` module."""
+import numpy as np
+import pytest
+
+from aiida_jdftx.data.trajectory import JdftxTrajectoryData, TrajectoryWriter
+
+
+@pytest.fixture
+def generate_trajectory():
+    """Return a `JdftxTrajectoryData` with the given number of frames of positions, cells and forces."""
+    def _generate_trajectory(number_of_frames, **kwargs):
+        positions = np.random.random((number_of_frames, 2, 3))
+        writer = TrajectoryWriter(**kwargs)
+
+        try:
+            for frame in positions:
+                writer.append('atomic_positios_relax', frame)
+                writer.append('lattice_relax', np.eye(3))
+                writer.append('forces', -frame)
+            writer.close()
+            trajectory = JdftxTrajectoryData(writer.filepath, symbols=['Si', 'Si'])
+        finally:
+            writer.cleanup()
+
+        return trajectory, positions
+
+    return _generate_trajectory
+
+
+def test_frames(clear_database_before_test, generate_trajectory):
+    """Test the access to single frames and to the complete arrays across chunks."""
+    trajectory, positions = generate_trajectory(25, chunk_size=10)
+    trajectory.store()
+
+    assert trajectory.numsteps == 25
+    assert sorted(trajectory.get_arraynames()) == ['cells', 'forces', 'positions']
+    np.testing.assert_array_equal(trajectory.get_array('positions'), positions)
+    np.testing.assert_array_equal(trajectory.get_frame('forces', 12), -positions[12])
+    np.testing.assert_array_equal(trajectory.get_frame('forces', -1), -positions[-1])
+    assert [len(chunk) for chunk in trajectory.iter_chunks('positions')] == [10, 10, 5]
+
+    with pytest.raises(IndexError):
+        trajectory.get_frame('positions', 25)
+
+
+def test_single_precision(clear_database_before_test, generate_trajectory):
+    """Test that only the positions and forces are stored in single precision, and the conversion to `TrajectoryData`."""
+    trajectory, positions = generate_trajectory(3, single_precision=True)
+
+    assert trajectory.get_array('positions').dtype == np.float32
+    assert trajectory.get_array('cells').dtype == np.float64
+
+    converted = trajectory.to_trajectory_data()
+    assert converted.numsteps == 3
+    assert converted.symbols == ['Si', 'Si']
+    np.testing.assert_allclose(converted.get_positions(), positions, rtol=1e-6)
+    np.testing.assert_allclose(converted.get_array('forces'), -positions, rtol=1e-6)
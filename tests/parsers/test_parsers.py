@@ -52,10 +52,13 @@ def test_pw_default(fixture_localhost, generate_calc_job_node, generate_parser,
     assert 'output_kpoints' in results
     assert 'output_structure' in results
     assert 'output_trajectory' in results
+    assert 'output_performance' in results
 
     data_regression.check({
         'output_parameters':
         results['output_parameters'].get_dict(),
+        'output_performance':
+        results['output_performance'].get_dict(),
         'output_kpoints':
         results['output_kpoints'].attributes,
         'output_structure':
@@ -90,10 +93,13 @@ def test_pw_relax(fixture_localhost, generate_calc_job_node, generate_parser,
     assert 'output_kpoints' in results
     assert 'output_structure' in results
     assert 'output_trajectory' in results
+    assert 'output_performance' in results
 
     data_regression.check({
         'output_parameters':
         results['output_parameters'].get_dict(),
+        'output_performance':
+        results['output_performance'].get_dict(),
         'output_kpoints':
         results['output_kpoints'].attributes,
         'output_structure':
@@ -101,3 +107,208 @@ def test_pw_relax(fixture_localhost, generate_calc_job_node, generate_parser,
         'output_trajectory':
         results['output_trajectory'].attributes,
     })
+
+
+def test_get_energy_key_from_line():
+    """Test that the energy components are matched on their exact label, including the fluid ones."""
+    from aiida_jdftx.parsers import get_energy_key_from_line
+
+    assert get_energy_key_from_line('   A_diel =       -0.0123456789012345') == 'energy_fluid'
+    assert get_energy_key_from_line(' Exc_core =        0.0503512823429700') == 'energy_xc_core'
+    assert get_energy_key_from_line('        F =       -7.8829368701299387') == 'energy_free'
+    assert get_energy_key_from_line('-------------------------------------') is None
+
+
+def test_parse_performance():
+    """Test the parsing of the profile printed by jdftx compiled with profiling enabled."""
+    from aiida_jdftx.stdout import parse_performance
+
+    performance = parse_performance([
+        'PROFILER:             augmentDensityGrid     0.000539 +/-     0.000150 s,   69 calls,      0.037222 s total',
+        'PROFILER:        ColumnBundle::randomize     0.001000 +/-     0.000000 s,    2 calls,      0.002000 s total',
+        'End date and time: Tue May 18 16:37:45 2021  (Duration: 1-2:03:04.50)',
+    ])
+
+    assert performance == {
+        'profile_augmentDensityGrid_calls': 69,
+        'profile_augmentDensityGrid_time': 0.037222,
+        'profile_ColumnBundle__randomize_calls': 2,
+        'profile_ColumnBundle__randomize_time': 0.002,
+        'wall_time': 93784.5,
+    }
+
+
+def test_parse_cache(fixture_localhost, generate_calc_job_node, generate_parser, generate_inputs, monkeypatch,
+                     tmp_path):
+    """Test that the products of a parse are reused when the parse cache is enabled."""
+    import numpy as np
+
+    monkeypatch.setenv('AIIDA_JDFTX_PARSE_CACHE', str(tmp_path))
+
+    node = generate_calc_job_node('jdftx', fixture_localhost, 'default', generate_inputs())
+    parser = generate_parser('jdftx')
+
+    results, _ = parser.parse_from_node(node, store_provenance=False)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    cached, calcfunction = parser.parse_from_node(node, store_provenance=False)
+
+    assert calcfunction.is_finished_ok, calcfunction.exit_message
+    assert sorted(cached) == sorted(results)
+    assert cached['output_parameters'].get_dict() == results['output_parameters'].get_dict()
+    np.testing.assert_array_equal(
+        cached['output_trajectory'].get_array('forces'), results['output_trajectory'].get_array('forces'))
+
+
+def test_compact_trajectory(fixture_localhost, generate_calc_job_node, generate_parser, generate_inputs):
+    """Test that the `compact_trajectory` setting stores the same trajectory in a `JdftxTrajectoryData`."""
+    import numpy as np
+    from aiida_jdftx.data.trajectory import JdftxTrajectoryData
+
+    parser = generate_parser('jdftx')
+
+    node = generate_calc_job_node('jdftx', fixture_localhost, 'relax', generate_inputs())
+    reference, _ = parser.parse_from_node(node, store_provenance=False)
+
+    settings = {'compact_trajectory': {'chunk_size': 4}}
+    node = generate_calc_job_node('jdftx', fixture_localhost, 'relax', generate_inputs(settings=settings))
+    results, calcfunction = parser.parse_from_node(node, store_provenance=False)
+
+    assert calcfunction.is_finished_ok, calcfunction.exit_message
+    assert isinstance(results['output_trajectory'], JdftxTrajectoryData)
+    assert results['output_parameters'].get_dict() == reference['output_parameters'].get_dict()
+
+    trajectory = results['output_trajectory'].to_trajectory_data()
+    for name in reference['output_trajectory'].get_arraynames():
+        np.testing.assert_array_equal(trajectory.get_array(name), reference['output_trajectory'].get_array(name))
+
+
+def test_partial_relax(fixture_localhost, generate_calc_job_node, generate_parser, generate_inputs):
+    """Test that the complete ionic steps of a relaxation that was killed are salvaged with the partial exit code."""
+    import numpy as np
+
+    node = generate_calc_job_node('jdftx', fixture_localhost, 'relax_partial', generate_inputs())
+    parser = generate_parser('jdftx')
+    results, calcfunction = parser.parse_from_node(node, store_provenance=False)
+
+    assert calcfunction.exit_status == node.process_class.exit_codes.ERROR_OUTPUT_STDOUT_PARTIAL.status
+    trajectory = results['output_trajectory']
+    assert len(trajectory.get_array('forces')) == 4
+    assert np.isclose(results['output_parameters']['energy_total'], trajectory.get_array('energy_total')[-1])
+
+    structure = results['output_structure']
+    assert np.allclose(structure.cell, trajectory.get_cells()[-1])
+    assert [site.kind_name for site in structure.sites] == [site.kind_name for site in node.inputs.structure.sites]
+
+
+def test_dos(fixture_localhost, generate_calc_job_node, generate_parser, generate_inputs):
+    """Test that the dumped density of states is parsed into an `XyData` in eV, with the projected channels."""
+    import numpy as np
+    from aiida_jdftx._constants import CONSTANTS
+
+    node = generate_calc_job_node('jdftx', fixture_localhost, 'dos', generate_inputs())
+    parser = generate_parser('jdftx')
+    results, calcfunction = parser.parse_from_node(node, store_provenance=False)
+
+    assert calcfunction.is_finished_ok, calcfunction.exit_message
+
+    name, energies, units = results['output_dos'].get_x()
+    assert (name, units) == ('Energy', 'eV')
+    assert np.isclose(energies[0], -0.25 * CONSTANTS.har_to_ev)
+
+    channels = results['output_dos'].get_y()
+    assert [name for name, _, _ in channels] == ['Total', 's orbital at Si#1', 'p orbital at Si#1']
+    assert all(units == 'states/eV' for _, _, units in channels)
+    assert np.allclose(channels[0][1], 2 * (channels[1][1] + channels[2][1]), atol=1e-5)
+
+
+def test_read_dos():
+    """Test that a density of states is read with the names of its columns and converted to eV."""
+    from aiida_jdftx._constants import CONSTANTS
+    from aiida_jdftx.parsers import read_dos
+
+    content = '"Energy"\t"Total"\n-0.1\t2.0\n0.0\t4.0\n'
+    columns, table = read_dos(content)
+
+    assert columns == ['Energy', 'Total']
+    assert table.shape == (2, 2)
+    assert table[0, 0] == -0.1 * CONSTANTS.har_to_ev
+    assert table[1, 1] == 4.0 / CONSTANTS.har_to_ev
+
+
+def test_lightweight(fixture_localhost, generate_calc_job_node, generate_parser, generate_inputs):
+    """Test that the `lightweight` setting only produces the `output_parameters` with the summary arrays."""
+    import numpy as np
+
+    parser = generate_parser('jdftx')
+
+    node = generate_calc_job_node('jdftx', fixture_localhost, 'relax', generate_inputs())
+    reference, _ = parser.parse_from_node(node, store_provenance=False)
+
+    node = generate_calc_job_node('jdftx', fixture_localhost, 'relax', generate_inputs(settings={'lightweight': True}))
+    results, calcfunction = parser.parse_from_node(node, store_provenance=False)
+
+    assert calcfunction.is_finished_ok, calcfunction.exit_message
+    assert set(results) == {'output_parameters'}
+
+    parameters = results['output_parameters'].get_dict()
+    trajectory = reference['output_trajectory']
+    assert parameters['energy_total'] == reference['output_parameters']['energy_total']
+    assert np.allclose(parameters['energies'], trajectory.get_array('energy_total'))
+    assert np.allclose(parameters['cell'], trajectory.get_cells()[-1])
+    assert parameters['volume'] == pytest.approx(abs(np.linalg.det(trajectory.get_cells()[-1])))
+    assert len(parameters['max_forces']) == len(trajectory.get_array('forces'))
+
+    settings = {'lightweight': ['output_structure']}
+    node = generate_calc_job_node('jdftx', fixture_localhost, 'relax', generate_inputs(settings=settings))
+    results, calcfunction = parser.parse_from_node(node, store_provenance=False)
+
+    assert set(results) == {'output_parameters', 'output_structure'}
+    assert results['output_structure'].cell == reference['output_structure'].cell
+
+
+def test_compact_kpoints(fixture_localhost, generate_calc_job_node, generate_parser, generate_inputs):
+    """Test that the kpoints of an input mesh are parsed into a `JdftxKpointsData` of the same explicit list."""
+    import numpy as np
+    from aiida_jdftx.data.kpoints import JdftxKpointsData
+
+    parser = generate_parser('jdftx')
+
+    node = generate_calc_job_node('jdftx', fixture_localhost, 'default', generate_inputs())
+    reference, _ = parser.parse_from_node(node, store_provenance=False)
+
+    inputs = generate_inputs()
+    inputs.kpoints.set_kpoints_mesh([8, 8, 8], [0.5, 0.5, 0.5])
+    node = generate_calc_job_node('jdftx', fixture_localhost, 'default', inputs)
+    results, calcfunction = parser.parse_from_node(node, store_provenance=False)
+
+    assert calcfunction.is_finished_ok, calcfunction.exit_message
+    assert not isinstance(reference['output_kpoints'], JdftxKpointsData)
+    assert isinstance(results['output_kpoints'], JdftxKpointsData)
+
+    kpoints, weights = results['output_kpoints'].get_kpoints(also_weights=True)
+    reference_kpoints, reference_weights = reference['output_kpoints'].get_kpoints(also_weights=True)
+    np.testing.assert_allclose(kpoints, reference_kpoints, atol=1e-7)
+    np.testing.assert_allclose(weights, reference_weights, atol=1e-9)
+
+
+@pytest.mark.parametrize('settings', ({}, {'lightweight': True}))
+def test_partial_relax_triclinic(fixture_localhost, generate_calc_job_node, generate_parser, generate_inputs, settings):
+    """Test that the salvaged structure of a non-symmetric cell and the summary arrays agree with the trajectory."""
+    import numpy as np
+    from aiida_jdftx.stdout import parse_stdout_content
+
+    node = generate_calc_job_node('jdftx', fixture_localhost, 'relax_partial_triclinic', generate_inputs(settings=settings))
+    parser = generate_parser('jdftx')
+    results, _ = parser.parse_from_node(node, store_provenance=False)
+
+    content = node.outputs.retrieved.get_object_content('aiida.out')
+    trajectory = parse_stdout_content(content, node.inputs.structure.cell)['trajectory']
+
+    structure = results['output_structure']
+    np.testing.assert_allclose(structure.cell, trajectory['lattice_relax'][-1])
+    np.testing.assert_allclose([site.position for site in structure.sites], trajectory['atomic_positios_relax'][-1])
+
+    if settings:
+        np.testing.assert_allclose(results['output_parameters']['cell'], trajectory['lattice_relax'][-1])
+        np.testing.assert_allclose(results['output_parameters']['positions'], trajectory['atomic_positios_relax'][-1])
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `aiida_jdftx.cache` module."""
+import os
+
+import numpy as np
+
+from aiida import orm
+from aiida.engine import ExitCode
+
+from aiida_jdftx.cache import ParseCache
+
+
+def test_save_load(clear_database_before_test, tmp_path):
+    """Test that the output nodes and the exit code are restored as new unstored nodes."""
+    cache = ParseCache(str(tmp_path))
+
+    parameters = orm.Dict(dict={'energy_total': -1.})
+    trajectory = orm.ArrayData()
+    trajectory.set_array('forces', np.ones((2, 3)))
+
+    cache.save('key', {'output_parameters': parameters, 'output_trajectory': trajectory}, ExitCode(410, 'diverged'))
+    outputs, exit_code = cache.load('key')
+
+    assert exit_code == ExitCode(410, 'diverged')
+    assert not outputs['output_parameters'].is_stored
+    assert outputs['output_parameters'].get_dict() == {'energy_total': -1.}
+    np.testing.assert_array_equal(outputs['output_trajectory'].get_array('forces'), np.ones((2, 3)))
+    assert cache.load('missing') is None
+
+
+def test_evict(clear_database_before_test, tmp_path):
+    """Test that the least recently used entries are evicted beyond the maximum size."""
+    cache = ParseCache(str(tmp_path))
+    cache.save('first', {'output_parameters': orm.Dict(dict={'value': 1})})
+
+    size = sum(path.stat().st_size for path in (tmp_path / 'first').rglob('*') if path.is_file())
+    os.utime(tmp_path / 'first', (0, 0))
+
+    cache.max_size = size * 3 // 2
+    cache.save('second', {'output_parameters': orm.Dict(dict={'value': 2})})
+
+    assert cache.load('first') is None
+    assert cache.load('second') is not None
+
+
+def test_total(clear_database_before_test, tmp_path, monkeypatch):
+    """Test that the running total of the size is updated without scanning the entries below the maximum size."""
+    cache = ParseCache(str(tmp_path))
+    cache.save('first', {'output_parameters': orm.Dict(dict={'value': 1})})
+    total = int((tmp_path / '.size').read_text())
+
+    assert total == sum(path.stat().st_size for path in (tmp_path / 'first').rglob('*') if path.is_file())
+
+    def get_entries():
+        raise AssertionError('the entries are scanned')
+
+    monkeypatch.setattr(cache, 'get_entries', get_entries)
+    cache.save('second', {'output_parameters': orm.Dict(dict={'value': 2})})
+
+    assert int((tmp_path / '.size').read_text()) == 2 * total
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Tests for the cost of loading the entry points of the plugin."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+# the modules that a daemon worker has imported before it loads the parser of a calculation
+PRELOADED = ('json', 'shutil', 'tempfile', 'numpy', 'aiida.orm', 'aiida.engine', 'aiida.parsers', 'aiida.plugins')
+
+# the environment variable of the budget in microseconds of the import of the parser module on top of the preloaded
+# modules, which depends on the machine, such that the import time is only tested if it is set, e.g. 50000
+ENV_BUDGET = 'AIIDA_JDFTX_IMPORT_BUDGET'
+
+
+def get_import_times(module, preloaded=PRELOADED):
+    """Return the cumulative import times in microseconds by module of importing `module` after the preloaded ones.
+
+    :return: tuple of the import times and of the names of the modules that are loaded after the import
+    """
+    code = f'import {", ".join(preloaded + ("sys",))}; import {module}; print("\\n".join(sys.modules))'
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, check=True,
+                             universal_newlines=True)
+
+    times = {}
+    for line in process.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line and 'cumulative' not in line:
+            _, cumulative, name = line.split('|')
+            times[name.strip()] = int(cumulative)
+
+    return times, process.stdout.split()
+
+
+def test_parser_import():
+    """Test that loading the parser module neither loads the calculation nor data plugins."""
+    _, modules = get_import_times('aiida_jdftx.parsers')
+
+    assert 'aiida_jdftx.calculations' not in modules
+    assert 'aiida_pseudo' not in modules
+
+
+@pytest.mark.skipif(not os.environ.get(ENV_BUDGET), reason=f'the import time is only tested if `{ENV_BUDGET}` is set')
+def test_parser_import_time():
+    """Test that loading the parser module stays within the budget in microseconds of `AIIDA_JDFTX_IMPORT_BUDGET`."""
+    times, _ = get_import_times('aiida_jdftx.parsers')
+    budget = int(os.environ[ENV_BUDGET])
+
+    assert times['aiida_jdftx.parsers'] < budget, f'importing the parser took {times["aiida_jdftx.parsers"]} us'
+
+
+def test_calculation_import():
+    """Test that loading the calculation module does not load the data plugins of its specification."""
+    _, modules = get_import_times('aiida_jdftx.calculations')
+
+    assert 'aiida_pseudo' not in modules
+
+
+def test_mock_import():
+    """Test that loading the mock jdftx executable does not load AiiDA."""
+    _, modules = get_import_times('aiida_jdftx.tools.mock', preloaded=())
+
+    assert not [module for module in modules if module == 'aiida' or module.startswith('aiida.')]
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `aiida_jdftx.monitors` module."""
+import json
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from aiida_jdftx.monitors import ElecMinimizeMonitor, get_child_pids, get_script, watch
+
+HEADER = '-------- Electronic minimization -----------\n'
+
+
+def elec_minimize_lines(energies, gradients):
+    """Return the stdout lines of an electronic minimization with the given energies and gradients."""
+    return ''.join(
+        f'ElecMinimize: Iter: {index:3d}  Etot: {energy:+.15f}  |grad|_K:  {gradient:.3e}  alpha:  1.0e+00\n'
+        for index, (energy, gradient) in enumerate(zip(energies, gradients))
+    )
+
+
+def test_converging():
+    """Test that a converging minimization is not stopped."""
+    energies = [-10. - 0.1 / (step + 1) for step in range(30)]
+    gradients = [0.1 / (step + 1) for step in range(30)]
+
+    monitor = ElecMinimizeMonitor()
+    monitor.feed(HEADER + elec_minimize_lines(energies, gradients))
+
+    assert monitor.check() is None
+
+
+@pytest.mark.parametrize('energies, gradients, message', (
+    ([-10. + step for step in range(12)], [step + 1. for step in range(12)], 'gradient increased'),
+    ([-10. + 0.1 * (-1)**step for step in range(14)], [1.] * 14, 'energy oscillated'),
+    ([-10.] * 51, [1.] * 51, 'energy decreased by less than'),
+))
+def test_divergence(energies, gradients, message):
+    """Test the detection of the divergence patterns."""
+    monitor = ElecMinimizeMonitor()
+    monitor.feed(HEADER + elec_minimize_lines(energies, gradients))
+
+    assert message in monitor.check()
+
+
+def test_line_minimization_failures():
+    """Test that repeated line minimization failures stop the calculation, with configurable threshold."""
+    stdout = HEADER + 'ElecMinimize: Line minimization failed along gradient direction.\n' * 2
+
+    monitor = ElecMinimizeMonitor()
+    monitor.feed(stdout)
+    assert monitor.check() is None
+
+    monitor = ElecMinimizeMonitor({'linmin_failures': 2})
+    monitor.feed(stdout)
+    assert 'line minimization failed 2 times' in monitor.check()
+
+
+def test_incremental_feed():
+    """Test that the stdout can be fed in chunks that split lines, and that a new minimization resets the history."""
+    stdout = HEADER + elec_minimize_lines([-10. + step for step in range(12)], [step + 1. for step in range(12)])
+
+    monitor = ElecMinimizeMonitor()
+    for start in range(0, len(stdout), 7):
+        monitor.feed(stdout[start:start + 7])
+
+    assert monitor.offset == len(stdout)
+    assert monitor.check() is not None
+
+    monitor.feed(HEADER)
+    assert monitor.check() is None
+
+
+def test_watch(tmp_path):
+    """Test that the watchdog kills the processes started by the shell when the minimization diverges."""
+    filepath = tmp_path / 'aiida.out'
+    filepath.write_text(HEADER + elec_minimize_lines([-10. + step for step in range(12)], [step + 1. for step in range(12)]))
+
+    shell = subprocess.Popen(['sh', '-c', 'sleep 60; echo continued'], stdout=subprocess.PIPE, universal_newlines=True)
+
+    try:
+        # wait for the shell to start the command standing in for jdftx
+        for _ in range(1000):
+            if get_child_pids(shell.pid):
+                break
+            time.sleep(0.01)
+
+        assert 'gradient increased' in watch(str(filepath), {}, shell.pid, interval=0.01)
+        assert shell.wait(timeout=10) == 0
+        assert shell.stdout.read() == 'continued\n'
+    finally:
+        shell.kill()
+
+
+def test_watch_done(tmp_path):
+    """Test that the watchdog stops without killing anything when the run ends."""
+    filepath = tmp_path / 'aiida.out'
+    filepath.write_text(HEADER + elec_minimize_lines([-10.] * 3, [1.] * 3) + 'Done!\n')
+
+    assert watch(str(filepath), {}, interval=0.01) is None
+
+
+def test_script(tmp_path):
+    """Test that the watchdog script runs standalone and reports why it stopped jdftx to the stderr of the job."""
+    (tmp_path / 'aiida_monitor.py').write_text(get_script())
+    (tmp_path / 'aiida.out').write_text(HEADER + 'ElecMinimize: Line minimization failed along gradient direction.\n')
+
+    command = f'{sys.executable} aiida_monitor.py aiida.out {json.dumps(json.dumps({"linmin_failures": 1}))} & sleep 60'
+    process = subprocess.run(['sh', '-c', command], cwd=str(tmp_path), stderr=subprocess.PIPE, universal_newlines=True,
+                             timeout=30, check=False)
+
+    assert process.returncode == -signal.SIGTERM or process.returncode == 128 + signal.SIGTERM
+    assert 'line minimization failed 1 times' in process.stderr
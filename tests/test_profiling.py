@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `aiida_jdftx.profiling` module."""
+import json
+import sys
+
+import numpy as np
+import pytest
+
+from aiida_jdftx import profiling
+
+
+def test_disabled(monkeypatch):
+    """Test that no phase is recorded and nothing is written when the profiling is not enabled."""
+    monkeypatch.delenv(profiling.ENV_PROFILE, raising=False)
+
+    with profiling.profile('parse') as profiler:
+        assert profiler is None
+        assert profiling.phase('read') is profiling.phase('parse')
+
+
+@pytest.mark.parametrize('extension', ('.jsonl', '.prom'))
+def test_enabled(monkeypatch, tmp_path, extension):
+    """Test that the nested phases are recorded and written to the metrics file in the format of its extension."""
+    filepath = tmp_path / f'metrics{extension}'
+    monkeypatch.delenv(profiling.ENV_PROFILE, raising=False)
+    monkeypatch.setenv(profiling.ENV_FILE, str(filepath))
+
+    @profiling.phased('parse stdout')
+    def parse_stdout():
+        with profiling.phase('read aiida.out'):
+            pass
+
+    for _ in range(2):
+        with profiling.profile('parse', pk=1, enabled=True) as profiler:
+            parse_stdout()
+            parse_stdout()
+
+    with profiling.profile('prepare', pk=2, enabled=True):
+        pass
+
+    assert [entry['phase'] for entry in profiler.phases][-3:] == ['read aiida.out', 'parse stdout', 'total']
+    assert all(entry['duration'] >= 0 for entry in profiler.phases)
+
+    lines = filepath.read_text().splitlines()
+
+    if extension == '.jsonl':
+        assert len(lines) == 3
+        assert json.loads(lines[0])['phases'][0]['phase'] == 'read aiida.out'
+    else:
+        # every series is unique, without timestamps, and only the last record of every process is kept
+        samples = [line for line in lines if not line.startswith('#')]
+        assert len(samples) == len(set(line.rsplit(' ', 1)[0] for line in samples))
+        assert all(len(line.rsplit('}', 1)[1].split()) == 1 for line in samples)
+        assert '# TYPE aiida_jdftx_phase_duration_seconds gauge' in lines
+        assert 'aiida_jdftx_phase_calls{process="parse",phase="parse stdout"} 2' in samples
+        assert 'aiida_jdftx_profile_pk{process="parse"} 1' in samples
+        assert 'aiida_jdftx_profile_pk{process="prepare"} 2' in samples
+        assert not list(tmp_path.glob('*.tmp'))
+
+
+@pytest.mark.skipif(sys.version_info < (3, 9), reason='the peak of `tracemalloc` can only be reset from Python 3.9')
+def test_peak_memory(monkeypatch):
+    """Test that the peak memory of a phase is that allocated during the phase, also counted in the enclosing phase."""
+    monkeypatch.delenv(profiling.ENV_FILE, raising=False)
+    size = 10**7
+
+    with profiling.profile('parse', enabled=True) as profiler:
+        with profiling.phase('allocate'):
+            array = np.ones(size, dtype=np.uint8)
+            del array
+
+        with profiling.phase('other'):
+            pass
+
+    peaks = {entry['phase']: entry['peak_memory'] for entry in profiler.phases}
+    assert size <= peaks['allocate'] < 2 * size
+    assert peaks['other'] < size
+    assert peaks['total'] >= size
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `aiida_jdftx.stdout` module."""
+import io
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from aiida_jdftx.stdout import get_script, parse_stdout_content, read_summary, write_summary
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'parsers', 'fixtures')
+CELL = [[2.715, 2.715, 0.], [2.715, 0., 2.715], [0., 2.715, 2.715]]
+
+
+def read_stdout(name):
+    """Return the content of the stdout of the parser fixture with the given name."""
+    with open(os.path.join(FIXTURES, name, 'aiida.out')) as handle:
+        return handle.read()
+
+
+def assert_parsed_equal(parsed, reference):
+    """Assert that the parsed stdout is exactly equal to the reference, including the trajectory arrays."""
+    assert {key: value for key, value in parsed.items() if key != 'trajectory'} == {
+        key: value for key, value in reference.items() if key != 'trajectory'
+    }
+    assert parsed['trajectory'].keys() == reference['trajectory'].keys()
+
+    for key, values in reference['trajectory'].items():
+        assert len(parsed['trajectory'][key]) == len(values)
+        for value, expected in zip(parsed['trajectory'][key], values):
+            np.testing.assert_array_equal(value, expected)
+
+
+@pytest.mark.parametrize('name', ('default', 'relax'))
+def test_summary(name):
+    """Test that the summary of the stdout is read back into exactly the values of the parsed stdout."""
+    reference = parse_stdout_content(read_stdout(name), CELL)
+
+    handle_parameters, handle_arrays = io.StringIO(), io.BytesIO()
+    write_summary(reference, handle_parameters, handle_arrays)
+    handle_parameters.seek(0)
+    handle_arrays.seek(0)
+
+    assert_parsed_equal(read_summary(handle_parameters, handle_arrays), reference)
+
+
+def test_summary_incomplete():
+    """Test that the summary of an incomplete run keeps the stdout of its last electronic minimization."""
+    stdout = read_stdout('relax')
+    stdout = stdout[:stdout.rindex('SCF: Converged')]
+
+    parsed = parse_stdout_content(stdout, CELL)
+
+    assert not parsed['completed']
+    assert parsed['tail'].startswith('-------- Electronic minimization')
+    assert parsed['tail'].count('-------- Electronic minimization') == 1
+
+
+def test_script(tmp_path):
+    """Test that the standalone script writes the summary without importing the package."""
+    import json
+
+    (tmp_path / 'aiida_parse.py').write_text(get_script())
+    (tmp_path / 'aiida.out').write_text(read_stdout('relax'))
+
+    subprocess.run([sys.executable, '-I', 'aiida_parse.py', 'aiida.out', json.dumps(CELL)], cwd=str(tmp_path),
+                   check=True)
+
+    with open(tmp_path / 'aiida.out.json') as handle_parameters, open(tmp_path / 'aiida.out.npz', 'rb') as handle_arrays:
+        parsed = read_summary(handle_parameters, handle_arrays)
+
+    assert_parsed_equal(parsed, parse_stdout_content(read_stdout('relax'), CELL))
+
+
+@pytest.mark.parametrize('chunk_size', (1, 3, 1000))
+def test_parse_in_chunks(chunk_size):
+    """Test that parsing the steps in chunks in a pool of processes gives exactly the values of the serial parse."""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    stdout = read_stdout('relax')
+
+    with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context('spawn')) as executor:
+        parsed = parse_stdout_content(stdout, CELL, executor=executor, chunk_size=chunk_size)
+
+    assert_parsed_equal(parsed, parse_stdout_content(stdout, CELL))
+
+
+def test_partial_geometry():
+    """Test that a run killed during a step only includes its complete steps and returns the last complete geometry."""
+    stdout = read_stdout('relax')
+    reference = parse_stdout_content(stdout, CELL)
+
+    index = stdout.index('\n', stdout.index('LatticeMinimize: Iter:   3'))
+    parsed = parse_stdout_content(stdout[:stdout.index('# Ionic positions', index) + 30], CELL)
+
+    assert parsed['geometry'] is not None
+    assert reference['geometry'] is None
+
+    for key, values in parsed['trajectory'].items():
+        assert len(values) == 4
+        np.testing.assert_array_equal(values, reference['trajectory'][key][:4])
+
+    np.testing.assert_allclose(parsed['geometry']['cell'], reference['trajectory']['lattice_relax'][3])
+    np.testing.assert_allclose(parsed['geometry']['positions'], reference['trajectory']['atomic_positios_relax'][3])
+
+
+def test_partial_geometry_triclinic():
+    """Test that the last complete geometry of a non-symmetric cell is that of the last frame of the trajectory."""
+    parsed = parse_stdout_content(read_stdout('relax_partial_triclinic'), CELL)
+    cell = parsed['trajectory']['lattice_relax'][-1]
+
+    assert not np.allclose(cell, cell.T)
+    np.testing.assert_allclose(parsed['geometry']['cell'], cell)
+    np.testing.assert_allclose(parsed['geometry']['positions'], parsed['trajectory']['atomic_positios_relax'][-1])
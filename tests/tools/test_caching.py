@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `aiida_jdftx.tools.caching` module."""
+from aiida import orm
+
+from aiida_jdftx.tools.caching import canonicalize_parameters, get_cache_statistics
+
+
+def test_canonicalize_parameters():
+    """Test that equivalent parameters have the same canonical form, with sorted commands and options."""
+    parameters = canonicalize_parameters({
+        'lattice-minimize': {'nIterations': 10.0, 'energyDiffThreshold': '1e-6'},
+        ' elec-cutoff': '20  100',
+        'electronic-scf': 'mixFraction 0.50  nIterations +10',
+        'elec-smearing': 'Fermi -0.0',
+    })
+
+    assert list(parameters) == ['elec-cutoff', 'elec-smearing', 'electronic-scf', 'lattice-minimize']
+    assert parameters == {
+        'elec-cutoff': '20 100',
+        'elec-smearing': 'Fermi 0',
+        'electronic-scf': 'mixFraction 0.5 nIterations 10',
+        'lattice-minimize': {'energyDiffThreshold': '1e-06', 'nIterations': '10'},
+    }
+    assert canonicalize_parameters({
+        'electronic-scf': 'mixFraction .5 nIterations 10',
+        'elec-cutoff': '20 100.0',
+        'lattice-minimize': {'nIterations': '10', 'energyDiffThreshold': 1e-6},
+        'elec-smearing': 'Fermi 0',
+    }) == parameters
+
+
+def test_canonicalize_leading_zeros():
+    """Test that the integers with leading zeros, which jdftx may read as strings, are not changed."""
+    assert canonicalize_parameters({'coulomb-interaction': 'Slab 001'}) == {'coulomb-interaction': 'Slab 001'}
+    assert canonicalize_parameters({'coulomb-interaction': 'Slab 010'}) == {'coulomb-interaction': 'Slab 010'}
+    assert canonicalize_parameters({'x': '+007 -0 0 +3'}) == {'x': '007 0 0 3'}
+
+
+def test_get_cache_statistics(clear_database_before_test, fixture_localhost, generate_calc_job_node):
+    """Test that the calculations are counted as cached, duplicates and equivalent in order of their pks."""
+    nodes = []
+
+    for value, node_hash in (('10', 'a'), ('10', 'a'), ('10.0', 'b'), ('20', 'c')):
+        node = generate_calc_job_node('jdftx', fixture_localhost, inputs={'parameters': orm.Dict(dict={'x': value})})
+        node.set_extra('_aiida_hash', node_hash)
+        nodes.append(node)
+
+    nodes[3].set_extra('_aiida_cached_from', nodes[0].uuid)
+
+    statistics = get_cache_statistics([node.pk for node in nodes])
+
+    assert statistics.total == 4
+    assert statistics.cached == 1
+    assert statistics.duplicates == 1
+    assert statistics.equivalent == 1
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `aiida_jdftx.tools.density` module."""
+import numpy as np
+import pytest
+
+from aiida import orm
+
+from aiida_jdftx.tools.density import convert_density, get_density_file, get_fftbox_shape
+
+SHAPE = (8, 10, 9)
+
+
+@pytest.fixture
+def density_file(tmp_path):
+    """Return the path of a binary density file with random values on a grid of shape `SHAPE`, and the values."""
+    density = np.random.random(SHAPE)
+    filepath = tmp_path / 'aiida.n'
+    density.astype('<f8').tofile(str(filepath))
+
+    return str(filepath), density
+
+
+def read_values(lines):
+    """Return the array of the values on the lines."""
+    return np.array(' '.join(lines).split(), dtype=float)
+
+
+def test_get_fftbox_shape():
+    """Test that the shape of the density grid is the first fftbox size."""
+    stdout = 'Chosen fftbox size, S = [  36  36  40  ]\nChosen fftbox size, S = [  32  32  32  ]\n'
+    assert get_fftbox_shape(stdout) == (36, 36, 40)
+
+
+@pytest.mark.parametrize('step, crop', ((1, None), (2, None), (3, [(1, 7), (0, 10), (2, 8)])))
+def test_convert_cube(tmp_path, density_file, generate_structure, step, crop):
+    """Test the grid and the values of the cube file, with the last direction the fastest."""
+    filepath, density = density_file
+    expected = density[tuple(slice(*bounds, step) for bounds in (crop or [(0, size) for size in SHAPE]))]
+
+    convert_density(filepath, str(tmp_path / 'density.cube'), generate_structure(), SHAPE, step, crop, block_size=512)
+
+    lines = (tmp_path / 'density.cube').read_text().splitlines()
+
+    assert [int(line.split()[0]) for line in lines[3:6]] == list(expected.shape)
+    assert [int(line.split()[0]) for line in lines[6:8]] == [14, 14]
+    np.testing.assert_allclose(read_values(lines[8:]), expected.ravel(), rtol=1e-5)
+
+
+def test_convert_xsf(tmp_path, density_file, generate_structure):
+    """Test the values of the XSF file, with the first direction the fastest."""
+    filepath, density = density_file
+
+    convert_density(filepath, str(tmp_path / 'density.xsf'), generate_structure(), SHAPE, 2, block_size=512)
+
+    content = (tmp_path / 'density.xsf').read_text()
+    lines = content.split('BEGIN_DATAGRID_3D_density\n')[1].split('END_DATAGRID_3D')[0].splitlines()
+
+    assert lines[0].split() == ['4', '5', '5']
+    np.testing.assert_allclose(read_values(lines[5:]), density[::2, ::2, ::2].transpose(2, 1, 0).ravel(), rtol=1e-5)
+
+
+def test_get_density_file(clear_database_before_test, density_file, generate_structure):
+    """Test the conversion as a calcfunction."""
+    filepath, density = density_file
+
+    result = get_density_file(
+        orm.SinglefileData(filepath), generate_structure(), orm.Dict(dict={'shape': list(SHAPE), 'step': 2})
+    )
+
+    assert result.filename == 'density.cube'
+    with result.open() as handle:
+        lines = handle.read().splitlines()
+
+    np.testing.assert_allclose(read_values(lines[8:]), density[::2, ::2, ::2].ravel(), rtol=1e-5)
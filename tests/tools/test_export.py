@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `aiida_jdftx.tools.export` module."""
+import io
+
+import numpy as np
+import pytest
+
+from aiida_jdftx.tools.export import (
+    TABLE_PARAMETERS,
+    TABLE_TRAJECTORIES,
+    decode_arrays,
+    get_parameters_row,
+    get_schema,
+    get_structure_row,
+    write_table,
+)
+
+
+def test_decode_arrays():
+    """Test that the arrays are flattened and their shapes kept."""
+    forces = np.arange(12.).reshape(2, 2, 3)
+    handle = io.BytesIO()
+    np.save(handle, forces)
+
+    row = decode_arrays(1, {'forces': handle.getvalue()})
+
+    assert row['pk'] == 1
+    assert row['forces_shape'] == [2, 2, 3]
+    np.testing.assert_array_equal(row['forces'].reshape(row['forces_shape']), forces)
+    assert 'other' not in row
+
+
+def test_decode_arrays_other():
+    """Test that the arrays without a column of their own are gathered in the `other` columns."""
+    handle = io.BytesIO()
+    np.save(handle, np.ones((2, 3)))
+
+    row = decode_arrays(1, {'stress': handle.getvalue()})
+
+    assert 'stress' not in row
+    assert dict(row['other_shape']) == {'stress': [2, 3]}
+    np.testing.assert_array_equal(dict(row['other'])['stress'], np.ones(6))
+
+
+def test_get_rows():
+    """Test the rows of the parameters and structures tables."""
+    row = get_parameters_row(1, 'uuid', {'energy_total': -1., 'energies': [-1., -2.], 'list': [1, 2]})
+    assert row == {'pk': 1, 'uuid': 'uuid', 'energy_total': -1., 'energies': '[-1.0, -2.0]', 'other': '{"list": [1, 2]}'}
+
+    attributes = {
+        'cell': np.eye(3).tolist(),
+        'kinds': [{'name': 'Si1', 'symbols': ['Si']}],
+        'sites': [{'kind_name': 'Si1', 'position': [0., 0., 0.]}],
+    }
+    row = get_structure_row(1, attributes)
+    assert row['symbols'] == ['Si']
+    assert row['kind_names'] == ['Si1']
+
+
+def test_write_table(tmp_path):
+    """Test that rows with different keys are written with nulls for the missing values."""
+    parquet = pytest.importorskip('pyarrow.parquet')
+
+    rows = [get_parameters_row(1, 'a', {'energy_total': -1.}), get_parameters_row(2, 'b', {'spin_type': 'none'})]
+    write_table(rows, str(tmp_path / 'parameters'), 'part.parquet', get_schema(TABLE_PARAMETERS))
+
+    table = parquet.read_table(str(tmp_path / 'parameters' / 'part.parquet')).to_pydict()
+    assert table['pk'] == [1, 2]
+    assert table['energy_total'] == [-1., None]
+    assert table['spin_type'] == [None, 'none']
+    assert not list((tmp_path / 'parameters').glob('*.tmp'))
+
+
+def test_write_table_dataset(tmp_path):
+    """Test that the pages of a table with different keys and types of values are read as a single dataset."""
+    parquet = pytest.importorskip('pyarrow.parquet')
+    dirpath = str(tmp_path / 'parameters')
+    schema = get_schema(TABLE_PARAMETERS)
+
+    # the first page has no values of `max_force`, which is an integer in the second
+    write_table([get_parameters_row(1, 'a', {'energy_total': -1, 'max_force': None})], dirpath, '1.parquet', schema)
+    parameters = {'energy_free': -2., 'max_force': 0, 'new': True}
+    write_table([get_parameters_row(2, 'b', parameters)], dirpath, '2.parquet', schema)
+
+    table = parquet.read_table(dirpath)
+    assert table.schema == schema
+
+    table = table.sort_by('pk').to_pydict()
+    assert table['energy_total'] == [-1., None]
+    assert table['energy_free'] == [None, -2.]
+    assert table['max_force'] == [None, 0.]
+    assert table['other'] == [None, '{"new": true}']
+
+
+def test_write_table_trajectories(tmp_path):
+    """Test that the pages of the trajectories with different arrays are read as a single dataset."""
+    parquet = pytest.importorskip('pyarrow.parquet')
+    dirpath = str(tmp_path / 'trajectories')
+    schema = get_schema(TABLE_TRAJECTORIES)
+
+    contents = []
+    for name in ('forces', 'stress'):
+        handle = io.BytesIO()
+        np.save(handle, np.ones((1, 3)))
+        contents.append({name: handle.getvalue()})
+
+    write_table([decode_arrays(1, contents[0])], dirpath, '1.parquet', schema)
+    write_table([decode_arrays(2, contents[1])], dirpath, '2.parquet', schema)
+
+    table = parquet.read_table(dirpath).sort_by('pk').to_pydict()
+    assert table['forces_shape'] == [[1, 3], None]
+    assert table['other_shape'] == [None, [('stress', [1, 3])]]
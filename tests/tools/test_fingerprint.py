@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `aiida_jdftx.tools.fingerprint` module."""
+import itertools
+
+import numpy as np
+
+from aiida_jdftx.tools.fingerprint import FingerprintIndex, get_distances, get_fingerprint
+
+PARAM = 5.43
+CELL = np.array([[PARAM / 2., PARAM / 2., 0], [PARAM / 2., 0, PARAM / 2.], [0, PARAM / 2., PARAM / 2.]])
+POSITIONS = np.array([[0., 0., 0.], [PARAM / 4., PARAM / 4., PARAM / 4.]])
+
+
+def test_fingerprint_invariance():
+    """Test that the fingerprint does not depend on the order of the sites, a translation or the choice of the cell."""
+    reference = get_fingerprint(CELL, POSITIONS, ['Si', 'Ge'])
+
+    shifts = [np.array(shift) @ CELL for shift in itertools.product(range(2), repeat=3)]
+    supercell = [position + shift for shift in shifts for position in POSITIONS]
+    cell = np.array([CELL[0] + CELL[1], CELL[1], CELL[2] - 3 * CELL[0]])
+
+    equivalent = [
+        get_fingerprint(CELL, POSITIONS[::-1], ['Ge', 'Si']),
+        get_fingerprint(CELL, POSITIONS + [0.3, -1.2, 7.], ['Si', 'Ge']),
+        get_fingerprint(cell, POSITIONS, ['Si', 'Ge']),
+        get_fingerprint(2 * CELL, supercell, ['Si', 'Ge'] * 8),
+    ]
+
+    np.testing.assert_allclose(get_distances(reference, np.array(equivalent)), 0., atol=1e-6)
+
+
+def test_index(tmp_path):
+    """Test that a near duplicate is found in the index but not a strained structure or another composition."""
+    filepath = str(tmp_path / 'fingerprints.sqlite')
+    index = FingerprintIndex(filepath)
+    index.add('Si', get_fingerprint(CELL, POSITIONS, ['Si', 'Si']), 'uuid')
+    index.close()
+
+    index = FingerprintIndex(filepath)
+    displaced = POSITIONS + [[0., 0., 0.], [0.01, 0., 0.]]
+
+    assert len(index) == 1
+    assert index.find('Si', get_fingerprint(CELL, displaced, ['Si', 'Si'])) == 'uuid'
+    assert index.find('Si', get_fingerprint(1.05 * CELL, 1.05 * POSITIONS, ['Si', 'Si'])) is None
+    assert index.find('GeSi', get_fingerprint(CELL, POSITIONS, ['Si', 'Ge'])) is None
+
+
+def test_index_added(tmp_path):
+    """Test that the fingerprints added after a lookup, also by another index of the database, are found."""
+    filepath = str(tmp_path / 'fingerprints.sqlite')
+    index = FingerprintIndex(filepath)
+    other = FingerprintIndex(filepath)
+    fingerprint = get_fingerprint(CELL, POSITIONS, ['Si', 'Si'])
+    strained = get_fingerprint(1.05 * CELL, 1.05 * POSITIONS, ['Si', 'Si'])
+
+    assert index.find('Si', fingerprint) is None
+
+    for number in range(20):
+        index.add('Si', strained + number, f'strained{number}')
+
+    other.add('Si', fingerprint, 'uuid')
+
+    assert index.find('Si', fingerprint) == 'uuid'
+    assert index.find('Si', strained + 7) == 'strained7'
+    assert len(index) == 21
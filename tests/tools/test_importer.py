@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `aiida_jdftx.tools.importer` module."""
+import os
+
+import numpy as np
+
+from aiida_jdftx.inputfile import read_input_commands
+from aiida_jdftx.tools.importer import get_dump_filename, get_kpoints, get_parameters, get_structure
+
+INPUT_FILEPATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'calculations', 'test_calculations',
+                              'test_jdftx_default.in')
+
+
+def test_read_input_file(generate_structure):
+    """Test that the input file written by `JdftxCalculation` is parsed back into its inputs."""
+    commands = read_input_commands(INPUT_FILEPATH)
+    reference = generate_structure()
+
+    structure = get_structure(commands)
+    np.testing.assert_allclose(structure.cell, reference.cell, atol=1e-6)
+    np.testing.assert_allclose([site.position for site in structure.sites],
+                               [site.position for site in reference.sites],
+                               atol=1e-6)
+    assert structure.get_kind_names() == ['Si']
+
+    mesh, offset = get_kpoints(commands, structure).get_kpoints_mesh()
+    assert mesh == [8, 8, 8]
+    assert offset == [0.5, 0.5, 0.5]
+
+    assert get_parameters(commands).get_dict() == {'elec-cutoff': '20 100', 'lattice-minimize': 'nIterations 0'}
+    assert get_dump_filename(commands, 'ionpos') == 'aiida.ionpos'
+
+
+def test_read_input_commands(tmp_path, generate_structure):
+    """Test the comments, continued lines, included files, lattice coordinates and explicit kpoints."""
+    (tmp_path / 'ions.in').write_text('ion Si 0 0 0 0\nion Si 0.25 0.25 0.25 0\n')
+    (tmp_path / 'run.in').write_text(
+        '# silicon\n'
+        'lattice 0 1 1 \\\n 1 0 1 \\\n 1 1 0\n'
+        'lattice-scale 5.1306060590 5.1306060590 5.1306060590\n'
+        'coords-type lattice\n'
+        'include ions.in\n'
+        'kpoint 0 0 0 1  # Gamma\n'
+        'kpoint 0.5 0 0 3\n'
+    )
+    commands = read_input_commands(str(tmp_path / 'run.in'))
+    assert commands[0] == ('lattice', '0 1 1 1 0 1 1 1 0')
+
+    structure = get_structure(commands)
+    np.testing.assert_allclose(structure.cell, generate_structure().cell, atol=1e-6)
+    np.testing.assert_allclose(structure.sites[1].position, generate_structure().sites[1].position, atol=1e-6)
+
+    kpoints, weights = get_kpoints(commands, structure).get_kpoints(also_weights=True)
+    np.testing.assert_allclose(kpoints, [[0., 0., 0.], [0.5, 0., 0.]])
+    np.testing.assert_allclose(weights, [0.25, 0.75])
+    assert not get_parameters(commands).get_dict()
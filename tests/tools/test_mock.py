@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Tests for the mock jdftx executable."""
+import os
+import shutil
+
+from aiida_jdftx.stdout import parse_stdout_content
+from aiida_jdftx.tools import mock
+
+INPUT_FILE = os.path.join(os.path.dirname(__file__), '..', 'calculations', 'test_calculations', 'test_jdftx_default.in')
+
+
+def test_mock_run(tmp_path, monkeypatch):
+    """Test that the mock writes a stdout parsed as a complete relaxation and the dumped files of the input."""
+    monkeypatch.setenv(mock.ENV_DURATION, '0')
+    monkeypatch.setenv(mock.ENV_ITERATIONS, '3')
+
+    content = open(INPUT_FILE).read().replace('nIterations                    0', 'nIterations                    2')
+    (tmp_path / 'aiida.in').write_text(content)
+
+    mock.main(['-i', str(tmp_path / 'aiida.in'), '-o', str(tmp_path / 'aiida.out')])
+
+    for filename in ('aiida.out', 'aiida.ionpos', 'aiida.lattice', 'aiida.Ecomponents', 'aiida.kPts', 'aiida.n'):
+        assert (tmp_path / filename).exists()
+
+    parsed = parse_stdout_content((tmp_path / 'aiida.out').read_text(), [[1., 0., 0.], [0., 1., 0.], [0., 0., 1.]])
+
+    assert parsed['completed']
+    assert parsed['parameters']['converged']
+    assert parsed['parameters']['number_of_states'] == 512
+    assert parsed['performance']['number_of_ionic_steps'] == 3
+    assert parsed['performance']['number_of_electronic_iterations'] == 9
+    assert len(parsed['trajectory']['forces']) == 3
+    assert parsed['trajectory']['forces'][0].shape == (2, 3)
+
+
+def test_mock_restart(tmp_path, monkeypatch):
+    """Test that the mock reads the lattice and the positions dumped by a previous run, as in a restart."""
+    monkeypatch.setenv(mock.ENV_DURATION, '0')
+    shutil.copy(INPUT_FILE, tmp_path / 'aiida.in')
+    mock.main(['-i', str(tmp_path / 'aiida.in'), '-o', str(tmp_path / 'aiida.out')])
+
+    content = 'include aiida.lattice\ncoords-type cartesian\ninclude aiida.ionpos\nkpoint-folding 2 2 2\n'
+    (tmp_path / 'restart.in').write_text(content + 'dump-name restart.$VAR\ndump End IonicPositions\n')
+    mock.main(['-i', str(tmp_path / 'restart.in'), '-o', str(tmp_path / 'restart.out')])
+
+    assert (tmp_path / 'restart.ionpos').read_text() == (tmp_path / 'aiida.ionpos').read_text()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `aiida_jdftx.tools.reparse` module."""
+from aiida import orm
+
+from aiida_jdftx.parsers import get_parser_version, get_retrieved_hash
+from aiida_jdftx.tools.reparse import (
+    STATUS_PARSED,
+    STATUS_SKIPPED,
+    get_calculation_filters,
+    get_calculations,
+    get_parsed_keys,
+    reparse_calculation,
+)
+
+
+def test_reparse_calculation(fixture_localhost, generate_calc_job_node, generate_structure):
+    """Test that a calculation is re-parsed into the target group once per parser version."""
+    structure = generate_structure()
+    kpoints = orm.KpointsData()
+    kpoints.set_cell_from_structure(structure)
+    kpoints.set_kpoints_mesh_from_density(0.15)
+
+    inputs = {'structure': structure, 'kpoints': kpoints, 'parameters': orm.Dict(dict={})}
+    node = generate_calc_job_node('jdftx', fixture_localhost, 'default', inputs)
+    group = orm.Group(label='reparse').store()
+    version = get_parser_version()
+
+    assert reparse_calculation(node, group, set(), version) == STATUS_PARSED
+    assert group.count() == 1
+
+    keys = get_parsed_keys(group, version)
+    assert keys == {(node.uuid, get_retrieved_hash(node.outputs.retrieved), version)}
+    assert reparse_calculation(node, group, keys, version) == STATUS_SKIPPED
+    assert not get_parsed_keys(group, 'other')
+
+    # another calculation with the same retrieved files, e.g. with other settings, is parsed
+    clone = generate_calc_job_node('jdftx', fixture_localhost, 'default', {**inputs, 'settings': orm.Dict(dict={})})
+    assert reparse_calculation(clone, group, keys, version) == STATUS_PARSED
+    assert group.count() == 2
+
+
+def test_get_calculations(fixture_localhost, generate_calc_job_node):
+    """Test that the calculations to re-parse are selected by the filters on their pks and exit status."""
+    nodes = []
+
+    for exit_status in (0, 410, 0):
+        node = generate_calc_job_node('jdftx', fixture_localhost)
+        node.set_process_state('finished')
+        node.set_exit_status(exit_status)
+        nodes.append(node)
+
+    pks = [node.pk for node in nodes]
+    assert set(pks) <= set(get_calculations(filters=get_calculation_filters(past_days=1)))
+    assert get_calculations(filters=get_calculation_filters(pks=pks, exit_status=0)) == [pks[0], pks[2]]
+    assert get_calculations(filters=get_calculation_filters(pks=pks[1:], exit_status=410)) == [pks[1]]
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Tests for the NumPy symmetry analysis and finite-displacement force constants."""
+import itertools
+
+import numpy as np
+
+from aiida_jdftx.tools.phonons import compute_force_constants, get_displacements
+from aiida_jdftx.tools.symmetry import (
+    expand_primitive_cell,
+    get_equivalent_atoms,
+    get_primitive_cell,
+    get_symmetry_operations,
+)
+
+PARAM = 5.43
+CELL = np.array([[PARAM / 2., PARAM / 2., 0], [PARAM / 2., 0, PARAM / 2.], [0, PARAM / 2., PARAM / 2.]])
+POSITIONS = np.array([[0., 0., 0.], [PARAM / 4., PARAM / 4., PARAM / 4.]])
+
+
+def get_silicon_supercell():
+    """Return the cell and positions of a 2x2x2 supercell of the silicon primitive cell."""
+    shifts = [np.array(shift) @ CELL for shift in itertools.product(range(2), repeat=3)]
+    return 2 * CELL, np.array([position + shift for shift in shifts for position in POSITIONS])
+
+
+def get_spring_forces(cell, positions, reference):
+    """Return the forces of nearest-neighbour harmonic springs, with the equilibrium bonds of `reference`."""
+    fractional = np.linalg.solve(cell.T, (positions[np.newaxis] - positions[:, np.newaxis]).reshape(-1, 3).T).T
+    bonds = (fractional - np.round(fractional)) @ cell
+    fractional = np.linalg.solve(cell.T, (reference[np.newaxis] - reference[:, np.newaxis]).reshape(-1, 3).T).T
+    equilibrium = (fractional - np.round(fractional)) @ cell
+    neighbours = np.abs(np.linalg.norm(equilibrium, axis=-1) - np.sqrt(3) * PARAM / 4) < 1e-6
+    stretch = (bonds - equilibrium) * neighbours[:, np.newaxis]
+    return stretch.reshape(len(positions), len(positions), 3).sum(axis=1)
+
+
+def test_silicon_symmetry():
+    """Test that the 48 operations of the diamond structure are found and the two atoms are equivalent."""
+    rotations, _, permutations = get_symmetry_operations(CELL, POSITIONS, [14, 14])
+
+    assert len(rotations) == 48
+    assert list(get_equivalent_atoms(permutations)) == [0, 0]
+
+
+def test_primitive_cell():
+    """Test that the supercell is reduced to the two atoms of the primitive cell, from which it is recovered."""
+    cell, positions = get_silicon_supercell()
+    primitive_cell, primitive_positions, numbers, transformation, mapping, shifts = get_primitive_cell(
+        cell, positions, [14] * len(positions))
+
+    assert len(primitive_positions) == 2
+    assert list(numbers) == [14, 14]
+    assert round(abs(np.linalg.det(transformation))) == 8
+    assert np.isclose(np.linalg.det(cell), 8 * np.linalg.det(primitive_cell))
+    assert np.allclose(transformation @ primitive_cell, cell)
+
+    expanded_cell, expanded_positions = expand_primitive_cell(primitive_cell, primitive_positions, transformation,
+                                                              mapping, shifts)
+    assert np.allclose(expanded_cell, cell)
+    assert np.allclose(expanded_positions, positions)
+
+
+def test_primitive_cell_of_primitive_cell():
+    """Test that a primitive cell is returned unchanged."""
+    primitive_cell, primitive_positions, _, transformation, mapping, _ = get_primitive_cell(CELL, POSITIONS, [14, 6])
+
+    assert np.allclose(primitive_cell, CELL)
+    assert np.allclose(primitive_positions, POSITIONS)
+    assert np.array_equal(transformation, np.eye(3))
+    assert list(mapping) == [0, 1]
+
+
+def test_force_constants_from_symmetry():
+    """Test that the force constants reconstructed from one displaced atom match those of displacing every atom."""
+    cell, positions = get_silicon_supercell()
+    numbers = [14] * len(positions)
+
+    atoms, vectors = get_displacements(cell, positions, numbers, 0.01)
+    assert len(atoms) == 6
+
+    forces = [get_spring_forces(cell, positions + np.eye(len(positions))[atom][:, np.newaxis] * vector, positions)
+              for atom, vector in zip(atoms, vectors)]
+    force_constants = compute_force_constants(cell, positions, numbers, atoms, vectors, forces)
+
+    all_atoms = np.repeat(np.arange(len(positions)), 6)
+    all_vectors = np.tile(vectors, (len(positions), 1))
+    all_forces = [get_spring_forces(cell, positions + np.eye(len(positions))[atom][:, np.newaxis] * vector, positions)
+                  for atom, vector in zip(all_atoms, all_vectors)]
+    reference = np.zeros_like(force_constants)
+    for plus in range(0, len(all_atoms), 2):
+        direction = np.argmax(np.abs(all_vectors[plus]))
+        reference[all_atoms[plus], :, direction, :] = -(all_forces[plus] - all_forces[plus + 1]) / 0.02
+
+    assert np.allclose(force_constants, reference)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `JdftxBandsWorkChain` class."""
+import numpy as np
+
+from aiida import orm
+
+from aiida_jdftx.workflows.bands import merge_bands, split_kpoints
+
+
+def test_split_and_merge_kpoints(generate_structure):
+    """Test that a kpoint path split in chunks is stitched back together in order."""
+    kpoints = orm.KpointsData()
+    kpoints.set_cell_from_structure(generate_structure())
+    kpoints.set_kpoints(np.linspace([0., 0., 0.], [0.5, 0.5, 0.5], 7))
+
+    chunks = split_kpoints(kpoints, orm.Int(3))
+
+    assert sorted(chunks) == ['chunk_0', 'chunk_1', 'chunk_2']
+    assert [len(chunks[label].get_kpoints()) for label in sorted(chunks)] == [3, 3, 1]
+
+    bands = {}
+    for label, chunk in chunks.items():
+        band = orm.BandsData()
+        band.set_kpointsdata(chunk)
+        band.set_bands(chunk.get_kpoints()[:, :1], units='eV')
+        bands[label] = band
+
+    merged = merge_bands(kpoints, **bands)
+
+    assert np.allclose(merged.get_bands()[:, 0], kpoints.get_kpoints()[:, 0])
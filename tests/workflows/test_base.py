@@ -1,5 +1,10 @@
 # -*- coding: utf-8 -*-
 """Tests for the `JdftxBaseWorkChain` class."""
+import itertools
+
+import numpy as np
+
+from aiida import orm
 from aiida.common import AttributeDict
 
 
@@ -10,3 +15,114 @@ def test_setup(generate_workchain_jdftx):
 
     assert process.ctx.restart_calc is None
     assert isinstance(process.ctx.inputs, AttributeDict)
+
+
+def test_setup_canonical_parameters(generate_workchain_jdftx):
+    """Test that `JdftxBaseWorkChain.setup` canonicalizes the parameters of the calculation."""
+    inputs = generate_workchain_jdftx(return_inputs=True)
+    inputs['jdftx']['parameters'] = orm.Dict(dict={'elec-cutoff': '20  100.0', 'lattice-minimize': {'nIterations': 0}})
+
+    process = generate_workchain_jdftx(inputs=inputs)
+    process.setup()
+
+    assert process.ctx.inputs.parameters.get_dict() == {'elec-cutoff': '20 100', 'lattice-minimize': {'nIterations': '0'}}
+
+
+def test_reduce_structure(generate_workchain_jdftx, generate_structure):
+    """Test that `JdftxBaseWorkChain.reduce_structure` replaces a supercell by its primitive cell."""
+    structure = generate_structure()
+    supercell = orm.StructureData(cell=[[2 * value for value in vector] for vector in structure.cell])
+    for shift in itertools.product(range(2), repeat=3):
+        translation = np.array(shift) @ np.array(structure.cell)
+        for site in structure.sites:
+            supercell.append_atom(position=np.array(site.position) + translation, symbols='Si', name='Si')
+
+    inputs = generate_workchain_jdftx(return_inputs=True)
+    inputs['jdftx']['structure'] = supercell
+    inputs['reduce_to_primitive'] = orm.Bool(True)
+
+    process = generate_workchain_jdftx(inputs=inputs)
+    process.setup()
+    process.reduce_structure()
+
+    assert len(process.ctx.inputs.structure.sites) == 2
+    assert np.isclose(process.ctx.inputs.structure.get_cell_volume(), structure.get_cell_volume())
+    assert len(process.ctx.transformation.get_array('mapping')) == 16
+
+
+def test_map_to_original_cell(generate_structure):
+    """Test that the outputs of the primitive cell are mapped back onto the original cell."""
+    from aiida_jdftx.workflows.base import get_primitive_structure, map_to_original_cell
+
+    structure = generate_structure()
+    supercell = structure.get_ase().repeat((2, 1, 1))
+    supercell = orm.StructureData(ase=supercell)
+    results = get_primitive_structure(supercell)
+
+    parameters = orm.Dict(dict={'energy_total': -10., 'energy_total_units': 'eV', 'energy_per_atom': -5.,
+                                'number_of_atoms': 2, 'formula': 'Si2'})
+    mapped = map_to_original_cell(supercell, results['transformation'], parameters,
+                                  output_structure=results['primitive_structure'])
+
+    assert mapped['output_parameters'].get_dict() == {'energy_total': -20., 'energy_total_units': 'eV',
+                                                      'energy_per_atom': -5., 'number_of_atoms': 4, 'formula': 'Si4'}
+    assert np.allclose(mapped['output_structure'].cell, supercell.cell)
+    assert np.allclose([site.position for site in mapped['output_structure'].sites],
+                       [site.position for site in supercell.sites])
+
+
+def test_map_to_original_cell_trajectory(generate_structure):
+    """Test that the energies of every step of the trajectory are scaled and its forces expanded to every site."""
+    from aiida_jdftx.workflows.base import get_primitive_structure, map_to_original_cell
+
+    structure = generate_structure()
+    supercell = orm.StructureData(ase=structure.get_ase().repeat((2, 1, 1)))
+    results = get_primitive_structure(supercell)
+    primitive = results['primitive_structure']
+    mapping = results['transformation'].get_array('mapping')
+
+    steps = 3
+    forces = np.arange(steps * 2 * 3, dtype=float).reshape(steps, 2, 3)
+    trajectory = orm.TrajectoryData()
+    trajectory.set_trajectory(
+        stepids=np.arange(steps),
+        cells=np.tile(primitive.cell, (steps, 1, 1)),
+        positions=np.tile([site.position for site in primitive.sites], (steps, 1, 1)),
+        symbols=[site.kind_name for site in primitive.sites],
+    )
+    trajectory.set_array('energy_total', np.array([-10., -10.5, -10.6]))
+    trajectory.set_array('forces', forces)
+
+    parameters = orm.Dict(dict={'energy_total': -10.6, 'energies': [-10., -10.5, -10.6]})
+    mapped = map_to_original_cell(supercell, results['transformation'], parameters, output_trajectory=trajectory)
+
+    assert mapped['output_parameters']['energies'] == [-20., -21., -21.2]
+    assert np.allclose(mapped['output_trajectory'].get_array('energy_total'), [-20., -21., -21.2])
+    assert np.allclose(mapped['output_trajectory'].get_array('forces'), forces[:, mapping])
+    assert mapped['output_trajectory'].get_positions().shape == (steps, 4, 3)
+
+
+def test_map_to_original_cell_dos(generate_structure):
+    """Test that the densities of states are scaled to the original cell and the energies left unchanged."""
+    from aiida_jdftx.workflows.base import get_primitive_structure, map_to_original_cell
+
+    structure = generate_structure()
+    supercell = orm.StructureData(ase=structure.get_ase().repeat((2, 1, 1)))
+    results = get_primitive_structure(supercell)
+
+    energies = np.linspace(-5., 5., 11)
+    dos = orm.XyData()
+    dos.set_x(energies, 'Energy', 'eV')
+    dos.set_y([np.ones(11), np.arange(11.)], ['Total (up)', 'Total (down)'], ['states/eV', 'states/eV'])
+
+    parameters = orm.Dict(dict={'energy_total': -10.6})
+    mapped = map_to_original_cell(supercell, results['transformation'], parameters, output_dos=dos)
+
+    x_name, x_array, x_units = mapped['output_dos'].get_x()
+    assert (x_name, x_units) == ('Energy', 'eV')
+    np.testing.assert_array_equal(x_array, energies)
+
+    (up_name, up, up_units), (down_name, down, _) = mapped['output_dos'].get_y()
+    assert (up_name, down_name, up_units) == ('Total (up)', 'Total (down)', 'states/eV')
+    np.testing.assert_array_equal(up, 2 * np.ones(11))
+    np.testing.assert_array_equal(down, 2 * np.arange(11.))
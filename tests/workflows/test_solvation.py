@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Tests for the `JdftxSolvationWorkChain` class."""
+import pytest
+
+from aiida import orm
+
+from aiida_jdftx.workflows.solvation import JdftxSolvationWorkChain, get_solvation_energy
+
+
+def test_get_solvation_energy():
+    """Test that the free energy is preferred over the total energy when computing the solvation energy."""
+    vacuum = orm.Dict(dict={'energy_total': -10.0, 'energy_free': -10.1})
+    solvated = orm.Dict(dict={'energy_total': -10.2, 'energy_free': -10.5})
+
+    assert get_solvation_energy(vacuum, solvated).value == pytest.approx(-0.4)
+
+    vacuum = orm.Dict(dict={'energy_total': -10.0})
+    solvated = orm.Dict(dict={'energy_total': -10.2})
+
+    assert get_solvation_energy(vacuum, solvated).value == pytest.approx(-0.2)
+
+
+def test_get_solvation_energy_inconsistent():
+    """Test that the solvation energy is not computed from the free energy of one run and the total energy of the other."""
+    vacuum = orm.Dict(dict={'energy_total': -10.0})
+    solvated = orm.Dict(dict={'energy_total': -10.2, 'energy_free': -10.5})
+
+    with pytest.raises(ValueError):
+        get_solvation_energy(vacuum, solvated)
+
+
+@pytest.mark.parametrize(('dump', 'expected'), (
+    (None, 'End State'),
+    ('End BandEigs', 'End BandEigs State'),
+    ('End State BandEigs', 'End State BandEigs'),
+))
+def test_vacuum_dump(dump, expected):
+    """Test that the state is dumped by the vacuum run on top of the quantities dumped by the user."""
+    assert JdftxSolvationWorkChain._get_vacuum_dump(dump) == expected  # pylint: disable=protected-access